@@ -1,18 +1,28 @@
-from dotenv import load_dotenv
-from flask import Flask, jsonify, make_response, Response, request, session
+import json
+import math
+
+import click
+from flask import Flask, jsonify, make_response, Response, request, send_from_directory, session, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 # from flask_cors import CORS
 
 from config import ProductionConfig
 
-from weatherFolder.db import db
-from weatherFolder.models.cities_model import Cities
-from weatherFolder.models.favorites_model import FavoritesModel
-from weatherFolder.models.user_model import Users
+from weatherFolder.db import db, ensure_schema, init_db
+from weatherFolder.models.cities_model import MAX_NEAREST_RESULTS, Cities, city_cache, weather_cache
+from weatherFolder.models.favorites_model import Favorites, FavoritesModel, forecast_cache
+from weatherFolder.models.user_model import Users, user_cache
+from weatherFolder.utils.city_importer import IMPORT_BATCH_SIZE, import_cities
+from weatherFolder.utils.kdf_pool import KDFPoolBusyError
 from weatherFolder.utils.logger import configure_logger
+from weatherFolder.utils.metrics import instrument_app, register_caches, render_prometheus
+from weatherFolder.utils import profiling
+
 
+NDJSON_MIMETYPE = "application/x-ndjson"
+PROMETHEUS_MIMETYPE = "text/plain; version=0.0.4; charset=utf-8"
 
-load_dotenv()
+register_caches([city_cache, weather_cache, forecast_cache, user_cache])
 
 def create_app(config_class=ProductionConfig):
     app = Flask(__name__)
@@ -20,9 +30,24 @@ def create_app(config_class=ProductionConfig):
 
     app.config.from_object(config_class)
 
-    db.init_app(app)  # Initialize db with app
+    init_db(app)  # Initialize db with app and its SQLite pragmas
     with app.app_context():
-        db.create_all()  # Recreate all tables
+        ensure_schema()  # Create tables only if the stored schema version is behind
+        instrument_app(app, db.engines.values())
+
+    if profiling.profiling_enabled():
+        # Left out entirely unless PROFILE_TOKEN or PROFILE_SAMPLE_RATE is set
+        app.wsgi_app = profiling.ProfilingMiddleware(app.wsgi_app)
+
+    @app.cli.command("import-cities")
+    @click.argument("path", type=click.Path(exists=True, dir_okay=False))
+    @click.option("--batch-size", default=IMPORT_BATCH_SIZE, show_default=True,
+                  help="Rows written per transaction.")
+    def import_cities_command(path: str, batch_size: int) -> None:
+        """Bulk import cities from a GeoNames TSV dump or a name,lat,lon CSV file."""
+        stats = import_cities(path, batch_size=batch_size)
+        click.echo(f"Imported {stats['imported']} cities ({stats['skipped']} skipped) "
+                   f"in {stats['seconds']:.2f}s, {stats['rows_per_second']:.0f} rows/s")
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -30,7 +55,7 @@ def create_app(config_class=ProductionConfig):
 
     @login_manager.user_loader
     def load_user(user_id):
-        return Users.query.filter_by(username=user_id).first()
+        return Users.load_user(user_id)
 
     @login_manager.unauthorized_handler
     def unauthorized():
@@ -39,8 +64,15 @@ def create_app(config_class=ProductionConfig):
             "message": "Authentication required"
         }), 401)
 
-
-    favorites_model = FavoritesModel()
+    def password_hashing_busy(e: KDFPoolBusyError) -> Response:
+        """Sheds a request that could not get a password hashing slot."""
+        app.logger.warning(f"Password hashing pool is full: {e}")
+        response = make_response(jsonify({
+            "status": "error",
+            "message": str(e)
+        }), 503)
+        response.headers["Retry-After"] = "1"
+        return response
 
 
     ####################################################
@@ -65,6 +97,84 @@ def create_app(config_class=ProductionConfig):
             'message': 'Service is running'
         }), 200)
 
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics() -> Response:
+        """
+        Metrics route for Prometheus scrapes.
+
+        Returns:
+            Request, OpenWeather, database and cache metrics of every worker,
+            in the Prometheus text exposition format.
+
+        """
+        return Response(render_prometheus(), mimetype=PROMETHEUS_MIMETYPE)
+
+    def check_profile_token():
+        """Returns an error response unless the request carries the profiling token."""
+        if not profiling.PROFILE_TOKEN:
+            return make_response(jsonify({
+                "status": "error",
+                "message": "Profiling is not enabled"
+            }), 404)
+        if not profiling.is_authorized(request.headers.get(profiling.PROFILE_HEADER)):
+            return make_response(jsonify({
+                "status": "error",
+                "message": "Invalid profiling token"
+            }), 403)
+        return None
+
+    @app.route('/api/profiles', methods=['GET'])
+    def list_profiles() -> Response:
+        """
+        Route to list the stored request profiles, newest first.
+
+        Headers:
+            - X-Profile-Token: The configured PROFILE_TOKEN.
+
+        Returns:
+            JSON response with the id, creation time and file names of each profile.
+        Raises:
+            403 error if the token is wrong.
+            404 error if profiling tokens are not configured.
+
+        """
+        error = check_profile_token()
+        if error is not None:
+            return error
+        return make_response(jsonify({
+            "status": "success",
+            "profiles": profiling.list_profiles()
+        }), 200)
+
+    @app.route('/api/profiles/<name>', methods=['GET'])
+    def download_profile(name: str) -> Response:
+        """
+        Route to download a stored profile.
+
+        Path Parameter:
+            - name (str): A .pstats file, for pstats or snakeviz, or a .collapsed
+              file, for flamegraph.pl or speedscope.
+
+        Headers:
+            - X-Profile-Token: The configured PROFILE_TOKEN.
+
+        Returns:
+            The profile file as an attachment.
+        Raises:
+            403 error if the token is wrong.
+            404 error if profiling tokens are not configured or there is no such profile.
+
+        """
+        error = check_profile_token()
+        if error is not None:
+            return error
+        if not profiling.PROFILE_NAME.match(name):
+            return make_response(jsonify({
+                "status": "error",
+                "message": f"Profile {name} not found"
+            }), 404)
+        return send_from_directory(profiling.PROFILE_DIR, name, as_attachment=True)
+
 
     ##########################################################
     #
@@ -85,6 +195,7 @@ def create_app(config_class=ProductionConfig):
 
         Raises:
             400 error if the username or password is missing.
+            503 error if password hashing is saturated.
             500 error if there is an issue creating the user in the database.
         """
         try:
@@ -109,6 +220,8 @@ def create_app(config_class=ProductionConfig):
                 "status": "error",
                 "message": str(e)
             }), 400)
+        except KDFPoolBusyError as e:
+            return password_hashing_busy(e)
         except Exception as e:
             app.logger.error(f"User creation failed: {e}")
             return make_response(jsonify({
@@ -130,6 +243,7 @@ def create_app(config_class=ProductionConfig):
 
         Raises:
             401 error if the username or password is incorrect.
+            503 error if password hashing is saturated.
         """
         try:
             data = request.get_json()
@@ -142,8 +256,8 @@ def create_app(config_class=ProductionConfig):
                     "message": "Username and password are required"
                 }), 400)
 
-            if Users.check_password(username, password):
-                user = Users.query.filter_by(username=username).first()
+            user = Users.authenticate(username, password)
+            if user is not None:
                 login_user(user)
                 return make_response(jsonify({
                     "status": "success",
@@ -160,6 +274,8 @@ def create_app(config_class=ProductionConfig):
                 "status": "error",
                 "message": str(e)
             }), 401)
+        except KDFPoolBusyError as e:
+            return password_hashing_busy(e)
         except Exception as e:
             app.logger.error(f"Login failed: {e}")
             return make_response(jsonify({
@@ -196,6 +312,7 @@ def create_app(config_class=ProductionConfig):
 
         Raises:
             400 error if the new password is not provided.
+            503 error if password hashing is saturated.
             500 error if there is an issue updating the password in the database.
         """
         try:
@@ -220,6 +337,8 @@ def create_app(config_class=ProductionConfig):
                 "status": "error",
                 "message": str(e)
             }), 400)
+        except KDFPoolBusyError as e:
+            return password_hashing_busy(e)
         except Exception as e:
             app.logger.error(f"Password change failed: {e}")
             return make_response(jsonify({
@@ -241,8 +360,11 @@ def create_app(config_class=ProductionConfig):
         try:
             app.logger.info("Received request to recreate Users table")
             with app.app_context():
+                Favorites.__table__.drop(db.engine)
                 Users.__table__.drop(db.engine)
                 Users.__table__.create(db.engine)
+                Favorites.__table__.create(db.engine)
+            user_cache.clear()
             app.logger.info("Users table recreated successfully")
             return make_response(jsonify({
                 "status": "success",
@@ -305,6 +427,157 @@ def create_app(config_class=ProductionConfig):
                 "details": str(e)
             }), 500)
 
+    @app.route('/api/cities/nearest', methods=['GET'])
+    @login_required
+    def get_nearest_cities() -> Response:
+        """Route to find the cities closest to a location.
+
+        Query Parameters:
+            - lat (float): The latitude of the location.
+            - lon (float): The longitude of the location.
+            - k (int, optional): Number of cities to return. Defaults to 1.
+
+        Returns:
+            JSON response with the closest cities and their great-circle distance in km.
+
+        Raises:
+            400 error if the coordinates or k are missing or out of range.
+            500 error if there is an issue searching the cities.
+        """
+        try:
+            lat = request.args.get("lat", type=float)
+            lon = request.args.get("lon", type=float)
+            k = request.args.get("k", default=1, type=int)
+
+            if lat is None or lon is None:
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": "lat and lon are required"
+                }), 400)
+            if not math.isfinite(lat) or not math.isfinite(lon):
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": "lat and lon must be finite numbers"
+                }), 400)
+
+            try:
+                matches = Cities.find_nearest(lat, lon, k)
+            except ValueError as e:
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": str(e)
+                }), 400)
+
+            return make_response(jsonify({
+                "status": "success",
+                "cities": [dict(city.to_dict(), distance_km=distance) for city, distance in matches]
+            }), 200)
+
+        except Exception as e:
+            app.logger.error(f"Error finding cities near ({request.args.get('lat')}, {request.args.get('lon')}): {e}")
+            return make_response(jsonify({
+                "status": "error",
+                "message": "An internal error occurred while searching cities",
+                "details": str(e)
+            }), 500)
+
+    @app.route('/api/cities/within', methods=['GET'])
+    @login_required
+    def get_cities_within() -> Response:
+        """Route to find the cities within a radius of a location.
+
+        Query Parameters:
+            - lat (float): The latitude of the location.
+            - lon (float): The longitude of the location.
+            - radius_km (float): The search radius in kilometres.
+            - limit (int, optional): Maximum number of cities to return. Defaults to 100.
+
+        Returns:
+            JSON response with the matching cities, closest first, and their distance in km.
+
+        Raises:
+            400 error if a parameter is missing or out of range.
+            500 error if there is an issue searching the cities.
+        """
+        try:
+            lat = request.args.get("lat", type=float)
+            lon = request.args.get("lon", type=float)
+            radius_km = request.args.get("radius_km", type=float)
+            limit = request.args.get("limit", default=MAX_NEAREST_RESULTS, type=int)
+
+            if lat is None or lon is None or radius_km is None:
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": "lat, lon and radius_km are required"
+                }), 400)
+            if not math.isfinite(lat) or not math.isfinite(lon) or not math.isfinite(radius_km):
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": "lat, lon and radius_km must be finite numbers"
+                }), 400)
+
+            try:
+                matches = Cities.find_within(lat, lon, radius_km, limit)
+            except ValueError as e:
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": str(e)
+                }), 400)
+
+            return make_response(jsonify({
+                "status": "success",
+                "cities": [dict(city.to_dict(), distance_km=distance) for city, distance in matches]
+            }), 200)
+
+        except Exception as e:
+            app.logger.error(f"Error finding cities within {request.args.get('radius_km')} km: {e}")
+            return make_response(jsonify({
+                "status": "error",
+                "message": "An internal error occurred while searching cities",
+                "details": str(e)
+            }), 500)
+
+    @app.route('/api/cities/autocomplete', methods=['GET'])
+    @login_required
+    def autocomplete_cities() -> Response:
+        """Route to suggest cities whose name starts with the typed text.
+
+        Query Parameters:
+            - q (str): The text typed so far. Matching ignores case and accents.
+            - limit (int, optional): Maximum number of suggestions. Defaults to 10.
+
+        Returns:
+            JSON response with the matching cities.
+
+        Raises:
+            400 error if the limit is out of range.
+            500 error if there is an issue searching the cities.
+        """
+        try:
+            prefix = request.args.get("q", default="")
+            limit = request.args.get("limit", default=10, type=int)
+
+            try:
+                cities = Cities.autocomplete(prefix, limit)
+            except ValueError as e:
+                return make_response(jsonify({
+                    "status": "error",
+                    "message": str(e)
+                }), 400)
+
+            return make_response(jsonify({
+                "status": "success",
+                "cities": [city.to_dict() for city in cities]
+            }), 200)
+
+        except Exception as e:
+            app.logger.error(f"Error autocompleting city name '{request.args.get('q')}': {e}")
+            return make_response(jsonify({
+                "status": "error",
+                "message": "An internal error occurred while searching cities",
+                "details": str(e)
+            }), 500)
+
     ############################################################
     #
     # Favorites
@@ -319,6 +592,10 @@ def create_app(config_class=ProductionConfig):
         Path Parameter:
             - city_id (int): The ID of the city.
 
+        Expected JSON Input (optional):
+            - name (str): The name of the city, matched ignoring case and accents.
+              Takes precedence over the path ID when given.
+
         Returns:
             JSON response indicating success of the operation.
 
@@ -328,30 +605,28 @@ def create_app(config_class=ProductionConfig):
 
         """
         try:
-            app.logger.info("")
-            data = request.json()
+            data = request.get_json(silent=True) or {}
             city_name = data.get("name")
 
-            if not city_name:
-                app.logger.warning("Attempted to add a city wuthout specifying name.")
-                return make_response(jsonify({
-                    "status":  "error",
-                    "message": "You must name a city."
-                }), 400)
-
-            app.logger.info(f"Attempting to add city {city_name} to favorites.")
-
-            city = Cities.get_city_by_name(city_name)
-
-            if not city:
-                app.logger.warning(f"City '{city_name}' not found.")
+            try:
+                if city_name:
+                    app.logger.info(f"Attempting to add city {city_name} to favorites.")
+                    city = Cities.get_city_by_name(city_name)
+                else:
+                    app.logger.info(f"Attempting to add city {city_id} to favorites.")
+                    city = Cities.get_city_by_id(city_id)
+            except ValueError as e:
+                app.logger.warning(str(e))
                 return make_response(jsonify({
                     "status": "error",
-                    "message": f"City '{city_name}' not found.",
+                    "message": str(e),
                 }), 400)
+            city_name = city.name
         
+            favorites_model = FavoritesModel(current_user.id)
+
             try:
-                favorites_model.add_to_favorites(city.id)
+                favorites_model.add_to_favorite(city.id)
             except ValueError as e:
                 app.logger.warning(f"Cannot enter {city.name}: e")
                 return make_response(jsonify({
@@ -359,9 +634,7 @@ def create_app(config_class=ProductionConfig):
                     "message": str(e)
                 }), 400)
         
-            cities = [Cities.get_city_by_id(b) for b in favorites_model.favorites]
-
-            app.logger.info(f"City '{city_name}' added to favorite. Current cities: {cities}")
+            app.logger.info(f"City '{city_name}' added to favorite. {len(favorites_model.favorites)} cities in favorites.")
 
             return make_response(jsonify({
                 "status": "success",
@@ -373,8 +646,8 @@ def create_app(config_class=ProductionConfig):
             return make_response (jsonify ({
                 "status": "error",
                 "message": "An internal error occured while entering city in favorite.",
-                "cities": cities
-            }), 200)
+                "details": str(e)
+            }), 500)
 
     @app.route('/api/get-weather-city/<int:city_id>', methods=['GET'])
     @login_required
@@ -393,22 +666,10 @@ def create_app(config_class=ProductionConfig):
 
         """
         try:
-            app.logger.info("Retrieving weather of city...")
-
-            data = request.json()
-            city_id = data.get("id")
-
-            if not city_id:
-                app.logger.warning("Attempted to retrieve weather without giving city.")
-                return make_response(jsonify({
-                    "status": "error",
-                    "message": "You must give city id"
-                }), 400)
-            
             app.logger.info(f"Attempting to retrieve city '{city_id}' weather.")
 
             try:
-                weather = Cities.get_weather_city(city_id)
+                weather = FavoritesModel(current_user.id).get_weather_city(city_id)
             except ValueError as e:
                 app.logger.warning(f"Cannot retrieve {city_id}: {e}")
                 return make_response(jsonify({
@@ -447,7 +708,7 @@ def create_app(config_class=ProductionConfig):
         try:
             app.logger.info("Clearing favorite cities...")
 
-            favorites_model.clear_favorites()
+            FavoritesModel(current_user.id).clear_favorites()
 
             app.logger.info("Cities cleared from favorites successfully.")
             return make_response(jsonify({
@@ -480,22 +741,10 @@ def create_app(config_class=ProductionConfig):
 
         """
         try:
-            app.logger.info("Retrieving forecast of city...")
-
-            data = request.json()
-            city_id = data.get("id")
-
-            if not city_id:
-                app.logger.warning("Attempting to retrieve forecast without the city")
-                return make_response(jsonify({
-                    "status": "error",
-                    "message": "You must give an id."
-                }), 400)
-            
             app.logger.info(f"Attempting to retrieve forecast of city {city_id}.")
 
             try:
-                forecast = Cities.get_forecast_city(city_id)
+                forecast = FavoritesModel(current_user.id).get_forecast_city(city_id)
             except ValueError as e:
                 app.logger.warning(f"Could not get city with id {city_id}.")
                 return make_response(jsonify({
@@ -518,13 +767,27 @@ def create_app(config_class=ProductionConfig):
                 "details": str(e)
             }), 500)
     
+    def city_weather_entry(city, weather) -> dict:
+        """Serializes a (city, weather) pair, reporting a failed lookup as "error"."""
+        entry = city.to_dict()
+        if isinstance(weather, Exception):
+            entry["error"] = str(weather)
+        else:
+            entry["weather"] = weather
+        return entry
+
     @app.route('/api/get-all_cities_and_weather', methods=['GET'])
     @login_required
     def get_all_cities_and_weather() -> Response:
         """Route to get the list of cities and their weathers.
 
+        Clients that send "Accept: application/x-ndjson" get a streamed response
+        instead, with one JSON city object per line written as soon as its weather
+        is known, in completion order.
+
         Returns:
-            JSON response with the list of cities and weathers.
+            JSON response with the list of cities and weathers. Cities whose weather
+            could not be retrieved carry an "error" field instead of "weather".
 
         Raises:
             500 error if there is an issue getting the cities.
@@ -533,7 +796,22 @@ def create_app(config_class=ProductionConfig):
         try:
             app.logger.info("Retrieving all cities with weathers")
 
-            cities_weathers = favorites_model.get_all_cities_and_weather()
+            favorites_model = FavoritesModel(current_user.id)
+
+            if request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE:
+                records = favorites_model.iter_cities_and_weather()
+
+                def generate():
+                    for city, weather in records:
+                        yield json.dumps(city_weather_entry(city, weather)) + "\n"
+                    app.logger.info("Streamed all cities and with their corresponding weather.")
+
+                return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
+
+            cities_weathers = [
+                city_weather_entry(city, weather)
+                for city, weather in favorites_model.get_all_cities_and_weather()
+            ]
 
             app.logger.info("Retrieved all cities and with their corresponding weather.")
             
@@ -0,0 +1,55 @@
+"""Compares two hot_paths.py result files, e.g. from two commits.
+
+    python benchmarks/compare.py base.json head.json --threshold 20
+
+Prints p50/p99 latency, queries and allocations per scenario side by side.
+With --threshold, exits with status 1 if any scenario's p50 grew by more than
+that many percent.
+"""
+import argparse
+import json
+import sys
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        data = json.load(f)
+    return {(r["name"], json.dumps(r["params"], sort_keys=True)): r for r in data["results"]}
+
+
+def change(base: float, head: float) -> float:
+    return (head - base) / base * 100 if base else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", help="Results of the baseline run.")
+    parser.add_argument("head", help="Results of the run to check.")
+    parser.add_argument("--threshold", type=float, help="Fail if a p50 grew by more than this percentage.")
+    args = parser.parse_args()
+
+    base, head = load(args.base), load(args.head)
+    regressions = []
+    print(f"{'scenario':<40} {'params':<32} {'p50 ms':>20} {'p99 ms':>20} {'queries':>12} {'alloc KiB':>16}")
+    for key in sorted(base.keys() & head.keys()):
+        b, h = base[key], head[key]
+        p50 = change(b["latency_ms"]["p50"], h["latency_ms"]["p50"])
+        p99 = change(b["latency_ms"]["p99"], h["latency_ms"]["p99"])
+        print(f"{key[0]:<40} {key[1]:<32} "
+              f"{h['latency_ms']['p50']:9.3f} ({p50:+6.1f}%) "
+              f"{h['latency_ms']['p99']:9.3f} ({p99:+6.1f}%) "
+              f"{b['queries_per_call']:5.1f}->{h['queries_per_call']:<5.1f} "
+              f"{b['alloc_peak_kib']:7.1f}->{h['alloc_peak_kib']:<7.1f}")
+        if args.threshold is not None and p50 > args.threshold:
+            regressions.append(key)
+
+    for key in sorted(base.keys() ^ head.keys()):
+        print(f"{key[0]:<40} {key[1]:<32} only in {'base' if key in base else 'head'}")
+
+    if regressions:
+        print(f"{len(regressions)} scenario(s) regressed by more than {args.threshold}% at p50", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
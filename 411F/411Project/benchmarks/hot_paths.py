@@ -0,0 +1,240 @@
+"""Micro-benchmarks for the model and route hot paths.
+
+Every scenario runs in-process through the Flask test client (or the model
+call directly), against an in-memory SQLite catalog and a local OpenWeather
+stand-in, for each requested catalog and favorites-list size. For each one it
+reports latency percentiles, memory allocated per call, SQL statements per
+call and upstream calls per call.
+
+    python benchmarks/hot_paths.py --catalog 100,10000 --favorites 1,10,50 --output head.json
+    python benchmarks/compare.py base.json head.json
+
+Caches are cleared before each measured call in the "cold" scenarios and
+primed in the "warm" ones, so both the miss and the hit paths are covered.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable
+
+from openweather_stub import OpenWeatherStub
+from stats import git_revision, latency_summary
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+USERNAME = "benchmark"
+PASSWORD = "benchmark-password"
+
+
+def parse_sizes(spec: str) -> list:
+    return [int(size) for size in spec.split(",") if size.strip()]
+
+
+class QueryCounter:
+    """Counts SQL statements executed on every engine of the app."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+class Bench:
+    """Runs scenarios and collects their results."""
+
+    def __init__(self, stub: OpenWeatherStub, iterations: int, warmup: int, alloc_iterations: int):
+        self.stub = stub
+        self.iterations = iterations
+        self.warmup = warmup
+        self.alloc_iterations = alloc_iterations
+        self.queries = None
+        self.results = []
+
+    def run(self, name: str, params: dict, call: Callable[[], None], setup: Callable[[], None] = None,
+            iterations: int = None) -> None:
+        """Times call, running setup untimed before every call.
+
+        Args:
+            name (str): Scenario name.
+            params (dict): Sizes the scenario ran with.
+            call (Callable[[], None]): The hot path. Should raise if it fails.
+            setup (Callable[[], None], optional): Puts caches in the state the scenario needs.
+            iterations (int, optional): Measured calls. Defaults to the bench's iterations.
+        """
+        setup = setup or (lambda: None)
+        iterations = iterations or self.iterations
+        for _ in range(self.warmup):
+            setup()
+            call()
+
+        latencies = []
+        queries = upstream = 0
+        for _ in range(iterations):
+            setup()
+            queries_before, upstream_before = self.queries.count, self.stub.total_calls()
+            started = time.perf_counter()
+            call()
+            latencies.append(time.perf_counter() - started)
+            queries += self.queries.count - queries_before
+            upstream += self.stub.total_calls() - upstream_before
+
+        peak = retained = 0
+        tracemalloc.start()
+        try:
+            for _ in range(self.alloc_iterations):
+                setup()
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                call()
+                current, high = tracemalloc.get_traced_memory()
+                peak += high - before
+                retained += current - before
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            "name": name,
+            "params": params,
+            "latency_ms": latency_summary(latencies),
+            "queries_per_call": queries / iterations,
+            "upstream_calls_per_call": upstream / iterations,
+            "alloc_peak_kib": peak / max(1, self.alloc_iterations) / 1024,
+            "alloc_retained_kib": retained / max(1, self.alloc_iterations) / 1024,
+        }
+        self.results.append(result)
+        print(f"{name:<40} {json.dumps(params):<36} p50={result['latency_ms']['p50']:8.3f}ms "
+              f"p99={result['latency_ms']['p99']:8.3f}ms queries={result['queries_per_call']:.1f} "
+              f"upstream={result['upstream_calls_per_call']:.1f}", file=sys.stderr)
+
+
+def expect_ok(response) -> None:
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)}")
+
+
+def run_catalog(bench: Bench, catalog_size: int, favorites_sizes: list, include_password: bool) -> None:
+    """Builds an app with catalog_size cities and runs every scenario against it."""
+    from app import create_app
+    from weatherFolder.db import db
+    from weatherFolder.models.cities_model import (Cities, city_cache, normalize_city_name, reset_spatial_index,
+                                                   weather_cache)
+    from weatherFolder.models.favorites_model import Favorites, forecast_cache
+    from weatherFolder.models.user_model import Users, user_cache
+
+    class BenchConfig:
+        TESTING = True
+        SECRET_KEY = "benchmark"
+        SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+
+    for cache in (city_cache, weather_cache, forecast_cache, user_cache):
+        cache.clear()
+    reset_spatial_index()
+
+    app = create_app(BenchConfig)
+    with app.app_context():
+        rng = random.Random(catalog_size)
+        db.session.execute(db.insert(Cities), [
+            {"name": f"City {i}", "name_key": normalize_city_name(f"City {i}"),
+             "lat": rng.uniform(-80, 80), "lon": rng.uniform(-179, 179), "owm_id": 100000 + i}
+            for i in range(1, catalog_size + 1)
+        ])
+        db.session.commit()
+        Users.create_user(USERNAME, PASSWORD)
+        user_id = Users.get_id_by_username(USERNAME)
+
+        bench.queries = QueryCounter(db.engines.values())
+        client = app.test_client()
+        expect_ok(client.post("/api/login", json={"username": USERNAME, "password": PASSWORD}))
+
+        city_id = rng.randint(1, catalog_size)
+        catalog = {"catalog": catalog_size}
+
+        bench.run("model.get_city_by_id.cold", catalog, lambda: Cities.get_city_by_id(city_id),
+                  setup=lambda: city_cache.invalidate(city_id))
+        bench.run("route.get_city_by_id.warm", catalog,
+                  lambda: expect_ok(client.get(f"/api/get-city-by-id/{city_id}")))
+
+        if include_password:
+            bench.run("model.check_password", {}, lambda: Users.check_password(USERNAME, PASSWORD),
+                      iterations=min(bench.iterations, 20))
+
+        for size in favorites_sizes:
+            if size > catalog_size:
+                continue
+            favorite_ids = rng.sample(range(1, catalog_size + 1), size)
+            db.session.execute(db.delete(Favorites).filter_by(user_id=user_id))
+            db.session.add_all(Favorites(user_id=user_id, city_id=i) for i in favorite_ids)
+            db.session.commit()
+            params = {"catalog": catalog_size, "favorites": size}
+
+            def all_cities():
+                expect_ok(client.get("/api/get-all_cities_and_weather"))
+
+            bench.run("route.get_all_cities_and_weather.cold", params, all_cities,
+                      setup=lambda: (weather_cache.clear(), city_cache.clear()))
+            bench.run("route.get_all_cities_and_weather.warm", params, all_cities)
+
+        favorite_id = db.session.execute(db.select(Favorites.city_id).filter_by(user_id=user_id)).scalar()
+        if favorite_id is not None:
+            def forecast():
+                expect_ok(client.post(f"/api/get-forecast-city/{favorite_id}"))
+
+            bench.run("route.get_forecast_city.cold", catalog, forecast, setup=forecast_cache.clear)
+            bench.run("route.get_forecast_city.warm", catalog, forecast)
+
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--catalog", default="100,10000", help="Comma-separated numbers of cities in the catalog.")
+    parser.add_argument("--favorites", default="1,10,50", help="Comma-separated favorites-list sizes.")
+    parser.add_argument("--iterations", type=int, default=50, help="Measured calls per scenario.")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured calls before each scenario.")
+    parser.add_argument("--alloc-iterations", type=int, default=5, help="Calls traced for allocations per scenario.")
+    parser.add_argument("--upstream-latency", type=float, default=0.0,
+                        help="Seconds the OpenWeather stand-in waits before answering.")
+    parser.add_argument("--output", help="File to write the JSON results to.")
+    args = parser.parse_args()
+
+    with OpenWeatherStub(latency=args.upstream_latency) as stub:
+        # Settings are read when the app's modules are imported, so set them first.
+        os.environ.update({
+            "OPENWEATHER_BASE_URL": stub.base_url,
+            "WEATHER_KEY": "benchmark",
+            "CACHE_BACKEND": "memory",
+            "LOG_LEVEL": "WARNING",
+        })
+        bench = Bench(stub, args.iterations, args.warmup, args.alloc_iterations)
+        for i, catalog_size in enumerate(parse_sizes(args.catalog)):
+            run_catalog(bench, catalog_size, parse_sizes(args.favorites), include_password=i == 0)
+
+    results = {
+        "benchmark": "hot_paths",
+        "revision": git_revision(PROJECT_DIR),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": bench.results,
+    }
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Local stand-in for the OpenWeather endpoints the app calls.
+
+Serves /data/2.5/weather, /data/2.5/forecast and /data/2.5/group with
+canned payloads shaped like OpenWeather's, and counts the calls made to each
+endpoint. Latency, jitter, a random error rate and 429 throttling above a
+request rate can be configured to mimic the real service. GET /__stats
+returns the counters as JSON.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+API_PREFIX = "/data/2.5/"
+
+# One forecast slot every 3 hours for 5 days, as OpenWeather returns.
+FORECAST_SLOTS = 40
+FORECAST_START = 1745971200  # 2025-04-30 00:00:00 UTC
+
+
+def weather_payload(lat: float, lon: float) -> dict:
+    return {"coord": {"lat": lat, "lon": lon}, "weather": [{"description": "clear sky"}], "main": {"temp": 18.0}}
+
+
+def forecast_payload(lat: float, lon: float) -> dict:
+    slots = []
+    for i in range(FORECAST_SLOTS):
+        dt = FORECAST_START + i * 3 * 3600
+        slots.append({
+            "dt": dt,
+            "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(dt)),
+            "main": {"temp": 15.0 + i % 8, "temp_min": 12.0 + i % 8, "temp_max": 18.0 + i % 8},
+            "pop": (i % 5) / 10,
+            "weather": [{"description": "light rain" if i % 3 else "clear sky"}],
+        })
+    return {"cnt": len(slots), "list": slots, "city": {"coord": {"lat": lat, "lon": lon}, "timezone": 0}}
+
+
+def group_payload(ids: list) -> dict:
+    return {"cnt": len(ids), "list": [{"id": i, "weather": [{"description": f"weather {i}"}]} for i in ids]}
+
+
+class OpenWeatherStub:
+    """A threaded HTTP server answering like OpenWeather, for benchmarks and load tests.
+
+    Use as a context manager; base_url is what OPENWEATHER_BASE_URL should be
+    set to while it runs.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        """Initializes the stub without starting it.
+
+        Args:
+            latency (float): Seconds to wait before answering each request.
+            jitter (float): Up to this many extra seconds, chosen uniformly per request.
+            error_rate (float): Fraction of requests answered with a 500.
+            rate_limit (float): Requests per second served before answering 429,
+                as OpenWeather does once a key's quota is used. 0 disables throttling.
+            host (str): Address to listen on.
+            port (int): Port to listen on; 0 picks a free one.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.calls = Counter()
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+        # Token bucket allowing bursts of up to one second's worth of requests.
+        self._tokens = rate_limit
+        self._refilled = time.monotonic()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX.rstrip('/')}"
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; with Nagle's algorithm and
+            # the client's delayed ACK, each keep-alive response stalls ~40 ms.
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/__stats":
+                    status, body = 200, stub.stats()
+                else:
+                    status, body = stub.respond(url.path, parse_qs(url.query))
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def respond(self, path: str, query: dict) -> tuple:
+        """Returns the status code and JSON body for a request.
+
+        Args:
+            path (str): The request path.
+            query (dict): The parsed query string.
+
+        Returns:
+            tuple: (status, body).
+        """
+        endpoint = path[len(API_PREFIX):] if path.startswith(API_PREFIX) else path
+        with self._lock:
+            self.calls[endpoint] += 1
+            throttled = not self._take_token()
+        if throttled:
+            status, body = 429, {"cod": 429, "message": "requests limitation exceeded"}
+        else:
+            delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+            if delay:
+                time.sleep(delay)
+            if self.error_rate and random.random() < self.error_rate:
+                status, body = 500, {"cod": "500", "message": "internal error"}
+            else:
+                status, body = self._payload(endpoint, query)
+        with self._lock:
+            self.statuses[status] += 1
+        return status, body
+
+    def _payload(self, endpoint: str, query: dict) -> tuple:
+        try:
+            if endpoint == "weather":
+                return 200, weather_payload(float(query["lat"][0]), float(query["lon"][0]))
+            if endpoint == "forecast":
+                return 200, forecast_payload(float(query["lat"][0]), float(query["lon"][0]))
+            if endpoint == "group":
+                return 200, group_payload([int(i) for i in query["id"][0].split(",")])
+        except (KeyError, ValueError):
+            return 400, {"cod": "400", "message": "bad query"}
+        return 404, {"cod": "404", "message": "not found"}
+
+    def _take_token(self) -> bool:
+        """Spends one token from the rate-limit bucket. Must be called with the lock held."""
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.rate_limit, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def stats(self) -> dict:
+        """Returns the calls per endpoint and responses per status code."""
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "statuses": {str(status): count for status, count in self.statuses.items()},
+                "total": sum(self.calls.values()),
+            }
+
+    def reset_calls(self) -> None:
+        """Zeroes the call and status counters."""
+        with self._lock:
+            self.calls.clear()
+            self.statuses.clear()
+
+    def total_calls(self) -> int:
+        """Returns the number of requests served since the last reset."""
+        with self._lock:
+            return sum(self.calls.values())
+
+    def start(self) -> "OpenWeatherStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "OpenWeatherStub":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,86 @@
+"""Startup-time benchmark for create_app().
+
+Each sample boots the app in a fresh interpreter, the way a gunicorn worker or
+a test session would, against a throwaway SQLite file. The first sample
+creates the schema; the rest find it current and skip create_all.
+
+    python benchmarks/startup.py --samples 10 --output startup.json
+
+Results are printed as JSON (and optionally written to --output) so runs from
+two commits can be compared.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that should only be imported on first use, not while booting.
+DEFERRED_MODULES = ("requests", "urllib3", "numpy")
+
+SAMPLE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - started,
+    "create_app_seconds": created - imported,
+    "loaded_deferred_modules": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def run_sample(database_url: str) -> dict:
+    """Boots the app once in a new interpreter and returns its timings."""
+    env = dict(os.environ, DATABASE_URL=database_url, LOG_LEVEL="WARNING")
+    result = subprocess.run(
+        [sys.executable, "-c", SAMPLE_SCRIPT % (DEFERRED_MODULES,)],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def summarize(values: list) -> dict:
+    """Returns the min, median and max of a list of timings."""
+    return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10, help="Warm boots to time after the first boot.")
+    parser.add_argument("--output", help="File to write the JSON results to.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'app.db')}"
+        first = run_sample(database_url)
+        warm = [run_sample(database_url) for _ in range(args.samples)]
+
+    results = {
+        "benchmark": "startup",
+        "python": sys.version.split()[0],
+        "first_boot": first,
+        "warm_boot": {
+            "samples": args.samples,
+            "import_seconds": summarize([s["import_seconds"] for s in warm]),
+            "create_app_seconds": summarize([s["create_app_seconds"] for s in warm]),
+            "loaded_deferred_modules": sorted({name for s in warm for name in s["loaded_deferred_modules"]}),
+        },
+    }
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
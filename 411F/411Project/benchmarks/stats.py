@@ -0,0 +1,42 @@
+"""Summary statistics shared by the benchmark scripts."""
+import math
+import statistics
+import subprocess
+from typing import Optional, Sequence
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Returns the nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(seconds: Sequence[float]) -> dict:
+    """Summarizes latencies in milliseconds.
+
+    Args:
+        seconds (Sequence[float]): One latency per request, in seconds.
+
+    Returns:
+        dict: count, mean, p50, p90, p99 and max, in milliseconds.
+    """
+    values = sorted(s * 1000 for s in seconds)
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+def git_revision(cwd: str) -> Optional[str]:
+    """Returns the current commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=cwd,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -1,5 +1,34 @@
 import os
 
+from weatherFolder.env import load_env
+
+load_env()
+
+
+DATABASE_URI = os.getenv('DATABASE_URL', "sqlite:////app/db/app.db")  # Production database URI from environment
+
+# Seconds a connection waits for SQLite's write lock before "database is locked".
+SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+
+# Writes are serialized by SQLite, so few write connections are needed; reads
+# run in parallel under WAL and get one connection per serving thread.
+SQLITE_WRITE_POOL_SIZE = int(os.getenv("SQLITE_WRITE_POOL_SIZE", "2"))
+SQLITE_READ_POOL_SIZE = int(os.getenv("SQLITE_READ_POOL_SIZE", "8"))
+SQLITE_POOL_TIMEOUT = float(os.getenv("SQLITE_POOL_TIMEOUT", "10"))
+
+
+def engine_options(uri: str, pool_size: int) -> dict:
+    """Engine options with a sized connection pool, plus SQLite's lock timeout for SQLite URIs."""
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": pool_size,
+        "pool_timeout": SQLITE_POOL_TIMEOUT,
+    }
+    if uri.startswith("sqlite"):
+        options["connect_args"] = {"timeout": SQLITE_BUSY_TIMEOUT, "check_same_thread": False}
+    return options
+
+
 class ProductionConfig():
     """Production configuration."""
     DEBUG = False
@@ -12,7 +41,18 @@ class ProductionConfig():
     SECRET_KEY = os.getenv("SECRET_KEY", "test-secret-key")  # Default secret key for testing
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_ECHO = False
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', "sqlite:////app/db/app.db")  # Production database URI from environment
+    SQLALCHEMY_DATABASE_URI = DATABASE_URI
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(DATABASE_URI, SQLITE_WRITE_POOL_SIZE)
+    # Read-only routes query through weatherFolder.db.read_session on this engine.
+    SQLALCHEMY_BINDS = {"read": dict(engine_options(DATABASE_URI, SQLITE_READ_POOL_SIZE), url=DATABASE_URI)}
+    # Run on every new connection. WAL lets readers proceed while a write is in progress.
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "busy_timeout": int(SQLITE_BUSY_TIMEOUT * 1000),
+        "synchronous": "NORMAL",
+        "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+        "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024))),
+    }
 
 class TestConfig():
     """Testing configuration."""
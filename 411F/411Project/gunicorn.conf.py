@@ -0,0 +1,59 @@
+"""Gunicorn settings for serving wsgi:app in production.
+
+Every value can be overridden from the environment.
+"""
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+
+# Worker processes use every core; threads per worker overlap upstream weather calls.
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+
+# Import the app once in the master so workers fork with it already loaded.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically to bound memory growth, staggered to avoid restarting together.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG") or None
+errorlog = "-"
+
+# Workers write metric snapshots here so /api/metrics can sum them. Unless
+# METRICS_DIR is set, each server gets its own 0700 directory, so other users
+# and other apps on the host can neither read nor plant snapshots. Set before
+# the app is imported, since the metrics module reads it at import.
+_created_metrics_dir = None
+if not os.getenv("METRICS_DIR"):
+    _created_metrics_dir = tempfile.mkdtemp(prefix="weather-metrics-")
+    os.environ["METRICS_DIR"] = _created_metrics_dir
+
+
+def on_starting(server):
+    """Drops metric snapshots left by a previous run of the server."""
+    from weatherFolder.utils.metrics import clear_metrics_dir
+
+    clear_metrics_dir()
+
+
+def on_exit(server):
+    """Removes the metrics directory created for this server."""
+    if _created_metrics_dir:
+        shutil.rmtree(_created_metrics_dir, ignore_errors=True)
+
+
+def post_fork(server, worker):
+    """Gives each worker its own database connections, HTTP and KDF pools and caches."""
+    from wsgi import init_worker
+
+    init_worker()
@@ -0,0 +1,240 @@
+"""Load-testing harness for a running server, built on the smoketest.py flow.
+
+Three commands:
+
+    # 1. A local OpenWeather stand-in; start the server with
+    #    OPENWEATHER_BASE_URL=http://127.0.0.1:8081/data/2.5
+    python loadtest.py stub --port 8081 --latency 0.05 --jitter 0.05 --error-rate 0.01 --rate-limit 50
+
+    # 2. A catalog of cities to import with "flask import-cities cities.csv"
+    python loadtest.py cities --count 500 --output cities.csv
+
+    # 3. The concurrent driver
+    python loadtest.py run --users 20 --favorites 10 --rate 100 --duration 30 --stub-url http://127.0.0.1:8081
+
+The driver creates and logs in --users users, gives each --favorites random
+cities, then sends requests at --rate per second (open loop) to the weather,
+forecast and all-cities routes. Latency is measured from when a request was
+scheduled, so queueing in the driver or the server counts against it. It
+reports throughput, per-route latency percentiles and status codes, and the
+upstream calls seen by the stand-in.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.openweather_stub import OpenWeatherStub
+from benchmarks.stats import latency_summary
+
+
+# Share of requests sent to each route.
+ROUTE_MIX = {"weather": 0.5, "forecast": 0.25, "all_cities": 0.25}
+
+
+class LoadUser:
+    """A logged-in user and its favorite cities."""
+
+    def __init__(self, username: str, cookies: dict, favorites: list):
+        self.username = username
+        self.cookies = cookies
+        self.favorites = favorites
+
+
+def parse_id_range(spec: str) -> list:
+    """Parses "1-100" or "1,5,9" into a list of city IDs."""
+    if "-" in spec:
+        first, last = spec.split("-", 1)
+        return list(range(int(first), int(last) + 1))
+    return [int(i) for i in spec.split(",") if i.strip()]
+
+
+def setup_user(base_url: str, username: str, password: str, city_ids: list, favorites: int) -> LoadUser:
+    """Creates (or reuses) a user, logs in and replaces its favorites.
+
+    Raises:
+        RuntimeError: If the user cannot log in or no favorite could be added.
+    """
+    session = requests.Session()
+    session.put(f"{base_url}/create-user", json={"username": username, "password": password})
+    login = session.post(f"{base_url}/login", json={"username": username, "password": password})
+    if login.status_code != 200:
+        raise RuntimeError(f"Login failed for {username}: {login.status_code} {login.text}")
+    session.delete(f"{base_url}/clear-favorites")
+
+    added = []
+    for city_id in random.sample(city_ids, min(len(city_ids), favorites * 2)):
+        if len(added) == favorites:
+            break
+        if session.post(f"{base_url}/add-to-favorite/{city_id}").status_code == 200:
+            added.append(city_id)
+    if not added:
+        raise RuntimeError(f"Could not add any favorites for {username}; import cities first")
+    return LoadUser(username, session.cookies.get_dict(), added)
+
+
+def fetch_stub_stats(stub_url: str) -> dict:
+    if not stub_url:
+        return {}
+    return requests.get(f"{stub_url.rstrip('/')}/__stats", timeout=5).json()
+
+
+def diff_stub_stats(before: dict, after: dict) -> dict:
+    """Returns the upstream calls and statuses counted between two /__stats snapshots."""
+    if not after:
+        return {}
+    diff = {}
+    for field in ("calls", "statuses"):
+        counts = Counter(after.get(field, {}))
+        counts.subtract(before.get(field, {}))
+        diff[field] = {key: count for key, count in counts.items() if count}
+    diff["total"] = after.get("total", 0) - before.get("total", 0)
+    return diff
+
+
+def run_load(args) -> dict:
+    """Sets up the users, drives load for the configured duration and returns the report."""
+    base_url = args.base_url.rstrip("/")
+    city_ids = parse_id_range(args.city_ids)
+    print(f"Setting up {args.users} users with {args.favorites} favorites each...", file=sys.stderr)
+    with ThreadPoolExecutor(max_workers=min(args.users, 16)) as pool:
+        users = list(pool.map(
+            lambda i: setup_user(base_url, f"load-user-{i}", "load-password", city_ids, args.favorites),
+            range(args.users)))
+
+    routes, weights = zip(*ROUTE_MIX.items())
+    latencies = defaultdict(list)
+    statuses = defaultdict(Counter)
+    lock = threading.Lock()
+    local = threading.local()
+
+    def send(route: str, user: LoadUser, scheduled: float) -> None:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        city_id = random.choice(user.favorites)
+        try:
+            if route == "weather":
+                response = session.get(f"{base_url}/get-weather-city/{city_id}", cookies=user.cookies, timeout=30)
+            elif route == "forecast":
+                response = session.post(f"{base_url}/get-forecast-city/{city_id}", cookies=user.cookies, timeout=30)
+            else:
+                response = session.get(f"{base_url}/get-all_cities_and_weather", cookies=user.cookies, timeout=30)
+            status = str(response.status_code)
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies[route].append(elapsed)
+            statuses[route][status] += 1
+
+    stub_before = fetch_stub_stats(args.stub_url)
+    print(f"Sending {args.rate} requests/s for {args.duration}s...", file=sys.stderr)
+    interval = 1.0 / args.rate
+    started = time.perf_counter()
+    sent = 0
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        while True:
+            scheduled = started + sent * interval
+            if scheduled - started >= args.duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route = random.choices(routes, weights)[0]
+            pool.submit(send, route, random.choice(users), scheduled)
+            sent += 1
+    elapsed = time.perf_counter() - started
+    stub_after = fetch_stub_stats(args.stub_url)
+
+    completed = sum(len(values) for values in latencies.values())
+    return {
+        "config": {key: value for key, value in vars(args).items() if key != "func"},
+        "requests": completed,
+        "seconds": elapsed,
+        "throughput_rps": completed / elapsed if elapsed else 0.0,
+        "latency_ms": latency_summary([value for values in latencies.values() for value in values]),
+        "routes": {
+            route: {"latency_ms": latency_summary(latencies[route]), "statuses": dict(statuses[route])}
+            for route in routes if latencies[route]
+        },
+        "upstream": diff_stub_stats(stub_before, stub_after),
+    }
+
+
+def run_command(args) -> None:
+    report = run_load(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+
+
+def stub_command(args) -> None:
+    stub = OpenWeatherStub(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                           rate_limit=args.rate_limit, host=args.host, port=args.port)
+    with stub:
+        print(f"OpenWeather stand-in serving {stub.base_url} (stats at /__stats); Ctrl-C to stop", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    print(json.dumps(stub.stats(), indent=2))
+
+
+def cities_command(args) -> None:
+    rng = random.Random(args.seed)
+    with open(args.output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "lat", "lon"])
+        for i in range(1, args.count + 1):
+            writer.writerow([f"Load City {i}", round(rng.uniform(-80, 80), 4), round(rng.uniform(-179, 179), 4)])
+    print(f"Wrote {args.count} cities to {args.output}", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Drive concurrent load against a running server.")
+    run.add_argument("--base-url", default="http://localhost:5000/api")
+    run.add_argument("--users", type=int, default=10)
+    run.add_argument("--favorites", type=int, default=5, help="Favorite cities per user.")
+    run.add_argument("--city-ids", default="1-100", help='City IDs to pick favorites from, e.g. "1-500".')
+    run.add_argument("--rate", type=float, default=50, help="Target requests per second.")
+    run.add_argument("--duration", type=float, default=30, help="Seconds of load.")
+    run.add_argument("--concurrency", type=int, default=64, help="Maximum requests in flight.")
+    run.add_argument("--stub-url", help="Root URL of the OpenWeather stand-in, for upstream call counts.")
+    run.add_argument("--output", help="File to write the JSON report to.")
+    run.set_defaults(func=run_command)
+
+    stub = commands.add_parser("stub", help="Serve the OpenWeather stand-in.")
+    stub.add_argument("--host", default="127.0.0.1")
+    stub.add_argument("--port", type=int, default=8081)
+    stub.add_argument("--latency", type=float, default=0.05, help="Seconds before each answer.")
+    stub.add_argument("--jitter", type=float, default=0.0, help="Up to this many extra seconds per answer.")
+    stub.add_argument("--error-rate", type=float, default=0.0, help="Fraction of answers that are 500s.")
+    stub.add_argument("--rate-limit", type=float, default=0.0, help="Requests/s before answering 429; 0 for none.")
+    stub.set_defaults(func=stub_command)
+
+    cities = commands.add_parser("cities", help="Write a CSV of cities for flask import-cities.")
+    cities.add_argument("--count", type=int, default=100)
+    cities.add_argument("--seed", type=int, default=0)
+    cities.add_argument("--output", default="cities.csv")
+    cities.set_defaults(func=cities_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
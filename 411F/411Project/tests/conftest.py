@@ -3,12 +3,14 @@ import pytest
 from app import create_app
 from config import TestConfig
 from weatherFolder.db import db
+from weatherFolder.models.cities_model import city_cache, reset_spatial_index, weather_cache
+from weatherFolder.models.favorites_model import forecast_cache
+from weatherFolder.models.user_model import user_cache
 
 @pytest.fixture
 def app():
     app = create_app(TestConfig)
     with app.app_context():
-        db.create_all()
         yield app
         db.session.remove()
         db.drop_all()
@@ -17,7 +19,25 @@ def app():
 def client(app):
     return app.test_client()
 
+@pytest.fixture
+def logged_in_client(app, client):
+    app.secret_key = "test-secret-key"
+    client.put("/api/create-user", json={"username": "tester", "password": "secret"})
+    client.post("/api/login", json={"username": "tester", "password": "secret"})
+    return client
+
 @pytest.fixture
 def session(app):
     with app.app_context():
-        yield db.session
\ No newline at end of file
+        yield db.session
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    caches = [city_cache, weather_cache, forecast_cache, user_cache]
+    for cache in caches:
+        cache.clear()
+    reset_spatial_index()
+    yield
+    for cache in caches:
+        cache.clear()
+    reset_spatial_index()
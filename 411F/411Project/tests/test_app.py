@@ -0,0 +1,204 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from weatherFolder.models.cities_model import Cities
+from weatherFolder.models.user_model import Users
+from weatherFolder.utils.kdf_pool import KDFPool
+
+
+@pytest.fixture
+def boston(session):
+    city = Cities(name="Boston", lat=42.36, lon=-71.06)
+    session.add(city)
+    session.commit()
+    return city
+
+
+# --- Password Hashing Load Shedding ---
+
+@pytest.fixture
+def saturated_kdf_pool():
+    """A KDF pool whose only slot is held by a blocked job, patched in for the user model."""
+    pool = KDFPool(kind="thread", size=1, max_pending=0, queue_timeout=0.05)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(5)
+
+    worker = threading.Thread(target=pool.run, args=(block,))
+    worker.start()
+    started.wait(1)
+    with patch("weatherFolder.models.user_model.get_kdf_pool", return_value=pool):
+        yield pool
+    release.set()
+    worker.join()
+    pool.close()
+
+
+@pytest.mark.parametrize("method, url, username", [("post", "/api/login", "tester"),
+                                                   ("put", "/api/create-user", "newcomer")])
+def test_busy_kdf_pool_sheds_with_503(client, session, saturated_kdf_pool, method, url, username):
+    """Test that login and sign-up answer 503 with Retry-After while password hashing is saturated."""
+    session.add(Users(username="tester", salt="salt", password="unused"))
+    session.commit()
+
+    response = getattr(client, method)(url, json={"username": username, "password": "secret"})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert response.json["status"] == "error"
+    assert saturated_kdf_pool.stats()["rejected"] == 1
+
+
+# --- Spatial Search ---
+
+def test_nearest_route(logged_in_client, boston):
+    """Test that the nearest route returns cities with their distance."""
+    response = logged_in_client.get("/api/cities/nearest?lat=42.3&lon=-71.0")
+
+    assert response.status_code == 200
+    assert response.json["cities"][0]["name"] == "Boston"
+    assert response.json["cities"][0]["distance_km"] < 10
+
+
+@pytest.mark.parametrize("url, message", [
+    ("/api/cities/nearest?lat=42.3", "lat and lon are required"),
+    ("/api/cities/nearest?lat=42.3&lon=east", "lat and lon are required"),
+    ("/api/cities/within?lat=42.3&lon=-71.0", "lat, lon and radius_km are required"),
+])
+def test_spatial_routes_require_parameters(logged_in_client, url, message):
+    """Test that missing or unparseable search parameters are a 400."""
+    response = logged_in_client.get(url)
+
+    assert response.status_code == 400
+    assert response.json == {"status": "error", "message": message}
+
+
+@pytest.mark.parametrize("query", ["lat=nan&lon=0", "lat=0&lon=inf", "lat=-inf&lon=0"])
+def test_nearest_route_rejects_non_finite_coordinates(logged_in_client, query):
+    """Test that NaN and infinite coordinates are a 400, not a search."""
+    response = logged_in_client.get(f"/api/cities/nearest?{query}")
+
+    assert response.status_code == 400
+    assert response.json["message"] == "lat and lon must be finite numbers"
+
+
+@pytest.mark.parametrize("query", ["lat=nan&lon=0&radius_km=10", "lat=0&lon=0&radius_km=nan",
+                                   "lat=0&lon=0&radius_km=inf"])
+def test_within_route_rejects_non_finite_values(logged_in_client, query):
+    """Test that NaN and infinite coordinates or radii are a 400, not a scan of every city."""
+    response = logged_in_client.get(f"/api/cities/within?{query}")
+
+    assert response.status_code == 400
+    assert response.json["message"] == "lat, lon and radius_km must be finite numbers"
+
+
+# --- Name Lookup ---
+
+@pytest.fixture
+def named_cities(session):
+    cities = [Cities(name=name, lat=0.0, lon=0.0) for name in ["Boston", "Bologna", "São Paulo", "Bosra"]]
+    session.add_all(cities)
+    session.commit()
+    return {city.name: city.id for city in cities}
+
+
+def test_autocomplete_route(logged_in_client, named_cities):
+    """Test that suggestions match the prefix ignoring case and accents, in name order, up to the limit."""
+    response = logged_in_client.get("/api/cities/autocomplete?q=BOS")
+    assert response.status_code == 200
+    assert [city["name"] for city in response.json["cities"]] == ["Bosra", "Boston"]
+
+    response = logged_in_client.get("/api/cities/autocomplete?q=sao p")
+    assert [city["id"] for city in response.json["cities"]] == [named_cities["São Paulo"]]
+
+    response = logged_in_client.get("/api/cities/autocomplete?q=bo&limit=2")
+    assert [city["name"] for city in response.json["cities"]] == ["Bologna", "Bosra"]
+
+
+def test_autocomplete_route_without_query(logged_in_client, named_cities):
+    """Test that an empty or missing prefix suggests nothing and a bad limit is a 400."""
+    assert logged_in_client.get("/api/cities/autocomplete").json["cities"] == []
+    assert logged_in_client.get("/api/cities/autocomplete?q=%20%20").json["cities"] == []
+
+    response = logged_in_client.get("/api/cities/autocomplete?q=bo&limit=0")
+    assert response.status_code == 400
+    assert response.json["status"] == "error"
+
+
+def test_add_to_favorite_by_name(logged_in_client, named_cities):
+    """Test that a name in the body is matched ignoring case and accents and wins over the path ID."""
+    response = logged_in_client.post(f"/api/add-to-favorite/{named_cities['Boston']}", json={"name": "SAO PAULO"})
+
+    assert response.status_code == 200
+    assert "São Paulo" in response.json["message"]
+
+
+def test_add_to_favorite_by_unknown_name(logged_in_client, named_cities):
+    """Test that a name that does not resolve is a 400 and adds nothing, even with a valid path ID."""
+    response = logged_in_client.post(f"/api/add-to-favorite/{named_cities['Boston']}", json={"name": "Atlantis"})
+
+    assert response.status_code == 400
+    assert response.json == {"status": "error", "message": "City with name 'Atlantis' not found."}
+    assert logged_in_client.get("/api/get-all_cities_and_weather").json["cities_weathers"] == []
+
+
+# --- Streamed Weather ---
+
+@pytest.fixture
+def favorites(logged_in_client, session):
+    cities = [Cities(name=name, lat=lat, lon=lat) for name, lat in [("Slow", 1.0), ("Fast", 2.0), ("Broken", 3.0)]]
+    session.add_all(cities)
+    session.commit()
+    for city in cities:
+        logged_in_client.post(f"/api/add-to-favorite/{city.id}")
+    return {city.name: city.id for city in cities}
+
+
+def test_all_cities_weather_streams_ndjson(logged_in_client, favorites):
+    """Test that NDJSON clients get one JSON object per line, in completion order, with failures as error lines."""
+    release = threading.Event()
+
+    def fetch(lat, lon):
+        if lat == 1.0:
+            release.wait(5)
+            return "fog"
+        if lat == 3.0:
+            raise Exception("upstream down")
+        return "sun"
+
+    with patch("weatherFolder.models.cities_model.fetch_weather", side_effect=fetch):
+        response = logged_in_client.get("/api/get-all_cities_and_weather", buffered=False,
+                                        headers={"Accept": "application/x-ndjson"})
+        assert response.status_code == 200
+        assert response.mimetype == "application/x-ndjson"
+
+        lines = iter(response.response)
+        early = [json.loads(next(lines)) for _ in range(2)]
+        # The slow city is still in flight, so both lines above were sent before it finished.
+        release.set()
+        late = [json.loads(line) for line in lines]
+        response.close()
+
+    assert {entry["name"] for entry in early} == {"Fast", "Broken"}
+    assert late == [{"id": favorites["Slow"], "name": "Slow", "lat": 1.0, "lon": 1.0, "owm_id": None,
+                     "weather": "fog"}]
+    by_name = {entry["name"]: entry for entry in early}
+    assert by_name["Fast"]["weather"] == "sun"
+    assert "weather" not in by_name["Broken"]
+    assert "upstream down" in by_name["Broken"]["error"]
+
+
+def test_all_cities_weather_defaults_to_json(logged_in_client, favorites):
+    """Test that clients that do not ask for NDJSON still get a single JSON document."""
+    with patch("weatherFolder.models.cities_model.fetch_weather", return_value="sun"):
+        response = logged_in_client.get("/api/get-all_cities_and_weather")
+
+    assert response.status_code == 200
+    assert response.mimetype == "application/json"
+    assert [entry["weather"] for entry in response.json["cities_weathers"]] == ["sun"] * 3
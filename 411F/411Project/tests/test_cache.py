@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from weatherFolder.utils.cache import TTLCache
+
+
+@pytest.fixture
+def cache():
+    return TTLCache(ttl=60, max_entries=2, stale_ttl=30, name="test")
+
+
+def test_get_or_load_caches_value(cache):
+    """Test that a loaded value is served from the cache on the next call."""
+    calls = []
+
+    def loader():
+        calls.append(1)
+        return "clear sky"
+
+    assert cache.get_or_load("boston", loader) == "clear sky"
+    assert cache.get_or_load("boston", loader) == "clear sky"
+    assert len(calls) == 1, "Expected the loader to run once."
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_loader_error_is_not_cached(cache):
+    """Test that a failing loader propagates and leaves nothing behind."""
+    def loader():
+        raise RuntimeError("upstream down")
+
+    with pytest.raises(RuntimeError, match="upstream down"):
+        cache.get_or_load("boston", loader)
+    assert len(cache) == 0
+
+
+def test_lru_eviction(cache):
+    """Test that the least recently used entry is evicted when the cache is full."""
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None, "Expected 'b' to be evicted."
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_reloaded():
+    """Test that an entry past its TTL and stale window is loaded again."""
+    cache = TTLCache(ttl=60, max_entries=10, stale_ttl=0)
+    cache.set("boston", "rain", expires_at=time.time() - 1)
+
+    assert cache.get_or_load("boston", lambda: "sun") == "sun"
+
+
+def test_stale_while_revalidate(cache):
+    """Test that a stale entry is served while one background refresh replaces it."""
+    cache.set("boston", "rain", expires_at=time.time() - 1)
+    refreshed = threading.Event()
+    calls = []
+
+    def loader():
+        calls.append(1)
+        refreshed.wait(1)
+        return "sun"
+
+    assert cache.get_or_load("boston", loader) == "rain"
+    assert cache.get_or_load("boston", loader) == "rain"
+    refreshed.set()
+
+    deadline = time.time() + 1
+    while cache.get("boston") != "sun" and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert cache.get("boston") == "sun"
+    assert len(calls) == 1, "Expected a single background refresh."
+    assert cache.stats()["stale_hits"] == 2
+
+
+def test_get_or_refresh(cache):
+    """Test that a miss returns None without loading and a stale entry is refreshed."""
+    assert cache.get_or_refresh("boston", lambda: "sun") is None
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 0
+
+    cache.set("boston", "rain", expires_at=time.time() - 1)
+    assert cache.get_or_refresh("boston", lambda: "sun") == "rain"
+
+    deadline = time.time() + 1
+    while cache.get("boston") != "sun" and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert cache.get("boston") == "sun"
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_invalidate_and_clear(cache):
+    """Test removing single entries and clearing the cache."""
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.invalidate("a")
+    assert cache.get("a") is None
+
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats()["misses"] == 1, "Clearing entries must not reset the cumulative counters."
+
+
+def test_max_entries_resizes_backend(cache):
+    """Test that changing max_entries on the cache changes the bound its backend evicts at."""
+    cache.max_entries = 1
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    assert len(cache) == 1
+    assert cache.backend.max_entries == 1
+
+    del cache.max_entries
+    assert cache.max_entries == 2
@@ -0,0 +1,134 @@
+import os
+import stat
+import time
+
+import pytest
+
+from weatherFolder.utils.cache import TTLCache
+from weatherFolder.utils import cache_backends
+from weatherFolder.utils.cache_backends import CacheEntry, MemoryBackend, SQLiteBackend, create_backend
+
+
+def _entry(value, version, ttl=60):
+    now = time.time()
+    return CacheEntry(value, now + ttl, now + ttl, version)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend(max_entries=2)
+    return SQLiteBackend(str(tmp_path / "cache.sqlite3"), "test", max_entries=2)
+
+
+def test_set_if_newer(backend):
+    """Test that an older version never replaces a newer one."""
+    assert backend.set("boston", _entry("sun", version=2))
+    assert not backend.set("boston", _entry("rain", version=1))
+    assert backend.get("boston").value == "sun"
+
+    assert backend.set("boston", _entry("snow", version=3))
+    assert backend.get("boston").value == "snow"
+
+
+def test_size_based_eviction(backend):
+    """Test that the store is trimmed back to max_entries."""
+    for i, key in enumerate(["a", "b", "c"]):
+        backend.set(key, _entry(i, version=i, ttl=60 + i))
+    if isinstance(backend, SQLiteBackend):
+        backend._evict(backend._connection())
+
+    assert len(backend) == 2
+    assert backend.get("a") is None, "Expected the oldest entry to be evicted."
+    assert backend.evictions == 1
+
+
+def test_delete_and_clear(backend):
+    """Test removing single entries and clearing the store."""
+    backend.set("a", _entry(1, version=1))
+    backend.set("b", _entry(2, version=1))
+    backend.delete("a")
+    assert backend.get("a") is None
+
+    backend.clear()
+    assert len(backend) == 0
+
+
+def test_sqlite_namespaces_are_separate(tmp_path):
+    """Test that caches sharing one file do not see each other's keys."""
+    path = str(tmp_path / "cache.sqlite3")
+    weather = SQLiteBackend(path, "weather", max_entries=10)
+    forecast = SQLiteBackend(path, "forecast", max_entries=10)
+
+    weather.set((42.36, -71.06), _entry("sun", version=1))
+
+    assert forecast.get((42.36, -71.06)) is None
+    assert weather.get((42.36, -71.06)).value == "sun"
+
+
+def test_sqlite_entries_are_shared_between_caches(tmp_path):
+    """Test that a value loaded by one worker's cache is served to another without loading."""
+    path = str(tmp_path / "cache.sqlite3")
+    first = TTLCache(ttl=60, max_entries=10, name="weather", backend=SQLiteBackend(path, "weather", 10))
+    second = TTLCache(ttl=60, max_entries=10, name="weather", backend=SQLiteBackend(path, "weather", 10))
+
+    first.get_or_load("boston", lambda: "clear sky")
+
+    assert second.get_or_load("boston", lambda: "fetched again") == "clear sky"
+    assert second.stats()["hits"] == 1
+
+
+def test_slow_load_does_not_overwrite_newer_value():
+    """Test that a load started before a newer write leaves the newer value in place."""
+    cache = TTLCache(ttl=60, max_entries=10)
+    started = time.time()
+    cache.set("boston", "fresh")
+
+    assert not cache.set("boston", "slow", version=started - 1)
+    assert cache.get("boston") == "fresh"
+
+
+def test_create_backend_rejects_unknown_kind():
+    """Test that an unsupported backend name is reported."""
+    with pytest.raises(ValueError, match="Unsupported cache backend: redis"):
+        create_backend("weather", 10, kind="redis")
+
+
+def test_sqlite_stores_json_in_a_private_file(tmp_path):
+    """Test that values round-trip as JSON and the file is only readable by its owner."""
+    path = str(tmp_path / "cache.sqlite3")
+    backend = SQLiteBackend(path, "forecast", max_entries=10)
+    forecast = {"daily": [{"date": "2025-04-30", "high": 21.5}]}
+
+    backend.set((42.36, -71.06), _entry(forecast, version=1))
+
+    assert backend.get((42.36, -71.06)).value == forecast
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_sqlite_ignores_values_not_stored_as_json(tmp_path):
+    """Test that a row in another format, such as a pickle, is a miss rather than being decoded."""
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), "weather", max_entries=10)
+    backend._connection().execute(
+        "INSERT INTO cache_entries VALUES (?, ?, ?, ?, ?, ?)",
+        ("weather", repr("boston"), b"\x80\x04\x95", time.time() + 60, time.time() + 60, 1),
+    )
+
+    assert backend.get("boston") is None
+
+
+def test_create_backend_requires_shared_cache_path(monkeypatch):
+    """Test that the sqlite backend refuses to start without a path for the shared file."""
+    monkeypatch.setattr(cache_backends, "SHARED_CACHE_PATH", None)
+
+    with pytest.raises(ValueError, match="SHARED_CACHE_PATH"):
+        create_backend("weather", 10, kind="sqlite")
+
+
+def test_default_shared_cache_path_is_next_to_database(monkeypatch, tmp_path):
+    """Test that the shared cache defaults to the SQLite database's directory."""
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'app.db'}")
+    assert cache_backends.default_shared_cache_path() == str(tmp_path / cache_backends.SHARED_CACHE_FILENAME)
+
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///:memory:")
+    assert cache_backends.default_shared_cache_path() is None
@@ -1,8 +1,16 @@
 #key : boxing = weatherFolder \ boxer_model = cities_model \ Boxers = Cities \
 
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlparse
+
 import pytest
 
-from weatherFolder.models.cities_model import Cities
+from weatherFolder.models import cities_model
+from weatherFolder.models.cities_model import Cities, city_cache, normalize_city_name, weather_cache, weather_cache_key
+from weatherFolder.utils.weather_client import WeatherClient
 from unittest.mock import patch, MagicMock
 
 # --- Fixtures ---
@@ -29,6 +37,36 @@ def sample_city2(session):
     session.commit()
     return city
 
+@pytest.fixture
+def group_stub():
+    """Local stand-in for OpenWeather's /group endpoint that records each request."""
+    requests_seen = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            ids = [int(i) for i in parse_qs(url.query)["id"][0].split(",")]
+            requests_seen.append((url.path, ids))
+            body = json.dumps({
+                "cnt": len(ids),
+                "list": [{"id": i, "weather": [{"description": f"weather {i}"}]} for i in ids if i != 404]
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield WeatherClient(base_url=f"http://127.0.0.1:{server.server_port}/data/2.5"), requests_seen
+    server.shutdown()
+    server.server_close()
+
 # --- Create City ---
 
 def test_create_city_success(session):
@@ -69,7 +107,7 @@ def test_get_city_by_id_error(app):
 
 # --- Get Weather ---
 
-@patch("requests.get")
+@patch("requests.Session.get")
 @patch("os.getenv", return_value="fake-api-key")
 def test_get_weather(mock_getenv, mock_requests_get, session):
     """Test that get_weather returns the correct weather description when API succeeds."""
@@ -86,7 +124,7 @@ def test_get_weather(mock_getenv, mock_requests_get, session):
 
     assert city.get_weather() == "light rain"
 
-@patch("requests.get")
+@patch("requests.Session.get")
 @patch("os.getenv", return_value="fake-api-key")
 def test_get_weather_error(mock_getenv, mock_requests_get, session):
     """Test that get_weather raises an Exception if the API call fails."""
@@ -99,4 +137,291 @@ def test_get_weather_error(mock_getenv, mock_requests_get, session):
     mock_requests_get.return_value = mock_response
 
     with pytest.raises(Exception, match="Error with"):
-        city.get_weather()
\ No newline at end of file
+        city.get_weather()
+@patch("requests.Session.get")
+def test_get_weather_is_cached(mock_requests_get, session):
+    """Test that repeated weather lookups for the same city only call the API once."""
+    city = Cities(name="Denver", lat=39.74, lon=-104.99)
+    session.add(city)
+    session.commit()
+
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.json.return_value = {
+        "weather": [{"description": "snow"}]
+    }
+    mock_requests_get.return_value = mock_response
+
+    assert city.get_weather() == "snow"
+    assert city.get_weather() == "snow"
+    assert mock_requests_get.call_count == 1
+
+# --- Batched Weather ---
+
+def test_get_weather_batch_uses_group_chunks(session, group_stub):
+    """Test that cities with OpenWeather IDs are fetched in chunks of 20 and mapped back."""
+    client, requests_seen = group_stub
+    cities = [Cities(name=f"City {i}", lat=float(i), lon=float(i), owm_id=1000 + i) for i in range(25)]
+    session.add_all(cities)
+    session.commit()
+
+    results = Cities.get_weather_batch(cities, client=client)
+
+    assert len(requests_seen) == 2, "Expected one group request per chunk."
+    assert sorted(len(ids) for _, ids in requests_seen) == [5, 20]
+    assert all(path == "/data/2.5/group" for path, _ in requests_seen)
+    assert results == {city.id: f"weather {city.owm_id}" for city in cities}
+    assert weather_cache.get(weather_cache_key(cities[0].lat, cities[0].lon)) == "weather 1000"
+
+
+def test_get_weather_batch_skips_cached_and_reports_missing(session, group_stub):
+    """Test that cached cities make no request and cities missing from the reply get an error."""
+    client, requests_seen = group_stub
+    cached = Cities(name="Cached", lat=1.0, lon=1.0, owm_id=1)
+    missing = Cities(name="Missing", lat=2.0, lon=2.0, owm_id=404)
+    session.add_all([cached, missing])
+    session.commit()
+    weather_cache.set(weather_cache_key(cached.lat, cached.lon), "sunny")
+
+    results = Cities.get_weather_batch([cached, missing], client=client)
+
+    assert requests_seen == [("/data/2.5/group", [404])]
+    assert results[cached.id] == "sunny"
+    assert isinstance(results[missing.id], Exception)
+
+
+def test_get_weather_batch_falls_back_without_owm_id(session):
+    """Test that cities without an OpenWeather ID are fetched one by one."""
+    city = Cities(name="Lonely", lat=3.0, lon=3.0)
+    session.add(city)
+    session.commit()
+
+    with patch.object(Cities, "get_weather", autospec=True, return_value="drizzle") as mock_get_weather:
+        results = Cities.get_weather_batch([city])
+
+    assert results == {city.id: "drizzle"}
+    mock_get_weather.assert_called_once_with(city)
+
+
+def test_get_weather_batch_serves_stale_and_refreshes(session, group_stub):
+    """Test that a stale cached city is served at once and refreshed in the background."""
+    client, requests_seen = group_stub
+    city = Cities(name="Stale", lat=4.0, lon=4.0, owm_id=4)
+    session.add(city)
+    session.commit()
+    key = weather_cache_key(city.lat, city.lon)
+    weather_cache.set(key, "fog", expires_at=time.time() - 1)
+
+    with patch("weatherFolder.models.cities_model.fetch_weather", return_value="clear sky") as mock_fetch:
+        results = Cities.get_weather_batch([city], client=client)
+
+        deadline = time.time() + 1
+        while weather_cache.get(key) != "clear sky" and time.time() < deadline:
+            time.sleep(0.01)
+
+    assert results == {city.id: "fog"}
+    assert requests_seen == [], "A stale entry should not wait for a group request."
+    assert weather_cache.get(key) == "clear sky"
+    mock_fetch.assert_called_once_with(city.lat, city.lon)
+
+
+def test_concurrent_group_calls_are_shared(session):
+    """Test that concurrent /group calls for the same cities make one upstream request."""
+    cities = [Cities(name=f"City {i}", lat=float(i), lon=float(i), owm_id=2000 + i) for i in range(3)]
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def request_group(chunk, client):
+        calls.append([city.owm_id for city in chunk])
+        release.wait(1)
+        return {city.owm_id: "mist" for city in chunk}
+
+    collapsed = cities_model.weather_flight.stats()["collapsed"]
+    with patch("weatherFolder.models.cities_model._request_weather_group", side_effect=request_group):
+        threads = [threading.Thread(target=lambda: results.append(cities_model.fetch_weather_group(cities, None)))
+                   for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        while cities_model.weather_flight.stats()["collapsed"] < collapsed + 2:
+            time.sleep(0.005)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert calls == [[2000, 2001, 2002]], "Expected a single upstream group request."
+    assert results == [{2000: "mist", 2001: "mist", 2002: "mist"}] * 3
+
+# --- Get Cities by IDs ---
+
+def test_get_cities_by_ids(session, sample_city1, sample_city2):
+    """Test retrieving several cities at once, skipping unknown IDs."""
+    cities = Cities.get_cities_by_ids([sample_city1.id, sample_city2.id, 99999])
+    assert set(cities) == {sample_city1.id, sample_city2.id}
+    assert cities[sample_city2.id].name == "Province of Turin"
+
+def test_get_cities_by_ids_empty(session):
+    """Test that an empty ID list returns an empty mapping."""
+    assert Cities.get_cities_by_ids([]) == {}
+
+# --- City Cache ---
+
+def test_get_city_by_id_is_cached(session, sample_city1):
+    """Test that a second lookup of the same city does not query the database."""
+    first = Cities.get_city_by_id(sample_city1.id)
+
+    with patch.object(session, "get") as mock_get:
+        second = Cities.get_city_by_id(sample_city1.id)
+
+    mock_get.assert_not_called()
+    assert first is second
+    assert second.to_dict() == {"id": sample_city1.id, "name": "Boston", "lat": 52.97, "lon": -0.02, "owm_id": None}
+
+def test_city_cache_invalidated_on_update(session, sample_city1):
+    """Test that updating a city through the ORM drops the stale cache entry."""
+    assert Cities.get_city_by_id(sample_city1.id).name == "Boston"
+
+    sample_city1.name = "Boston, UK"
+    session.commit()
+
+    assert Cities.get_city_by_id(sample_city1.id).name == "Boston, UK"
+
+def test_city_cache_invalidated_on_commit_not_flush(session, sample_city1):
+    """Test that a flushed change only drops the cache entry once it is committed."""
+    Cities.get_city_by_id(sample_city1.id)
+
+    sample_city1.name = "Boston, UK"
+    session.flush()
+    assert city_cache.get(sample_city1.id) is not None, "A flushed but uncommitted change must not invalidate yet."
+
+    session.commit()
+    assert city_cache.get(sample_city1.id) is None
+
+def test_city_cache_kept_on_rollback(session, sample_city1):
+    """Test that a rolled-back change leaves the cache entry and no pending invalidation."""
+    Cities.get_city_by_id(sample_city1.id)
+
+    sample_city1.name = "Boston, UK"
+    session.flush()
+    session.rollback()
+    session.commit()
+
+    assert city_cache.get(sample_city1.id) is not None
+    assert Cities.get_city_by_id(sample_city1.id).name == "Boston"
+
+def test_city_cache_is_bounded(session):
+    """Test that the city cache evicts old records once it is full."""
+    cities = [Cities(name=f"City {i}", lat=0.0, lon=0.0) for i in range(5)]
+    session.add_all(cities)
+    session.commit()
+
+    with patch.object(city_cache, "max_entries", 3):
+        Cities.get_cities_by_ids(city.id for city in cities)
+        assert len(city_cache) == 3
+
+# --- Spatial Search ---
+
+def test_find_nearest(session, sample_city1, sample_city2):
+    """Test finding the closest cities to a location."""
+    matches = Cities.find_nearest(45.0, 7.0, k=2)
+    assert [city.name for city, _ in matches] == ["Province of Turin", "Boston"]
+    assert matches[0][1] < matches[1][1]
+
+def test_find_nearest_sees_new_cities(session, sample_city1):
+    """Test that cities created after the index is built are found."""
+    Cities.find_nearest(0.0, 0.0)
+    Cities.create_city("Null Island", lat=0.1, lon=0.1)
+
+    city, distance = Cities.find_nearest(0.0, 0.0)[0]
+    assert city.name == "Null Island"
+    assert distance == pytest.approx(15.7, abs=0.1)
+
+def test_find_within(session, sample_city1, sample_city2):
+    """Test finding the cities within a radius."""
+    matches = Cities.find_within(45.0, 7.0, radius_km=100)
+    assert [city.name for city, _ in matches] == ["Province of Turin"]
+
+@pytest.fixture
+def index_build_in_progress(monkeypatch):
+    """Makes the spatial index look like it is still being built in the background."""
+    done = threading.Event()
+    build = threading.Thread(target=done.wait, daemon=True)
+    build.start()
+    monkeypatch.setattr(cities_model, "_spatial_index_build", build)
+    yield
+    done.set()
+
+def test_searches_scan_table_while_index_builds(session, sample_city1, sample_city2, index_build_in_progress):
+    """Test that searches answer from the table, not by waiting, while the index is built."""
+    Cities.create_city("Null Island", lat=0.1, lon=179.9)
+
+    assert cities_model.get_spatial_index() is None
+    nearest = Cities.find_nearest(45.0, 7.0, k=2)
+    assert [city.name for city, _ in nearest] == ["Province of Turin", "Boston"]
+    assert [city.name for city, _ in Cities.find_within(0.0, -179.9, radius_km=50)] == ["Null Island"]
+    assert [city.name for city, _ in Cities.find_nearest(-89.0, 0.0, k=5)] == ["Null Island", "Province of Turin",
+                                                                               "Boston"]
+
+def test_start_spatial_index_build(app, session, sample_city1):
+    """Test that a background build installs the index for later searches."""
+    cities_model.start_spatial_index_build(app).join(timeout=10)
+
+    assert sample_city1.id in cities_model.get_spatial_index()
+
+def test_find_nearest_invalid(session):
+    """Test that out-of-range coordinates raise ValueError."""
+    with pytest.raises(ValueError, match="out of range"):
+        Cities.find_nearest(91.0, 0.0)
+    with pytest.raises(ValueError, match="Radius"):
+        Cities.find_within(0.0, 0.0, radius_km=0)
+
+@pytest.mark.parametrize("radius_km", [float("nan"), float("inf")])
+def test_find_within_rejects_non_finite_radius(session, radius_km):
+    """Test that a NaN or infinite radius raises ValueError instead of scanning every city."""
+    with pytest.raises(ValueError, match="Radius"):
+        Cities.find_within(0.0, 0.0, radius_km=radius_km)
+
+@pytest.mark.parametrize("lat, lon", [(float("nan"), 0.0), (0.0, float("inf"))])
+def test_find_nearest_rejects_non_finite_coordinates(session, lat, lon):
+    """Test that NaN or infinite coordinates raise ValueError."""
+    with pytest.raises(ValueError, match="finite"):
+        Cities.find_nearest(lat, lon)
+
+# --- Name Lookup ---
+
+def test_normalize_city_name():
+    """Test that names fold case, accents and whitespace."""
+    assert normalize_city_name("  São   Paulo ") == "sao paulo"
+    assert normalize_city_name("ZÜRICH") == "zurich"
+
+def test_get_city_by_name(session, sample_city1):
+    """Test retrieving a city by name regardless of case and accents."""
+    Cities.create_city("Montréal", lat=45.50, lon=-73.57)
+
+    assert Cities.get_city_by_name("boston").id == sample_city1.id
+    assert Cities.get_city_by_name("MONTREAL").name == "Montréal"
+
+def test_get_city_by_name_prefers_exact_match(session):
+    """Test that an exact name wins when several cities share a normalized name."""
+    Cities.create_city("Sao Paulo", lat=-23.55, lon=-46.63)
+    Cities.create_city("São Paulo", lat=-23.55, lon=-46.64)
+
+    assert Cities.get_city_by_name("São Paulo").name == "São Paulo"
+    assert Cities.get_city_by_name("sao paulo").name == "Sao Paulo"
+
+def test_get_city_by_name_not_found(session):
+    """Test that an unknown name raises ValueError."""
+    with pytest.raises(ValueError, match="not found"):
+        Cities.get_city_by_name("Atlantis")
+
+def test_autocomplete(session):
+    """Test prefix suggestions in normalized-name order, bounded by the limit."""
+    for name in ["Bogotá", "Boston", "Bologna", "Bonn", "Berlin"]:
+        Cities.create_city(name, lat=0.0, lon=0.0)
+
+    assert [c.name for c in Cities.autocomplete("bo")] == ["Bogotá", "Bologna", "Bonn", "Boston"]
+    assert [c.name for c in Cities.autocomplete("BOG")] == ["Bogotá"]
+    assert [c.name for c in Cities.autocomplete("bo", limit=2)] == ["Bogotá", "Bologna"]
+    assert Cities.autocomplete("") == []
+    with pytest.raises(ValueError):
+        Cities.autocomplete("bo", limit=0)
@@ -0,0 +1,87 @@
+import pytest
+
+from weatherFolder.models.cities_model import Cities
+from weatherFolder.utils.city_importer import import_cities, iter_city_rows, validate_city_row
+
+
+GEONAMES_ROWS = [
+    ["2643743", "London", "London", "", "51.50853", "-0.12574", "P", "PPLC", "GB"],
+    ["5128581", "New York City", "New York City", "", "40.71427", "-74.00597", "P", "PPL", "US"],
+    ["1850147", "Tokyo", "Tokyo", "", "35.6895", "139.69171", "P", "PPLC", "JP"],
+    ["0", "Nowhere", "Nowhere", "", "123.0", "10.0", "P", "PPL", "XX"],
+    ["2643743", "London", "London", "", "51.5", "-0.1", "P", "PPLC", "GB"],
+]
+
+
+@pytest.fixture
+def geonames_file(tmp_path):
+    path = tmp_path / "cities15000.txt"
+    path.write_text("\n".join("\t".join(row) for row in GEONAMES_ROWS) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_iter_city_rows_geonames(geonames_file):
+    """Test that GeoNames rows are streamed with their name and coordinates."""
+    rows = iter_city_rows(geonames_file)
+    assert next(rows) == {"name": "London", "lat": "51.50853", "lon": "-0.12574", "owm_id": "2643743"}
+    assert len(list(rows)) == 4
+
+
+def test_validate_city_row():
+    """Test that coordinates are converted and range-checked."""
+    assert validate_city_row({"name": " Oslo ", "lat": "59.9", "lon": "10.7"}) == {"name": "Oslo", "name_key": "oslo", "lat": 59.9, "lon": 10.7, "owm_id": None}
+    assert validate_city_row({"name": "Oslo", "lat": "59.9", "lon": "10.7", "owm_id": "3143244"})["owm_id"] == 3143244
+    with pytest.raises(ValueError, match="Invalid owm_id"):
+        validate_city_row({"name": "Oslo", "lat": "59.9", "lon": "10.7", "owm_id": "oslo"})
+    with pytest.raises(ValueError, match="out of range"):
+        validate_city_row({"name": "Nowhere", "lat": "123", "lon": "0"})
+    with pytest.raises(ValueError, match="Invalid coordinates"):
+        validate_city_row({"name": "Nowhere", "lat": "north", "lon": "0"})
+    with pytest.raises(ValueError, match="empty"):
+        validate_city_row({"name": "", "lat": "1", "lon": "1"})
+
+
+def test_import_cities_batches_and_upserts(session, geonames_file):
+    """Test importing in several batches, skipping bad rows and upserting on name."""
+    stats = import_cities(geonames_file, batch_size=2)
+
+    assert stats["read"] == 5
+    assert stats["imported"] == 4
+    assert stats["skipped"] == 1
+    assert stats["rows_per_second"] > 0
+
+    cities = {city.name: city for city in session.query(Cities).all()}
+    assert set(cities) == {"London", "New York City", "Tokyo"}
+    assert (cities["London"].lat, cities["London"].lon) == (51.5, -0.1), "Later rows should update coordinates."
+    assert cities["Tokyo"].owm_id == 1850147, "The GeoNames ID should be stored as the OpenWeather ID."
+
+
+def test_import_cities_csv(session, tmp_path):
+    """Test importing a CSV file with a name,lat,lon header."""
+    path = tmp_path / "cities.csv"
+    path.write_text("name,lat,lon\nBoston,42.36,-71.06\nMiami,25.76,-80.19\n", encoding="utf-8")
+
+    stats = import_cities(str(path))
+
+    assert stats["imported"] == 2
+    assert session.query(Cities).filter_by(name="Miami").first().lat == 25.76
+
+
+def test_import_cities_csv_keeps_owm_id(session, tmp_path):
+    """Test that a CSV without owm_id values does not clear IDs stored earlier."""
+    path = tmp_path / "cities.csv"
+    path.write_text("name,lat,lon,owm_id\nBoston,42.36,-71.06,4930956\n", encoding="utf-8")
+    import_cities(str(path))
+    path.write_text("name,lat,lon\nBoston,42.4,-71.1\n", encoding="utf-8")
+    import_cities(str(path))
+
+    boston = session.query(Cities).filter_by(name="Boston").first()
+    assert (boston.lat, boston.owm_id) == (42.4, 4930956)
+
+
+def test_import_cities_cli(app, geonames_file):
+    """Test the import-cities CLI command."""
+    result = app.test_cli_runner().invoke(args=["import-cities", geonames_file, "--batch-size", "10"])
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 4 cities (1 skipped)" in result.output
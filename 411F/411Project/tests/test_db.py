@@ -0,0 +1,137 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+
+from app import create_app
+from config import engine_options
+from weatherFolder.db import READ_BIND, SCHEMA_VERSION, db, ensure_schema, read_session
+from weatherFolder.models.cities_model import Cities
+
+
+@pytest.fixture
+def file_app(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'app.db'}"
+
+    class FileConfig:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = uri
+        SQLALCHEMY_ENGINE_OPTIONS = engine_options(uri, 2)
+        SQLALCHEMY_BINDS = {"read": dict(engine_options(uri, 4), url=uri)}
+        SQLITE_PRAGMAS = {"journal_mode": "WAL", "busy_timeout": 5000, "synchronous": "NORMAL"}
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        yield app
+        db.session.remove()
+    # init_app registers a metadata per bind on the shared db object; apps
+    # created later without the bind would fail on it in create_all/drop_all.
+    db.metadatas.pop(READ_BIND, None)
+
+
+def test_pragmas_are_applied(file_app):
+    """Test that every connection runs the configured pragmas."""
+    assert db.session.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    assert db.session.execute(text("PRAGMA busy_timeout")).scalar() == 5000
+    # NORMAL is synchronous level 1.
+    assert db.session.execute(text("PRAGMA synchronous")).scalar() == 1
+
+
+def test_read_session_sees_committed_writes(file_app):
+    """Test that the read engine sees rows committed through the write session."""
+    db.session.add(Cities(name="Boston", lat=42.36, lon=-71.06))
+    db.session.commit()
+
+    with read_session() as session:
+        assert session.execute(db.select(Cities.name)).scalar() == "Boston"
+
+
+def test_read_session_rejects_writes(file_app):
+    """Test that the read engine is query-only."""
+    with read_session() as session:
+        with pytest.raises(OperationalError, match="readonly"):
+            session.execute(db.insert(Cities).values(name="Boston", name_key="boston", lat=42.36, lon=-71.06))
+
+
+def test_read_session_falls_back_to_default_session(app):
+    """Test that without a read bind, reads use db.session."""
+    with read_session() as session:
+        assert session is db.session
+
+
+def test_ensure_schema_skips_current_database(app):
+    """Test that a database already at SCHEMA_VERSION is left alone."""
+    assert db.session.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+    assert ensure_schema() is False
+
+
+def test_ensure_schema_upgrades_unversioned_database(app):
+    """Test that a database without a version gets its tables and the current version."""
+    db.drop_all()
+    db.session.execute(text("PRAGMA user_version = 0"))
+    db.session.commit()
+
+    assert ensure_schema() is True
+    assert inspect(db.engine).has_table("favorites")
+    assert db.session.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+
+
+def test_ensure_schema_rejects_newer_database(app):
+    """Test that a database written by a newer schema version is refused."""
+    db.session.execute(text(f"PRAGMA user_version = {SCHEMA_VERSION + 1}"))
+    db.session.commit()
+
+    with pytest.raises(RuntimeError, match="newer than supported"):
+        ensure_schema()
+
+
+# The cities and users tables as the original release created them, before
+# name_key, owm_id and the favorites table existed.
+BASELINE_SCHEMA = """
+CREATE TABLE cities (id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, name VARCHAR NOT NULL UNIQUE,
+                     lat FLOAT NOT NULL, lon FLOAT NOT NULL);
+CREATE TABLE users (id INTEGER NOT NULL PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE,
+                    salt VARCHAR(32) NOT NULL, password VARCHAR(64) NOT NULL);
+INSERT INTO cities (name, lat, lon) VALUES ('São  Paulo', -23.55, -46.63);
+"""
+
+
+@pytest.mark.parametrize("stored_version", [0, 1])
+def test_ensure_schema_migrates_baseline_database(tmp_path, stored_version):
+    """Test that a database from the original release gets the new columns, indexes and tables.
+
+    Version 1 covers databases stamped by the earlier upgrade that only ran create_all.
+    """
+    path = tmp_path / "app.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    if stored_version == 1:
+        # That upgrade did create the favorites table, here without its unique index.
+        conn.executescript("""
+            INSERT INTO users VALUES (1, 'alice', 'salt', 'hash');
+            CREATE TABLE favorites (id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+                                    user_id INTEGER NOT NULL, city_id INTEGER NOT NULL);
+            INSERT INTO favorites (user_id, city_id) VALUES (1, 1), (1, 1);
+        """)
+    conn.execute(f"PRAGMA user_version = {stored_version}")
+    conn.close()
+
+    class BaselineConfig:
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+
+    app = create_app(BaselineConfig)
+    with app.app_context():
+        try:
+            city = Cities.get_city_by_name("sao paulo")
+            assert city.name == "São  Paulo"
+            assert city.owm_id is None
+
+            indexes = {index["name"] for table in ("cities", "favorites")
+                       for index in inspect(db.engine).get_indexes(table)}
+            assert {"ix_cities_name_key", "ix_favorites_user_city"} <= indexes
+            assert db.session.execute(text("PRAGMA user_version")).scalar() == SCHEMA_VERSION
+            assert db.session.execute(text("SELECT COUNT(*) FROM favorites")).scalar() == stored_version
+        finally:
+            db.session.remove()
@@ -1,17 +1,26 @@
 import time
 
 import pytest
+from sqlalchemy import event
 
-from weatherFolder.models.favorites_model import FavoritesModel
-from weatherFolder.models.cities_model import Cities
+from weatherFolder.db import db
+from weatherFolder.models.favorites_model import Favorites, FavoritesModel, next_forecast_step
+from weatherFolder.models.cities_model import Cities, CityRecord
+from weatherFolder.models.user_model import Users
 from unittest.mock import patch, MagicMock
 
 @pytest.fixture
-def favorites_model():
-    """Fixture to provide a new instance of FavoritesModel for each test.
+def favorites_model(session):
+    """Fixture to provide a new instance of FavoritesModel for a fresh user in each test.
 
     """
-    return FavoritesModel()
+    Users.create_user("testuser", "securepassword123")
+    return FavoritesModel(Users.get_id_by_username("testuser"))
+
+def set_favorites(favorites_model, city_ids):
+    """Store the given city IDs as the user's favorites."""
+    db.session.add_all(Favorites(user_id=favorites_model.user_id, city_id=city_id) for city_id in city_ids)
+    db.session.commit()
 
 # Fixtures providing sample boxers
 @pytest.fixture
@@ -57,7 +66,7 @@ def test_clear_favorites(favorites_model):
     """Test that clear_favorites empties the favorites.
 
     """
-    favorites_model.favorites = [1, 2]  # Assuming boxer IDs 1 and 2 are in the favorites)
+    set_favorites(favorites_model, [1, 2])  # Assuming city IDs 1 and 2 are in the favorites
 
     favorites_model.clear_favorites()
 
@@ -78,16 +87,15 @@ def test_get_cities_empty(favorites_model):
     """Test that get_cities returns an empty list when there are no city and logs a warning.
 
     """
-    favorites_model.favorites = []
     assert favorites_model.get_all_cities_and_weather() == [], "Expected get_cities to return an empty list when there are no cities."
 
 @patch("weatherFolder.models.cities_model.Cities.get_city_by_id")
-@patch("requests.get")
+@patch("requests.Session.get")
 @patch("os.getenv", return_value="fake-key")
 def test_get_cities_with_data(mock_getenv, mock_requests_get, mock_get_city_by_id, favorites_model, sample_city1, sample_city2):
     """Test that get_all_cities_and_weather returns the correct (city, weather) tuples."""
 
-    favorites_model.favorites = [sample_city1.id, sample_city2.id]
+    set_favorites(favorites_model, [sample_city1.id, sample_city2.id])
 
     mock_get_city_by_id.side_effect = [sample_city1, sample_city2]
 
@@ -107,6 +115,71 @@ def test_get_cities_with_data(mock_getenv, mock_requests_get, mock_get_city_by_i
 
     assert [(c.name, w) for c, w in result] == [(c.name, w) for c, w in expected], "Expected correct cities and weather"
 
+def test_get_cities_preserves_order_and_reports_errors(favorites_model, sample_city1, sample_city2):
+    """Test that concurrent weather lookups keep favorites order and report failures inline."""
+
+    set_favorites(favorites_model, [sample_city1.id, sample_city2.id])
+
+    def fake_get_weather(city):
+        if city.name == "Boston":
+            time.sleep(0.05)
+            return "clear sky"
+        raise Exception("Weather API call failed")
+
+    with patch.object(CityRecord, "get_weather", autospec=True, side_effect=fake_get_weather):
+        result = favorites_model.get_all_cities_and_weather(max_workers=2)
+
+    assert [c.name for c, _ in result] == ["Boston", "Province of Turin"], "Expected favorites order."
+    assert result[0][1] == "clear sky"
+    assert isinstance(result[1][1], Exception), "Expected the failure to be reported inline."
+
+def test_get_cities_runs_concurrently(favorites_model, sample_city1, sample_city2):
+    """Test that weather lookups for several cities overlap instead of running back to back."""
+
+    set_favorites(favorites_model, [sample_city1.id, sample_city2.id])
+
+    def slow_get_weather(city):
+        time.sleep(0.2)
+        return "fog"
+
+    with patch.object(CityRecord, "get_weather", autospec=True, side_effect=slow_get_weather):
+        start = time.monotonic()
+        result = favorites_model.get_all_cities_and_weather(max_workers=2)
+        elapsed = time.monotonic() - start
+
+    assert [w for _, w in result] == ["fog", "fog"]
+    assert elapsed < 0.35, f"Expected overlapping calls, took {elapsed:.2f}s"
+
+def test_iter_cities_streams_in_completion_order(favorites_model, sample_city1, sample_city2):
+    """Test that streamed cities arrive as their lookups finish, not in favorites order."""
+
+    set_favorites(favorites_model, [sample_city1.id, sample_city2.id])
+
+    def fake_get_weather(city):
+        if city.name == "Boston":
+            time.sleep(0.2)
+            return "clear sky"
+        return "fog"
+
+    with patch.object(CityRecord, "get_weather", autospec=True, side_effect=fake_get_weather):
+        stream = favorites_model.iter_cities_and_weather(max_workers=2)
+        start = time.monotonic()
+        first_city, first_weather = next(stream)
+        first_elapsed = time.monotonic() - start
+        rest = list(stream)
+
+    assert (first_city.name, first_weather) == ("Province of Turin", "fog")
+    assert first_elapsed < 0.15, f"Expected the fast city first, took {first_elapsed:.2f}s"
+    assert [(c.name, w) for c, w in rest] == [("Boston", "clear sky")]
+
+def test_iter_cities_missing_city_raises_before_streaming(favorites_model):
+    """Test that a missing favorite city fails before any record is streamed."""
+
+    set_favorites(favorites_model, [9999])
+
+    with pytest.raises(ValueError, match="City with ID 9999 not found."):
+        favorites_model.iter_cities_and_weather()
+
 def test_add_to_favorite(favorites_model, sample_city1):
     """Test that a city is correctly added to the favorites.
 
@@ -117,20 +190,67 @@ def test_add_to_favorite(favorites_model, sample_city1):
     assert favorites_model.favorites[0]== 1, "Expected 'Boston' in the favorite."
 
 def test_add_to_favorite_full(favorites_model):
-    """Test that add_to_favorite raises an error when the favorites is full.
+    """Test that add_to_favorite raises an error for a city that does not exist.
 
     """
-    favorites_model.favorites = [1, 2]
+    set_favorites(favorites_model, [1, 2])
 
-    with pytest.raises(RuntimeError):
+    with pytest.raises(ValueError):
         favorites_model.add_to_favorite(3)
 
     assert len(favorites_model.favorites) == 2, "Favorites should still contain only the two cities."
 
-@patch("requests.get") 
+def test_add_to_favorite_duplicate(favorites_model, sample_city1):
+    """Test that adding the same city twice raises ValueError."""
+    favorites_model.add_to_favorite(sample_city1.id)
+
+    with pytest.raises(ValueError, match="already in the favorites"):
+        favorites_model.add_to_favorite(sample_city1.id)
+
+    assert favorites_model.favorites == [sample_city1.id]
+
+def test_add_to_favorite_query_count_is_constant(favorites_model, session):
+    """Test that adding a favorite costs a fixed number of queries however long the list is."""
+    cities = [Cities(name=f"City {i}", lat=float(i), lon=float(i)) for i in range(30)]
+    session.add_all(cities)
+    session.commit()
+    set_favorites(favorites_model, [city.id for city in cities[:-1]])
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        FavoritesModel(favorites_model.user_id).add_to_favorite(cities[-1].id)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    # City lookup, insert, favorites list load and one bulk lookup of the logged names.
+    assert len(statements) <= 4, f"Expected at most 4 queries, got {len(statements)}"
+
+def test_favorites_persist_per_user(favorites_model, sample_city1, sample_city2):
+    """Test that favorites are stored per user and reload from the database."""
+    Users.create_user("otheruser", "otherpassword")
+    other_model = FavoritesModel(Users.get_id_by_username("otheruser"))
+
+    favorites_model.add_to_favorite(sample_city1.id)
+    favorites_model.add_to_favorite(sample_city2.id)
+    other_model.add_to_favorite(sample_city2.id)
+
+    assert FavoritesModel(favorites_model.user_id).favorites == [sample_city1.id, sample_city2.id]
+    assert FavoritesModel(other_model.user_id).favorites == [sample_city2.id]
+    assert FavoritesModel(other_model.user_id).is_favorite(sample_city2.id)
+    assert not FavoritesModel(other_model.user_id).is_favorite(sample_city1.id)
+
+    other_model.clear_favorites()
+    assert FavoritesModel(favorites_model.user_id).favorites == [sample_city1.id, sample_city2.id]
+    assert FavoritesModel(other_model.user_id).favorites == []
+
+@patch("requests.Session.get") 
 def test_get_weather_city(mock_get, favorites_model, sample_city1):
     """Test that get_weather_city returns mocked weather description."""
-    favorites_model.favorites = [sample_city1.id]
+    set_favorites(favorites_model, [sample_city1.id])
 
     mock_response = MagicMock()
     mock_response.status_code = 200
@@ -145,7 +265,7 @@ def test_get_weather_city(mock_get, favorites_model, sample_city1):
 
 def test_get_weather_city_error(favorites_model, sample_city1):
     """Test that get_weather_city raises ValueError for invalid ID and returns a valid string for a valid city."""
-    favorites_model.favorites = [1, 2]
+    set_favorites(favorites_model, [1, 2])
 
     with pytest.raises(ValueError):
         favorites_model.get_weather_city(9999)
@@ -159,10 +279,10 @@ def test_get_forecast_city_success(favorites_model):
 
     city = Cities(name="TestCity", lat=10.0, lon=20.0)
     city.id = 1
-    favorites_model.favorites = [1]
+    set_favorites(favorites_model, [1])
 
     with patch("weatherFolder.models.cities_model.Cities.get_city_by_id", return_value=city), \
-         patch("requests.get") as mock_get, \
+         patch("requests.Session.get") as mock_get, \
          patch("os.getenv", return_value="fake-key"):
 
         mock_response = MagicMock()
@@ -188,7 +308,44 @@ def test_get_forecast_city_success(favorites_model):
 def test_get_forecast_city_not_in_favorites(favorites_model):
     """Test that get_forecast_city raises ValueError if city_id is not in favorites."""
 
-    favorites_model.favorites = []  # Empty favorites list
 
     with pytest.raises(ValueError, match="City ID 1 is not in favorites."):
         favorites_model.get_forecast_city(1)
+
+def test_get_forecast_city_is_cached(favorites_model):
+    """Test that a second forecast request for the same city is served from the cache."""
+
+    city = Cities(name="TestCity", lat=10.0, lon=20.0)
+    city.id = 1
+    set_favorites(favorites_model, [1])
+
+    with patch("weatherFolder.models.cities_model.Cities.get_city_by_id", return_value=city), \
+         patch("requests.Session.get") as mock_get, \
+         patch("os.getenv", return_value="fake-key"):
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.json.return_value = {
+            "list": [
+                {
+                    "dt_txt": "2025-04-30 12:00:00",
+                    "main": {"temp_max": 25, "temp_min": 15},
+                    "pop": 0.1,
+                    "weather": [{"description": "clear sky"}]
+                }
+            ]
+        }
+        mock_get.return_value = mock_response
+
+        first = favorites_model.get_forecast_city(1)
+        second = favorites_model.get_forecast_city(1)
+
+        assert first == second, "Cached forecast should match the fetched one."
+        assert mock_get.call_count == 1, "Expected a single upstream call."
+
+def test_next_forecast_step():
+    """Test that forecast entries expire on the next 3-hour UTC boundary."""
+    # 2025-04-30 13:20:00 UTC -> 15:00:00 UTC
+    assert next_forecast_step(1746019200) == 1746025200
+    # Exactly on a boundary moves to the following one.
+    assert next_forecast_step(1746025200) == 1746036000
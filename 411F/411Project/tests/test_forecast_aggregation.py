@@ -0,0 +1,63 @@
+import pytest
+
+from weatherFolder.utils.forecast_aggregation import aggregate_forecast, aggregate_forecasts
+
+
+def make_slot(dt_txt, temp_min, temp_max, pop=0.0, description="clear sky", temp=None):
+    main = {"temp_min": temp_min, "temp_max": temp_max}
+    if temp is not None:
+        main["temp"] = temp
+    return {"dt_txt": dt_txt, "main": main, "pop": pop, "weather": [{"description": description}]}
+
+
+@pytest.fixture
+def two_days():
+    return [
+        make_slot("2025-04-30 09:00:00", 10, 14, pop=0.2, description="light rain", temp=12),
+        make_slot("2025-04-30 12:00:00", 15, 25, pop=0.1, description="clear sky", temp=20),
+        make_slot("2025-04-30 15:00:00", 18, 22, pop=0.6, description="light rain", temp=19),
+        make_slot("2025-04-30 21:00:00", 5, 9, pop=0.0, description="clear sky", temp=7),
+        make_slot("2025-05-01 00:00:00", 3, 6, pop=0.0, description="few clouds", temp=4),
+    ]
+
+
+def test_aggregate_forecast_daily_summary(two_days):
+    """Test that each day reports its true high, low, mean, max pop and dominant condition."""
+    days = aggregate_forecast(two_days)
+
+    assert [day["date"] for day in days] == ["2025-04-30", "2025-05-01"]
+    first = days[0]
+    assert first["high"] == 25
+    assert first["low"] == 5
+    assert first["mean"] == 14.5
+    assert first["precipitation_chance"] == 0.6
+    assert first["condition"] == "light rain", "Ties should go to the condition seen first."
+    assert first["slots"] == 4
+    assert days[1]["condition"] == "few clouds"
+
+
+def test_aggregate_forecast_uses_local_day(two_days):
+    """Test that the UTC offset moves slots onto the city's local day."""
+    days = aggregate_forecast(two_days, utc_offset=-4 * 60 * 60)
+
+    assert [day["date"] for day in days] == ["2025-04-30"]
+    assert days[0]["slots"] == 5
+    assert days[0]["low"] == 3
+
+
+def test_aggregate_forecasts_batch(two_days):
+    """Test that a batch returns the same summaries as aggregating each city alone."""
+    other = [make_slot("2025-04-30 12:00:00", 25, 31, pop=0.9, description="thunderstorm")]
+
+    batch = aggregate_forecasts([two_days, [], other], [0, 0, 3600])
+
+    assert batch[0] == aggregate_forecast(two_days)
+    assert batch[1] == []
+    assert batch[2] == aggregate_forecast(other, 3600)
+    assert batch[2][0]["mean"] == 28
+
+
+def test_aggregate_forecasts_offsets_must_match():
+    """Test that a mismatched number of offsets is rejected."""
+    with pytest.raises(ValueError, match="one UTC offset per forecast"):
+        aggregate_forecasts([[], []], [0])
@@ -0,0 +1,71 @@
+import hashlib
+import threading
+
+import pytest
+
+from weatherFolder.utils.kdf_pool import (PBKDF2, SCRYPT, KDFPool, KDFPoolBusyError, hash_password,
+                                          needs_rehash, verify_password)
+
+
+@pytest.fixture
+def pool():
+    pool = KDFPool(kind="thread", size=1, max_pending=0, queue_timeout=0.05)
+    yield pool
+    pool.close()
+
+
+@pytest.mark.parametrize("algorithm, params", [(SCRYPT, "n=1024,r=8,p=1"), (PBKDF2, "i=1000")])
+def test_hash_and_verify(algorithm, params):
+    """Test that a hash records its algorithm and parameters and verifies its password."""
+    stored = hash_password("secret", "salt", algorithm, params)
+
+    assert stored.startswith(f"{algorithm}${params}$")
+    assert verify_password("secret", "salt", stored) is True
+    assert verify_password("wrong", "salt", stored) is False
+    assert needs_rehash(stored) is True, "Non-default parameters should be upgraded."
+
+
+def test_verify_legacy_sha256():
+    """Test that legacy unprefixed SHA-256 digests still verify and are flagged for rehash."""
+    legacy = hashlib.sha256(("secret" + "salt").encode()).hexdigest()
+
+    assert verify_password("secret", "salt", legacy) is True
+    assert needs_rehash(legacy) is True
+    assert needs_rehash(hash_password("secret", "salt")) is False
+
+
+def test_unsupported_algorithm():
+    """Test that an unknown algorithm is rejected."""
+    with pytest.raises(ValueError, match="Unsupported"):
+        hash_password("secret", "salt", "md5", "")
+
+
+def test_pool_runs_hash(pool):
+    """Test hashing and verifying through the pool."""
+    stored = pool.hash("secret", "salt")
+
+    assert pool.verify("secret", "salt", stored) is True
+    assert pool.stats() == {"submitted": 2, "rejected": 0, "in_flight": 0}
+
+
+def test_pool_rejects_when_full(pool):
+    """Test that callers are shed once every worker and queue slot is taken."""
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(1)
+
+    worker = threading.Thread(target=pool.run, args=(block,))
+    worker.start()
+    started.wait(1)
+    try:
+        with pytest.raises(KDFPoolBusyError):
+            pool.run(len, "x")
+    finally:
+        release.set()
+        worker.join()
+
+    assert pool.stats()["rejected"] == 1
+    assert pool.run(len, "x") == 1, "Expected the pool to accept work again once a slot frees up."
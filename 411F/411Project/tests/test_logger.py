@@ -0,0 +1,92 @@
+import atexit
+import json
+import logging
+import queue
+from logging.handlers import QueueListener
+
+import pytest
+from flask import Flask
+from flask.logging import default_handler
+
+from weatherFolder.utils.logger import (JsonFormatter, RouteSampler, _ThreadQueueHandler, configure_logger,
+                                        parse_sample_rates, restart_logging_listener)
+
+
+def make_record(level=logging.INFO, msg="hello %s", args=("world",)):
+    return logging.LogRecord("test", level, __file__, 1, msg, args, None)
+
+
+def test_configure_logger_installs_handlers_once():
+    """Test that repeated configuration adds no handlers and removes Flask's default handler."""
+    app = Flask("logger_test")
+    root_handlers = list(logging.getLogger().handlers)
+
+    configure_logger(app.logger)
+    configure_logger(app.logger)
+    configure_logger(logging.getLogger("weatherFolder.test"))
+
+    assert logging.getLogger().handlers == root_handlers
+    assert default_handler not in app.logger.handlers
+    assert logging.getLogger("weatherFolder.test").handlers == []
+
+
+def test_parse_sample_rates():
+    """Test parsing endpoint=rate pairs."""
+    assert parse_sample_rates(" get_weather_city=0.1, login=1 ,") == {"get_weather_city": 0.1, "login": 1.0}
+    assert parse_sample_rates("") == {}
+    with pytest.raises(ValueError, match="expected endpoint=rate"):
+        parse_sample_rates("get_weather_city")
+
+
+def test_route_sampler_decides_once_per_request():
+    """Test that a request's info logs are kept or dropped together, and warnings always pass."""
+    app = Flask("sampler_test")
+    app.add_url_rule("/noisy", "noisy", lambda: "")
+    app.add_url_rule("/quiet", "quiet", lambda: "")
+    sampler = RouteSampler({"noisy": 0.0})
+
+    with app.test_request_context("/noisy"):
+        assert sampler.filter(make_record()) is False
+        assert sampler.filter(make_record(logging.WARNING)) is True
+    with app.test_request_context("/quiet"):
+        record = make_record()
+        assert sampler.filter(record) is True
+        assert record.endpoint == "quiet"
+
+    assert sampler.filter(make_record()) is True, "Records outside a request should always pass."
+
+
+def test_json_formatter():
+    """Test that records are rendered as one JSON object."""
+    entry = json.loads(JsonFormatter().format(make_record()))
+
+    assert entry["message"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+
+
+def test_queue_handler_prepares_copy():
+    """Test that arguments are merged into the queued copy and the original record is untouched."""
+    record = make_record()
+    prepared = _ThreadQueueHandler(None).prepare(record)
+
+    assert prepared.msg == "hello world" and prepared.args is None
+    assert record.args == ("world",)
+
+
+def test_restart_logging_listener(monkeypatch):
+    """Test that a forked worker gets a new running writer over the same queue and handlers."""
+    from weatherFolder.utils import logger as logger_module
+
+    inherited = QueueListener(queue.Queue(), logging.NullHandler())
+    monkeypatch.setattr(logger_module, "_listener", inherited)
+
+    restart_logging_listener()
+    restarted = logger_module._listener
+    try:
+        assert restarted is not inherited
+        assert restarted.queue is inherited.queue and restarted.handlers == inherited.handlers
+        assert restarted._thread is not None and restarted._thread.is_alive()
+    finally:
+        restarted.stop()
+        atexit.unregister(restarted.stop)
@@ -0,0 +1,100 @@
+import json
+import os
+import stat
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from weatherFolder.utils import metrics
+from weatherFolder.utils.metrics import MetricsRegistry, merge, registry, render_prometheus
+
+
+@pytest.fixture(autouse=True)
+def clear_metrics():
+    registry.clear()
+    yield
+    registry.clear()
+
+
+def test_histogram_buckets():
+    """Test that observations land in the first bucket whose bound they do not exceed."""
+    local = MetricsRegistry()
+    local.observe("db_queries_per_request", 0)
+    local.observe("db_queries_per_request", 2)
+    local.observe("db_queries_per_request", 500)
+
+    (_, _, counts), = local.snapshot()["histograms"]
+    assert counts[0] == 1, "Expected 0 in the le=0 bucket."
+    assert counts[2] == 1, "Expected 2 in the le=2 bucket."
+    assert counts[len(metrics.COUNT_BUCKETS)] == 1, "Expected 500 in the +Inf bucket."
+    assert counts[-1] == 502
+
+
+def test_merge_sums_processes():
+    """Test that counters and histograms from several workers are summed."""
+    first, second = MetricsRegistry(), MetricsRegistry()
+    for worker in (first, second):
+        worker.inc("http_requests_total", {"route": "/api/health", "method": "GET", "status": "200"})
+        worker.observe("http_request_duration_seconds", 0.02, {"route": "/api/health"})
+
+    counters, histograms = merge([first.snapshot(), second.snapshot()])
+
+    labels = (("method", "GET"), ("route", "/api/health"), ("status", "200"))
+    assert counters[("http_requests_total", labels)] == 2
+    counts = histograms[("http_request_duration_seconds", (("route", "/api/health"),))]
+    assert counts[metrics.LATENCY_BUCKETS.index(0.025)] == 2
+
+
+def test_snapshots_in_metrics_dir_are_aggregated(tmp_path, monkeypatch):
+    """Test that a scrape includes the snapshots written by other workers."""
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    other = MetricsRegistry()
+    other.inc("db_queries_total", value=5)
+    (tmp_path / "metrics-99999.json").write_text(json.dumps(other.snapshot()))
+    registry.inc("db_queries_total", value=3)
+
+    assert "db_queries_total 8\n" in render_prometheus()
+
+
+def test_metrics_route(client):
+    """Test that requests, status codes and cache counters are exported."""
+    client.get("/api/health")
+    client.get("/api/get-city-by-id/1")
+
+    response = client.get("/api/metrics")
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert 'http_requests_total{method="GET",route="/api/health",status="200"} 1' in body
+    assert 'http_requests_total{method="GET",route="/api/get-city-by-id/<int:city_id>",status="401"} 1' in body
+    assert 'http_request_duration_seconds_count{route="/api/health"} 1' in body
+    assert "# TYPE cache_requests_total counter" in body
+
+
+def test_failed_statements_do_not_leak_timers(session):
+    """Test that a failing statement's start time is dropped from its connection."""
+    connection = session.connection()
+    with pytest.raises(OperationalError):
+        session.execute(text("SELECT * FROM no_such_table"))
+
+    assert connection.info.get("metrics_query_start") == []
+
+
+def test_snapshot_names_do_not_reuse_pids(tmp_path, monkeypatch):
+    """Test that a process's snapshot file is named by pid and start time, not pid alone."""
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(tmp_path))
+    metrics.flush()
+
+    (path,) = tmp_path.iterdir()
+    assert path.name.startswith(f"metrics-{os.getpid()}-")
+
+
+def test_metrics_dir_is_private(tmp_path, monkeypatch):
+    """Test that flushing creates the metrics directory readable by its owner only."""
+    directory = tmp_path / "metrics"
+    monkeypatch.setattr(metrics, "METRICS_DIR", str(directory))
+    metrics.flush()
+
+    assert stat.S_IMODE(directory.stat().st_mode) == 0o700
@@ -0,0 +1,113 @@
+import cProfile
+import pstats
+
+import pytest
+
+from weatherFolder.utils import profiling
+from weatherFolder.utils.profiling import ProfilingMiddleware, collapsed_stacks, list_profiles
+
+
+TOKEN = "profile-secret"
+
+
+@pytest.fixture
+def profile_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def simple_app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [str(sum(range(1000))).encode()]
+
+
+def call(app, token=None):
+    environ = {"PATH_INFO": "/api/health"}
+    if token is not None:
+        environ["HTTP_X_PROFILE_TOKEN"] = token
+    headers = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        headers.update(response_headers)
+
+    body = app(environ, start_response)
+    data = b"".join(body)
+    getattr(body, "close", lambda: None)()
+    return headers, data
+
+
+def test_collapsed_stacks():
+    """Test that each line is a semicolon-separated stack followed by microseconds."""
+    def inner():
+        return sum(range(50000))
+
+    def outer():
+        return inner()
+
+    profiler = cProfile.Profile()
+    profiler.runcall(outer)
+
+    lines = collapsed_stacks(pstats.Stats(profiler))
+
+    assert any("(outer);" in line and "(inner)" in line for line in lines)
+    for line in lines:
+        stack, micros = line.rsplit(" ", 1)
+        assert stack and int(micros) > 0
+
+
+def test_token_request_is_profiled(profile_dir):
+    """Test that a request with the token is profiled and its id returned."""
+    app = ProfilingMiddleware(simple_app, directory=str(profile_dir), sample_rate=0)
+
+    headers, data = call(app, TOKEN)
+
+    assert data == b"499500"
+    profile_id = headers[profiling.PROFILE_ID_HEADER]
+    assert (profile_dir / f"{profile_id}.pstats").exists()
+    assert (profile_dir / f"{profile_id}.collapsed").exists()
+    assert list_profiles()[0]["id"] == profile_id
+
+
+def test_request_without_token_is_not_profiled(profile_dir):
+    """Test that wrong or missing tokens leave the request untouched."""
+    app = ProfilingMiddleware(simple_app, directory=str(profile_dir), sample_rate=0)
+
+    for token in (None, "wrong"):
+        headers, _ = call(app, token)
+        assert profiling.PROFILE_ID_HEADER not in headers
+
+    assert list(profile_dir.iterdir()) == []
+
+
+def test_old_profiles_are_pruned(profile_dir):
+    """Test that no more than max_files profiles are kept."""
+    app = ProfilingMiddleware(simple_app, directory=str(profile_dir), sample_rate=0, max_files=2)
+
+    for _ in range(4):
+        call(app, TOKEN)
+
+    assert len(list_profiles()) == 2
+    assert len(list(profile_dir.iterdir())) == 4
+
+
+def test_profile_routes_require_token(client, profile_dir):
+    """Test that listing and downloading profiles need the profiling token."""
+    assert client.get("/api/profiles").status_code == 403
+    assert client.get("/api/profiles", headers={"X-Profile-Token": "wrong"}).status_code == 403
+
+    call(ProfilingMiddleware(simple_app, directory=str(profile_dir), sample_rate=0), TOKEN)
+    response = client.get("/api/profiles", headers={"X-Profile-Token": TOKEN})
+    assert response.status_code == 200
+    name = response.json["profiles"][0]["collapsed"]
+
+    download = client.get(f"/api/profiles/{name}", headers={"X-Profile-Token": TOKEN})
+    assert download.status_code == 200
+    assert download.data.strip()
+
+
+def test_profile_routes_hidden_without_token(client, monkeypatch):
+    """Test that the profile routes answer 404 when no token is configured."""
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+
+    assert client.get("/api/profiles").status_code == 404
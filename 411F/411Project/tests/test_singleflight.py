@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from weatherFolder.utils.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_collapsed():
+    """Test that concurrent callers for one key share a single execution."""
+    group = SingleFlight(name="test")
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def fetch():
+        calls.append(1)
+        release.wait(1)
+        return "clear sky"
+
+    def worker():
+        results.append(group.do("boston", fetch))
+
+    threads = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    while group.stats()["collapsed"] < 4:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["clear sky"] * 5
+    assert len(calls) == 1, "Expected the function to run once."
+    assert group.stats() == {"executions": 1, "collapsed": 4, "timeouts": 0, "in_flight": 0}
+
+
+def test_error_is_shared_with_waiters():
+    """Test that waiting callers receive the leader's error."""
+    group = SingleFlight(name="test")
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fetch():
+        started.set()
+        release.wait(1)
+        raise RuntimeError("upstream down")
+
+    def leader():
+        with pytest.raises(RuntimeError):
+            group.do("boston", fetch)
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait(1)
+
+    def waiter():
+        try:
+            group.do("boston", fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    waiter_thread = threading.Thread(target=waiter)
+    waiter_thread.start()
+    while group.stats()["collapsed"] < 1:
+        time.sleep(0.005)
+    release.set()
+    thread.join()
+    waiter_thread.join()
+
+    assert errors == ["upstream down"]
+
+
+def test_waiter_timeout():
+    """Test that a waiting caller gives up after its timeout."""
+    group = SingleFlight(name="test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        started.set()
+        release.wait(1)
+        return "late"
+
+    thread = threading.Thread(target=group.do, args=("boston", fetch))
+    thread.start()
+    started.wait(1)
+
+    with pytest.raises(TimeoutError):
+        group.do("boston", fetch, timeout=0.01)
+
+    release.set()
+    thread.join()
+    assert group.stats()["timeouts"] == 1
+
+
+def test_distinct_keys_run_separately():
+    """Test that calls with different keys are not collapsed."""
+    group = SingleFlight(name="test")
+
+    assert group.do("a", lambda: 1) == 1
+    assert group.do("b", lambda: 2) == 2
+    assert group.stats()["executions"] == 2
+    assert group.stats()["collapsed"] == 0
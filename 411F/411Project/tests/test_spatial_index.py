@@ -0,0 +1,84 @@
+import math
+import random
+
+import pytest
+
+from weatherFolder.utils.spatial_index import (SpatialIndex, bounding_box, chord_to_km, distance_km, km_to_chord_sq,
+                                              to_unit_vector)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlam = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlam / 2) ** 2
+    return 2 * 6371.0088 * math.asin(math.sqrt(a))
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(411)
+    return [(i, math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180)) for i in range(3000)]
+
+
+def test_distance_conversions():
+    """Test that chord lengths convert to great-circle distances and back."""
+    a = to_unit_vector(42.36, -71.06)  # Boston
+    b = to_unit_vector(51.51, -0.13)  # London
+    chord_sq = sum((x - y) ** 2 for x, y in zip(a, b))
+    assert chord_to_km(chord_sq) == pytest.approx(haversine_km(42.36, -71.06, 51.51, -0.13))
+    assert km_to_chord_sq(chord_to_km(chord_sq)) == pytest.approx(chord_sq)
+
+
+def test_nearest_matches_brute_force(points):
+    """Test that nearest-neighbour results match an exhaustive search."""
+    index = SpatialIndex(points)
+    rng = random.Random(1)
+    for _ in range(50):
+        lat, lon = rng.uniform(-90, 90), rng.uniform(-180, 180)
+        expected = sorted(points, key=lambda p: haversine_km(lat, lon, p[1], p[2]))[:5]
+        result = index.nearest(lat, lon, k=5)
+        assert [point_id for point_id, _ in result] == [p[0] for p in expected]
+        assert result[0][1] == pytest.approx(haversine_km(lat, lon, expected[0][1], expected[0][2]))
+
+
+def test_within_matches_brute_force(points):
+    """Test that radius results match an exhaustive search, closest first."""
+    index = SpatialIndex(points)
+    lat, lon = 10.0, 179.5  # near the antimeridian
+    expected = {p[0] for p in points if haversine_km(lat, lon, p[1], p[2]) <= 1500}
+    result = index.within(lat, lon, 1500)
+    assert {point_id for point_id, _ in result} == expected
+    assert [d for _, d in result] == sorted(d for _, d in result)
+
+
+def test_add_and_remove(points):
+    """Test that inserts and removals update the index in place."""
+    index = SpatialIndex(points[:10])
+    for point_id, lat, lon in points[10:500]:
+        index.add(point_id, lat, lon)
+    assert len(index) == 500
+
+    index.add(9999, 0.0, 0.0)
+    assert index.nearest(0.0, 0.0)[0][0] == 9999
+    index.remove(9999)
+    assert 9999 not in index
+    assert index.nearest(0.0, 0.0)[0][0] != 9999
+
+
+def test_empty_index():
+    """Test that an empty index returns no matches."""
+    index = SpatialIndex()
+    assert index.nearest(0.0, 0.0) == []
+    assert index.within(0.0, 0.0, 100) == []
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [(10.0, 179.5, 1500), (-5.0, -179.0, 800), (85.0, 40.0, 900),
+                                                 (45.0, 7.0, 100), (0.0, 0.0, 20016)])
+def test_bounding_box_contains_radius(points, lat, lon, radius_km):
+    """Test that every point within the radius lies in the box, across the antimeridian and near poles."""
+    min_lat, max_lat, lon_ranges = bounding_box(lat, lon, radius_km)
+    for _, p_lat, p_lon in points:
+        if distance_km(lat, lon, p_lat, p_lon) <= radius_km:
+            assert min_lat <= p_lat <= max_lat
+            assert any(low <= p_lon <= high for low, high in lon_ranges)
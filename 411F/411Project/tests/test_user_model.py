@@ -1,6 +1,11 @@
+import hashlib
+
 import pytest
+from sqlalchemy import event
 
-from weatherFolder.models.user_model import Users
+from weatherFolder.db import db
+from weatherFolder.models.user_model import UserRecord, Users, user_cache
+from weatherFolder.utils.kdf_pool import KDF_ALGORITHM, current_params
 
 
 @pytest.fixture
@@ -26,7 +31,10 @@ def test_create_user(session, sample_user):
     assert user is not None, "User should be created in the database."
     assert user.username == sample_user["username"], "Username should match the input."
     assert len(user.salt) == 32, "Salt should be 32 characters (hex)."
-    assert len(user.password) == 64, "Password should be a 64-character SHA-256 hash."
+    algorithm, params, digest = user.password.split("$")
+    assert algorithm == KDF_ALGORITHM, "Password should record the KDF algorithm."
+    assert params == current_params(), "Password should record the KDF parameters."
+    assert len(digest) == 64, "Password should end with a 32-byte hash in hex."
 
 def test_create_duplicate_user(session, sample_user):
     """Test attempting to create a user with a duplicate username."""
@@ -53,6 +61,54 @@ def test_check_password_user_not_found(session):
     with pytest.raises(ValueError, match="User nonexistentuser not found"):
         Users.check_password("nonexistentuser", "password")
 
+def test_authenticate(session, sample_user):
+    """Test that a correct password returns the user record and a wrong one returns None."""
+    Users.create_user(**sample_user)
+
+    record = Users.authenticate(sample_user["username"], sample_user["password"])
+
+    assert record == UserRecord(id=Users.get_id_by_username(sample_user["username"]),
+                                username=sample_user["username"])
+    assert record.get_id() == sample_user["username"]
+    assert Users.authenticate(sample_user["username"], "wrongpassword") is None
+
+def test_authenticate_upgrades_legacy_hash(session, sample_user):
+    """Test that a legacy SHA-256 password still logs in and is rehashed with the KDF."""
+    salt = "00" * 16
+    legacy = hashlib.sha256((sample_user["password"] + salt).encode()).hexdigest()
+    session.add(Users(username=sample_user["username"], salt=salt, password=legacy))
+    session.commit()
+
+    assert Users.authenticate(sample_user["username"], "wrongpassword") is None
+    assert session.query(Users).one().password == legacy, "A failed login must not rehash."
+
+    assert Users.authenticate(sample_user["username"], sample_user["password"]) is not None
+    assert session.query(Users).one().password.startswith(f"{KDF_ALGORITHM}$")
+    assert Users.check_password(sample_user["username"], sample_user["password"]) is True
+
+def test_load_user_is_cached(session, sample_user):
+    """Test that loading a logged-in user does not query the database."""
+    Users.create_user(**sample_user)
+    Users.authenticate(sample_user["username"], sample_user["password"])
+    statements = []
+
+    def count(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        record = Users.load_user(sample_user["username"])
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    assert record.username == sample_user["username"]
+    assert statements == [], "Expected the user to be served from the cache."
+
+def test_load_user_not_found(session):
+    """Test that an unknown user loads as None and is not cached."""
+    assert Users.load_user("nonexistentuser") is None
+    assert len(user_cache) == 0
+
 ##########################################################
 # Update Password
 ##########################################################
@@ -64,6 +120,15 @@ def test_update_password(session, sample_user):
     Users.update_password(sample_user["username"], new_password)
     assert Users.check_password(sample_user["username"], new_password) is True, "Password should be updated successfully."
 
+def test_update_password_invalidates_cache(session, sample_user):
+    """Test that changing the password drops the cached user."""
+    Users.create_user(**sample_user)
+    Users.load_user(sample_user["username"])
+
+    Users.update_password(sample_user["username"], "newpassword456")
+
+    assert user_cache.get(sample_user["username"]) is None
+
 def test_update_password_user_not_found(session):
     """Test updating the password for a non-existent user."""
     with pytest.raises(ValueError, match="User nonexistentuser not found"):
@@ -81,6 +146,15 @@ def test_delete_user(session, sample_user):
     user = session.query(Users).filter_by(username=sample_user["username"]).first()
     assert user is None, "User should be deleted from the database."
 
+def test_delete_user_invalidates_cache(session, sample_user):
+    """Test that a deleted user can no longer be loaded from the cache."""
+    Users.create_user(**sample_user)
+    Users.load_user(sample_user["username"])
+
+    Users.delete_user(sample_user["username"])
+
+    assert Users.load_user(sample_user["username"]) is None
+
 def test_delete_user_not_found(session):
     """Test deleting a non-existent user."""
     with pytest.raises(ValueError, match="User nonexistentuser not found"):
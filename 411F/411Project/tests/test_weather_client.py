@@ -0,0 +1,79 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from weatherFolder.utils.weather_client import WeatherClient, get_weather_client, reset_weather_client
+
+
+@pytest.fixture
+def flaky_server():
+    """Local HTTP server that fails with a 503 once before answering."""
+    calls = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            calls.append(self.path)
+            if len(calls) == 1:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps({"weather": [{"description": "mist"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/data/2.5", calls
+    server.shutdown()
+    server.server_close()
+
+
+def test_build_url():
+    """Test that endpoint URLs are built from the configured base URL."""
+    client = WeatherClient(base_url="https://example.test/data/2.5/")
+    assert client.build_url("weather") == "https://example.test/data/2.5/weather"
+    assert client.build_url("/forecast") == "https://example.test/data/2.5/forecast"
+
+
+def test_get_sets_timeout_and_key(mocker, monkeypatch):
+    """Test that requests carry the API key and the connect/read timeouts."""
+    monkeypatch.setenv("WEATHER_KEY", "fake-key")
+    client = WeatherClient(base_url="https://example.test", connect_timeout=1, read_timeout=2)
+    mock_get = mocker.patch.object(client.session, "get")
+
+    client.get("weather", lat=1.0, lon=2.0)
+
+    mock_get.assert_called_once_with("https://example.test/weather",
+                                     params={"lat": 1.0, "lon": 2.0, "appid": "fake-key"},
+                                     timeout=(1, 2))
+
+
+def test_get_retries_server_errors(flaky_server):
+    """Test that a 5xx response is retried on the pooled session."""
+    base_url, calls = flaky_server
+    client = WeatherClient(base_url=base_url, max_retries=2, backoff_factor=0)
+
+    response = client.get("weather", lat=1.0, lon=2.0)
+
+    assert response.status_code == 200
+    assert response.json()["weather"][0]["description"] == "mist"
+    assert len(calls) == 2, "Expected one retry after the 503."
+
+
+def test_shared_client_is_reused():
+    """Test that the shared client is created once and can be reset."""
+    reset_weather_client()
+    first = get_weather_client()
+    assert get_weather_client() is first
+    reset_weather_client()
+    assert get_weather_client() is not first
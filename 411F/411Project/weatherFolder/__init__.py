@@ -0,0 +1,3 @@
+from weatherFolder.env import load_env
+
+load_env()
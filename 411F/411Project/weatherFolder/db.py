@@ -1,3 +1,160 @@
+import logging
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
 
 db = SQLAlchemy()
+
+# Bump whenever the models change the schema, and add the step that upgrades
+# to it in MIGRATIONS. Stored in SQLite's user_version, so startup can skip the
+# upgrade when the database is already current.
+SCHEMA_VERSION = 2
+
+# Bind key of the optional read-only engine (see SQLALCHEMY_BINDS in config.py).
+READ_BIND = "read"
+
+
+def init_db(app: Flask) -> None:
+    """Initializes db for an app and applies its SQLite pragmas to every engine.
+
+    SQLITE_PRAGMAS from the app config are run on each new connection. Connections
+    of the READ_BIND engine also get query_only, so reads routed there can never
+    take SQLite's write lock.
+
+    Args:
+        app (Flask): The application to initialize.
+    """
+    db.init_app(app)
+    pragmas = app.config.get("SQLITE_PRAGMAS", {})
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            if engine.dialect.name != "sqlite":
+                continue
+            engine_pragmas = dict(pragmas)
+            if bind_key == READ_BIND:
+                engine_pragmas["query_only"] = "ON"
+            if engine_pragmas:
+                _apply_pragmas(engine, engine_pragmas)
+
+
+def _apply_pragmas(engine: Engine, pragmas: dict) -> None:
+    """Runs the given pragmas on every connection the engine opens."""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _columns(conn: Connection, table: str) -> set:
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def _migrate_to_1(conn: Connection) -> None:
+    """Creates the tables that do not exist yet, e.g. favorites on a database from before it."""
+    db.metadata.create_all(bind=conn)
+
+
+def _migrate_to_2(conn: Connection) -> None:
+    """Adds the cities columns and indexes that create_all cannot add to an existing table.
+
+    Databases created before name_key and owm_id existed, including ones
+    already stamped version 1 by a create_all-only upgrade, lack them. Every
+    statement checks for its column or index first, so this is safe to rerun.
+    """
+    # Imported here because the models import db from this module.
+    from weatherFolder.models.cities_model import normalize_city_name
+
+    columns = _columns(conn, "cities")
+    if "name_key" not in columns:
+        conn.exec_driver_sql("ALTER TABLE cities ADD COLUMN name_key VARCHAR NOT NULL DEFAULT ''")
+    if "owm_id" not in columns:
+        conn.exec_driver_sql("ALTER TABLE cities ADD COLUMN owm_id INTEGER")
+    rows = conn.exec_driver_sql("SELECT id, name FROM cities WHERE name_key = ''").fetchall()
+    if rows:
+        conn.exec_driver_sql("UPDATE cities SET name_key = ? WHERE id = ?",
+                             [(normalize_city_name(name), city_id) for city_id, name in rows])
+    conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_cities_name_key ON cities (name_key)")
+
+    # The unique index cannot be built over duplicate favorites; keep the first of each.
+    conn.exec_driver_sql(
+        "DELETE FROM favorites WHERE id NOT IN (SELECT MIN(id) FROM favorites GROUP BY user_id, city_id)"
+    )
+    conn.exec_driver_sql("CREATE UNIQUE INDEX IF NOT EXISTS ix_favorites_user_city ON favorites (user_id, city_id)")
+
+
+# Upgrade steps keyed by the version they bring the database to, run in order.
+MIGRATIONS: Dict[int, Callable[[Connection], None]] = {
+    1: _migrate_to_1,
+    2: _migrate_to_2,
+}
+
+
+def ensure_schema() -> bool:
+    """Creates or upgrades the schema only if the stored version is behind.
+
+    Reading user_version is a single pragma, whereas create_all inspects every
+    table. Upgrading runs each step in MIGRATIONS above the stored version, in
+    one transaction, and records SCHEMA_VERSION only once they all succeeded;
+    a failed upgrade leaves the old version so the next start retries it.
+    Databases other than SQLite always run create_all. Only the default bind is
+    created: READ_BIND points at the same database and holds no tables of its
+    own. Must be called inside an application context.
+
+    Returns:
+        bool: True if the schema was created or upgraded.
+
+    Raises:
+        RuntimeError: If the database was written by a newer schema version.
+    """
+    if db.engine.dialect.name != "sqlite":
+        db.create_all(bind_key=None)
+        return True
+    with db.engine.connect() as conn:
+        version = conn.exec_driver_sql("PRAGMA user_version").scalar()
+    if version == SCHEMA_VERSION:
+        return False
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than supported version {SCHEMA_VERSION}")
+    logger.info("Upgrading database schema from version %d to %d", version, SCHEMA_VERSION)
+    with db.engine.begin() as conn:
+        # pysqlite only opens transactions before DML; begin explicitly so the DDL is included.
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            MIGRATIONS[target](conn)
+        conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return True
+
+
+@contextmanager
+def read_session() -> Iterator[Session]:
+    """Yields a session for queries that only read.
+
+    With a READ_BIND engine configured this is a short-lived session on its own
+    connection pool, so in WAL mode reads see the last committed data without
+    waiting on writers. Otherwise it is db.session.
+
+    Yields:
+        Session: The session to query with. It must not be used to write.
+    """
+    engine = db.engines.get(READ_BIND)
+    if engine is None:
+        yield db.session
+        return
+    session = Session(engine)
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,23 @@
+import threading
+
+from dotenv import load_dotenv
+
+
+_loaded = False
+_lock = threading.Lock()
+
+
+def load_env() -> None:
+    """Loads variables from .env into the environment, once per process.
+
+    Existing environment variables win over .env entries. Importing the
+    weatherFolder package calls this, so module-level settings read with
+    os.getenv already see .env values.
+    """
+    global _loaded
+    if _loaded:
+        return
+    with _lock:
+        if not _loaded:
+            load_dotenv()
+            _loaded = True
@@ -1,26 +1,109 @@
 import logging
-from typing import List
-import requests
+import math
+import threading
+import unicodedata
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 import os
-from dotenv import load_dotenv, dotenv_values
 
+from flask import Flask
+from sqlalchemy import event, or_
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
 
-from weatherFolder.db import db
+from weatherFolder.db import db, read_session
+from weatherFolder.utils.cache import TTLCache
+from weatherFolder.utils.cache_backends import create_backend
 from weatherFolder.utils.logger import configure_logger
+from weatherFolder.utils.singleflight import SingleFlight
+from weatherFolder.utils.spatial_index import SpatialIndex, bounding_box, distance_km
+from weatherFolder.utils.weather_client import WeatherClient, get_weather_client
 
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
 
-load_dotenv()
+
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "300"))
+WEATHER_CACHE_MAX_ENTRIES = int(os.getenv("WEATHER_CACHE_MAX_ENTRIES", "1024"))
+
+# Current conditions only change every ~10 minutes, so reads for the same
+# coordinates share one upstream call per TTL. With CACHE_BACKEND=sqlite the
+# entries are shared by every worker on the host.
+weather_cache = TTLCache(ttl=WEATHER_CACHE_TTL, max_entries=WEATHER_CACHE_MAX_ENTRIES,
+                         stale_ttl=WEATHER_CACHE_STALE_TTL, name="weather",
+                         backend=create_backend("weather", WEATHER_CACHE_MAX_ENTRIES))
+
+# Concurrent misses for the same coordinates, and concurrent /group calls for
+# the same city IDs, share one upstream call.
+UPSTREAM_WAIT_TIMEOUT = float(os.getenv("UPSTREAM_WAIT_TIMEOUT", "15"))
+weather_flight = SingleFlight(name="weather", timeout=UPSTREAM_WAIT_TIMEOUT)
+
+# OpenWeather's /group endpoint accepts at most 20 city IDs per call.
+GROUP_BATCH_SIZE = 20
+
+CITY_CACHE_TTL = float(os.getenv("CITY_CACHE_TTL", "3600"))
+CITY_CACHE_MAX_ENTRIES = int(os.getenv("CITY_CACHE_MAX_ENTRIES", "10000"))
+
+# Read-through cache of immutable city records, shared by every request in the
+# process. Writes through the ORM invalidate entries; the TTL bounds staleness
+# for writes made by other processes.
+city_cache = TTLCache(ttl=CITY_CACHE_TTL, max_entries=CITY_CACHE_MAX_ENTRIES, name="city")
+
+# Seconds between checks for cities inserted by other processes.
+SPATIAL_INDEX_REFRESH = float(os.getenv("SPATIAL_INDEX_REFRESH", "30"))
+MAX_NEAREST_RESULTS = 100
+
+# Radii tried in turn by find_nearest while the spatial index is being built,
+# ending with half the Earth's circumference, which covers every city.
+FALLBACK_SEARCH_RADII_KM = (50, 250, 1000, 5000, 20016)
+
+MAX_AUTOCOMPLETE_RESULTS = 50
+
+
+@dataclass(frozen=True)
+class CityRecord:
+    """An immutable, session-independent snapshot of a row in the 'cities' table.
+
+    Records are safe to share across requests and threads, which lets them live
+    in the process-wide city cache.
+    """
+
+    id: int
+    name: str
+    lat: float
+    lon: float
+    owm_id: int = None
+
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable representation of the city.
+
+        Returns:
+            dict: The city's id, name, latitude, longitude and OpenWeather ID.
+        """
+        return asdict(self)
+
+    def get_weather(self) -> str:
+        """Fetches the current weather description for this city.
+
+        Returns:
+            str: A short textual description of the current weather (e.g., "clear sky").
+
+        Raises:
+            Exception: If the weather API request fails or an error occurs during retrieval.
+        """
+        return get_current_weather(self.lat, self.lon)
 
 #CHANGE
 class Cities(db.Model):
     """Represents a city with geographic coordinates.
 
     This SQLAlchemy model maps to the 'cities' table in the database and stores
-    essential information such as the city's name, latitude, and longitude.
+    essential information such as the city's name, latitude, and longitude,
+    plus OpenWeather's own city ID when it is known.
     Used for retrieving and displaying location-specific weather data.
     """
     
@@ -28,31 +111,46 @@ class Cities(db.Model):
 
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String, unique=True, nullable=False)
+    # Case- and accent-folded name used for lookups and prefix search.
+    name_key = db.Column(db.String, nullable=False, index=True)
     lat = db.Column(db.Float, nullable=False)
     lon = db.Column(db.Float, nullable=False)
+    owm_id = db.Column(db.Integer, nullable=True)
 
-    def __init__(self, name: str, lat: float, lon: float):
+    def __init__(self, name: str, lat: float, lon: float, owm_id: int = None):
         """Initializes a new City instance with a name and geographic coordinates.
 
         Args:
             name (str): The name of the city.
             lat (float): The latitude of the city.
             lon (float): The longitude of the city.
+            owm_id (int, optional): OpenWeather's city ID, used for batched weather lookups.
         """
         self.name = name
+        self.name_key = normalize_city_name(name)
         self.lat = lat
         self.lon = lon
+        self.owm_id = owm_id
+
+    def to_dict(self) -> dict:
+        """Returns a JSON-serializable representation of the city.
+
+        Returns:
+            dict: The city's id, name, latitude, longitude and OpenWeather ID.
+        """
+        return {"id": self.id, "name": self.name, "lat": self.lat, "lon": self.lon, "owm_id": self.owm_id}
 
 
  #CHANGE
     @classmethod
-    def create_city(cls, name: str, lat: float, lon: float) -> None:
+    def create_city(cls, name: str, lat: float, lon: float, owm_id: int = None) -> None:
         """Creates and saves a new city record to the database.
 
         Args:
             name (str): The name of the city.
             lat (float): The latitude of the city.
             lon (float): The longitude of the city.
+            owm_id (int, optional): OpenWeather's city ID.
 
         Raises:
             ValueError: If a city with the same name already exists.
@@ -60,7 +158,7 @@ class Cities(db.Model):
         """
         logger.info(f"Creating boxer: {name}, {lat=} {lon=}")
         try:
-            city = cls(name=name, lat=lat, lon=lon)
+            city = cls(name=name, lat=lat, lon=lon, owm_id=owm_id)
             db.session.add(city)
             db.session.commit()
             logger.info(f"City created!")
@@ -75,23 +173,209 @@ class Cities(db.Model):
 
  #CHANGE
     @classmethod
-    def get_city_by_id(cls, city_id: int) -> "Cities":
-        """Retrieves a city from the database by its ID.
+    def get_city_by_id(cls, city_id: int) -> CityRecord:
+        """Retrieves a city by its ID, reading through the process-wide city cache.
 
         Args:
             city_id (int): The ID of the city to retrieve.
 
         Returns:
-            Cities: The corresponding city instance.
+            CityRecord: An immutable record of the corresponding city.
 
         Raises:
             ValueError: If no city with the specified ID exists.
         """
-        city = db.session.get(cls, city_id)
-        if city is None:
-            logger.info(f"City with ID {city_id} not found.")
-            raise ValueError(f"City with ID {city_id} not found.")
-        return city
+        record = city_cache.get(city_id)
+        if record is not None:
+            return record
+        with read_session() as session:
+            city = session.get(cls, city_id)
+            if city is None:
+                logger.info(f"City with ID {city_id} not found.")
+                raise ValueError(f"City with ID {city_id} not found.")
+            record = city.to_record()
+        city_cache.set(city_id, record)
+        return record
+
+    @classmethod
+    def get_cities_by_ids(cls, city_ids: Iterable[int]) -> Dict[int, CityRecord]:
+        """Retrieves many cities, querying the database once for those not cached.
+
+        Args:
+            city_ids (Iterable[int]): The IDs of the cities to retrieve.
+
+        Returns:
+            Dict[int, CityRecord]: Maps each found city ID to its record. IDs with no
+                matching city are left out.
+        """
+        records = {}
+        missing = set()
+        for city_id in set(city_ids):
+            record = city_cache.get(city_id)
+            if record is not None:
+                records[city_id] = record
+            else:
+                missing.add(city_id)
+        if missing:
+            with read_session() as session:
+                for city in session.execute(db.select(cls).where(cls.id.in_(missing))).scalars():
+                    record = city.to_record()
+                    city_cache.set(city.id, record)
+                    records[city.id] = record
+        return records
+
+    @classmethod
+    def get_city_by_name(cls, name: str) -> CityRecord:
+        """Retrieves a city by name, ignoring case, accents and extra whitespace.
+
+        If several cities share the same normalized name, an exact match on the
+        stored name wins; otherwise the oldest city is returned.
+
+        Args:
+            name (str): The name of the city to retrieve.
+
+        Returns:
+            CityRecord: An immutable record of the corresponding city.
+
+        Raises:
+            ValueError: If no city with the specified name exists.
+        """
+        query = db.select(cls).where(cls.name_key == normalize_city_name(name)).order_by(cls.id)
+        with read_session() as session:
+            cities = session.execute(query).scalars().all()
+            if not cities:
+                logger.info(f"City with name '{name}' not found.")
+                raise ValueError(f"City with name '{name}' not found.")
+            city = next((c for c in cities if c.name == name), cities[0])
+            record = city.to_record()
+        city_cache.set(city.id, record)
+        return record
+
+    @classmethod
+    def autocomplete(cls, prefix: str, limit: int = 10) -> List[CityRecord]:
+        """Finds cities whose normalized name starts with a prefix.
+
+        The search is a range scan on the name_key index, so its cost depends on
+        the limit rather than the size of the catalog.
+
+        Args:
+            prefix (str): The text typed so far.
+            limit (int): Maximum number of cities to return.
+
+        Returns:
+            List[CityRecord]: Matching cities in normalized-name order.
+
+        Raises:
+            ValueError: If the limit is out of range.
+        """
+        if not 1 <= limit <= MAX_AUTOCOMPLETE_RESULTS:
+            raise ValueError(f"Limit must be between 1 and {MAX_AUTOCOMPLETE_RESULTS}.")
+        key = normalize_city_name(prefix)
+        if not key:
+            return []
+        query = (db.select(cls)
+                 .where(cls.name_key >= key, cls.name_key < key + "\U0010ffff")
+                 .order_by(cls.name_key, cls.id)
+                 .limit(limit))
+        records = []
+        with read_session() as session:
+            for city in session.execute(query).scalars():
+                record = city.to_record()
+                city_cache.set(city.id, record)
+                records.append(record)
+        return records
+
+    @classmethod
+    def find_nearest(cls, lat: float, lon: float, k: int = 1) -> List[Tuple[CityRecord, float]]:
+        """Finds the cities closest to a location by great-circle distance.
+
+        Args:
+            lat (float): The latitude of the location.
+            lon (float): The longitude of the location.
+            k (int): Number of cities to return, at most MAX_NEAREST_RESULTS.
+
+        Returns:
+            List[Tuple[CityRecord, float]]: (city, distance_km) pairs, closest first.
+
+        Raises:
+            ValueError: If the coordinates or k are out of range.
+        """
+        validate_coordinates(lat, lon)
+        if not 1 <= k <= MAX_NEAREST_RESULTS:
+            raise ValueError(f"k must be between 1 and {MAX_NEAREST_RESULTS}.")
+        index = get_spatial_index()
+        if index is None:
+            return cls._resolve_matches(cls._nearest_by_scan(lat, lon, k))
+        return cls._resolve_matches(index.nearest(lat, lon, k))
+
+    @classmethod
+    def find_within(cls, lat: float, lon: float, radius_km: float,
+                    limit: int = MAX_NEAREST_RESULTS) -> List[Tuple[CityRecord, float]]:
+        """Finds the cities within a great-circle radius of a location.
+
+        Args:
+            lat (float): The latitude of the location.
+            lon (float): The longitude of the location.
+            radius_km (float): The search radius in kilometres.
+            limit (int): Maximum number of cities to return.
+
+        Returns:
+            List[Tuple[CityRecord, float]]: (city, distance_km) pairs, closest first.
+
+        Raises:
+            ValueError: If the coordinates, radius or limit are out of range.
+        """
+        validate_coordinates(lat, lon)
+        if not math.isfinite(radius_km) or radius_km <= 0:
+            raise ValueError("Radius must be a positive number.")
+        if not 1 <= limit <= MAX_NEAREST_RESULTS:
+            raise ValueError(f"Limit must be between 1 and {MAX_NEAREST_RESULTS}.")
+        index = get_spatial_index()
+        if index is None:
+            return cls._resolve_matches(cls._within_by_scan(lat, lon, radius_km)[:limit])
+        return cls._resolve_matches(index.within(lat, lon, radius_km)[:limit])
+
+    @classmethod
+    def _within_by_scan(cls, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """Finds the (id, distance_km) pairs within a radius, closest first, without the spatial index.
+
+        Rows inside the radius's bounding box are read from the table and
+        filtered by their exact distance.
+        """
+        min_lat, max_lat, lon_ranges = bounding_box(lat, lon, radius_km)
+        query = (db.select(cls.id, cls.lat, cls.lon)
+                 .where(cls.lat.between(min_lat, max_lat),
+                        or_(*(cls.lon.between(min_lon, max_lon) for min_lon, max_lon in lon_ranges))))
+        with read_session() as session:
+            rows = session.execute(query).all()
+        matches = [(row.id, distance_km(lat, lon, row.lat, row.lon)) for row in rows]
+        return sorted((match for match in matches if match[1] <= radius_km), key=lambda match: match[1])
+
+    @classmethod
+    def _nearest_by_scan(cls, lat: float, lon: float, k: int) -> List[Tuple[int, float]]:
+        """Finds the k nearest (id, distance_km) pairs without the spatial index.
+
+        Searches FALLBACK_SEARCH_RADII_KM in turn until one holds k cities; any
+        city outside that radius is farther than all of them.
+        """
+        for radius_km in FALLBACK_SEARCH_RADII_KM:
+            matches = cls._within_by_scan(lat, lon, radius_km)
+            if len(matches) >= k:
+                break
+        return matches[:k]
+
+    @classmethod
+    def _resolve_matches(cls, matches: List[Tuple[int, float]]) -> List[Tuple[CityRecord, float]]:
+        records = cls.get_cities_by_ids(city_id for city_id, _ in matches)
+        return [(records[city_id], distance) for city_id, distance in matches if city_id in records]
+
+    def to_record(self) -> CityRecord:
+        """Returns an immutable snapshot of this city.
+
+        Returns:
+            CityRecord: The city's id, name, coordinates and OpenWeather ID.
+        """
+        return CityRecord(id=self.id, name=self.name, lat=self.lat, lon=self.lon, owm_id=self.owm_id)
 
  #CHANGE
     def get_weather(self) -> str:
@@ -103,20 +387,384 @@ class Cities(db.Model):
         Raises:
             Exception: If the weather API request fails or an error occurs during retrieval.
         """
-        try:
-            key = os.getenv("WEATHER_KEY")
+        return get_current_weather(self.lat, self.lon)
 
-            url = f"https://api.openweathermap.org/data/2.5/weather?lat={self.lat}&lon={self.lon}&appid={key}"
+    @classmethod
+    def get_weather_batch(cls, cities: Iterable["Cities"], client: WeatherClient = None,
+                          max_workers: int = 8) -> Dict[int, object]:
+        """Fetches the current weather for many cities with as few upstream calls as possible.
 
-            response = requests.get(url)
+        Cached cities are answered from the weather cache. Cities with an OpenWeather
+        ID are split into chunks of GROUP_BATCH_SIZE and fetched with one /group call
+        per chunk; the rest fall back to get_weather. Upstream calls run concurrently.
+
+        Args:
+            cities (Iterable[Cities]): The cities to look up.
+            client (WeatherClient, optional): The client to use. Defaults to the shared client.
+            max_workers (int): Maximum number of upstream calls in flight at once.
 
-            if response.status_code == 200:
-                logger.info("Weather retrieved")
-                data = response.json()
-                return data["weather"][0]["description"]
+        Returns:
+            Dict[int, object]: Maps each city ID to its weather description, or to the
+                exception raised while fetching it.
+        """
+        return dict(cls.iter_weather_batch(cities, client=client, max_workers=max_workers))
+
+    @classmethod
+    def iter_weather_batch(cls, cities: Iterable["Cities"], client: WeatherClient = None,
+                           max_workers: int = 8) -> Iterator[Tuple[int, object]]:
+        """Yields the current weather for many cities as each upstream call completes.
+
+        Works like get_weather_batch, but cached cities are yielded first and every
+        other result as soon as its call returns, so callers can stream them.
+        Stale cached entries are served too and refreshed in the background.
+        Closing the generator early cancels the calls that have not started.
+
+        Args:
+            cities (Iterable[Cities]): The cities to look up.
+            client (WeatherClient, optional): The client to use. Defaults to the shared client.
+            max_workers (int): Maximum number of upstream calls in flight at once.
+
+        Yields:
+            Tuple[int, object]: A city ID and its weather description, or the
+                exception raised while fetching it.
+        """
+        grouped = []
+        singles = []
+        for city in cities:
+            key = weather_cache_key(city.lat, city.lon)
+            cached = weather_cache.get_or_refresh(key, weather_loader(city.lat, city.lon))
+            if cached is not None:
+                yield city.id, cached
+            elif city.owm_id is not None:
+                grouped.append(city)
             else:
-                logger.info("No weather for that city.")
-                raise Exception("Weather API call failed")
+                singles.append(city)
+
+        # Sorted so that identical sets of cities produce identical, shareable group calls.
+        grouped.sort(key=lambda city: city.owm_id)
+        chunks = [grouped[i:i + GROUP_BATCH_SIZE] for i in range(0, len(grouped), GROUP_BATCH_SIZE)]
+        if not chunks and not singles:
+            return
+
+        if client is None:
+            client = get_weather_client()
+
+        max_workers = max(1, min(max_workers, len(chunks) + len(singles)))
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            futures = {executor.submit(fetch_weather_group, chunk, client): chunk for chunk in chunks}
+            futures.update({executor.submit(city.get_weather): city for city in singles})
+
+            for future in as_completed(futures):
+                target = futures[future]
+                if not isinstance(target, list):
+                    try:
+                        yield target.id, future.result()
+                    except Exception as e:
+                        yield target.id, e
+                    continue
+
+                try:
+                    weather = future.result()
+                except Exception as e:
+                    logger.error(f"Group weather request for {len(target)} cities failed: {e}")
+                    weather = {}
+                    error = Exception(f"Error with {e}")
+                else:
+                    error = Exception("No weather returned for city")
+                for city in target:
+                    yield city.id, weather.get(city.owm_id, error)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def fetch_weather_group(cities: List[Cities], client: WeatherClient) -> Dict[int, str]:
+    """Fetches current weather for up to GROUP_BATCH_SIZE cities with a single /group call.
+
+    Successful results are also stored in the weather cache, and concurrent
+    calls for the same list of IDs share a single upstream request.
+
+    Args:
+        cities (List[Cities]): Cities that all have an OpenWeather ID.
+        client (WeatherClient): The client to use.
+
+    Returns:
+        Dict[int, str]: Maps OpenWeather city IDs to weather descriptions.
+
+    Raises:
+        Exception: If the group API request fails.
+    """
+    key = ("group",) + tuple(city.owm_id for city in cities)
+    return weather_flight.do(key, lambda: _request_weather_group(cities, client))
+
+
+def _request_weather_group(cities: List[Cities], client: WeatherClient) -> Dict[int, str]:
+    """Makes the /group call behind fetch_weather_group."""
+    response = client.get("group", id=",".join(str(city.owm_id) for city in cities))
+    if response.status_code != 200:
+        logger.info(f"Group weather request failed with status {response.status_code}")
+        raise Exception("Weather API call failed")
+
+    descriptions = {entry["id"]: entry["weather"][0]["description"] for entry in response.json()["list"]}
+    for city in cities:
+        if city.owm_id in descriptions:
+            weather_cache.set(weather_cache_key(city.lat, city.lon), descriptions[city.owm_id])
+    logger.info(f"Retrieved weather for {len(descriptions)} of {len(cities)} cities in one group call")
+    return descriptions
+
+
+# Session.info key holding the IDs of cities flushed in the current transaction.
+_DIRTY_CITY_IDS = "dirty_city_ids"
+
+
+@event.listens_for(Cities, "after_insert")
+@event.listens_for(Cities, "after_update")
+@event.listens_for(Cities, "after_delete")
+def _mark_city_dirty(mapper, connection, target) -> None:
+    """Remembers a city written through the ORM until its transaction ends.
+
+    Dropping the cache entry at flush time would let a concurrent reader
+    cache the old row again before the write is committed.
+    """
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_CITY_IDS, set()).add(target.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_dirty_cities(session) -> None:
+    """Drops the cities written in a committed transaction from the city cache."""
+    for city_id in session.info.pop(_DIRTY_CITY_IDS, ()):
+        city_cache.invalidate(city_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_dirty_cities(session) -> None:
+    """Forgets the cities written in a rolled-back transaction, whose cache entries are still current."""
+    session.info.pop(_DIRTY_CITY_IDS, None)
+
+
+_spatial_index = None
+_spatial_index_max_id = 0
+_spatial_index_checked = 0.0
+_spatial_index_lock = threading.RLock()
+# Thread building the index in the background, see start_spatial_index_build.
+_spatial_index_build = None
+
+
+def _load_spatial_index() -> Tuple[SpatialIndex, int]:
+    """Builds an index over every city in the table and returns it with the highest city ID."""
+    with read_session() as session:
+        rows = session.execute(db.select(Cities.id, Cities.lat, Cities.lon)).all()
+    logger.info(f"Built spatial index over {len(rows)} cities")
+    return SpatialIndex(rows), max((row.id for row in rows), default=0)
+
+
+def get_spatial_index() -> Optional[SpatialIndex]:
+    """Returns the process-wide spatial index of cities.
+
+    While start_spatial_index_build is still building it, returns None rather
+    than waiting, and callers search the table instead. Without a background
+    build (e.g. under the development server or in tests) the index is built
+    on first use.
+
+    Cities written through the ORM in this process are applied immediately.
+    Every SPATIAL_INDEX_REFRESH seconds the table is checked once for cities
+    inserted elsewhere, such as by another worker.
+
+    Returns:
+        Optional[SpatialIndex]: The index, keyed by city ID, or None while it is being built.
+    """
+    global _spatial_index, _spatial_index_max_id, _spatial_index_checked
+    now = time.time()
+    with _spatial_index_lock:
+        if _spatial_index is None:
+            if _spatial_index_build is not None and _spatial_index_build.is_alive():
+                return None
+            _spatial_index, _spatial_index_max_id = _load_spatial_index()
+            _spatial_index_checked = now
+        elif now - _spatial_index_checked >= SPATIAL_INDEX_REFRESH:
+            query = db.select(Cities.id, Cities.lat, Cities.lon).where(Cities.id > _spatial_index_max_id)
+            with read_session() as session:
+                for row in session.execute(query):
+                    _spatial_index.add(row.id, row.lat, row.lon)
+                    _spatial_index_max_id = max(_spatial_index_max_id, row.id)
+            _spatial_index_checked = now
+        return _spatial_index
+
+
+def start_spatial_index_build(app: Flask) -> threading.Thread:
+    """Discards the spatial index and rebuilds it in a background thread.
+
+    Building over a large table takes seconds, so workers call this at start
+    instead of making the first nearest or radius search wait for it. Until the
+    build finishes, those searches scan the table by bounding box. Cities
+    inserted during the build are picked up by the next refresh.
+
+    Args:
+        app (Flask): The application whose database is indexed.
+
+    Returns:
+        threading.Thread: The thread building the index.
+    """
+    global _spatial_index, _spatial_index_max_id, _spatial_index_build
+    thread = threading.Thread(target=_build_spatial_index, args=(app,), name="spatial-index-build", daemon=True)
+    with _spatial_index_lock:
+        _spatial_index = None
+        _spatial_index_max_id = 0
+        _spatial_index_build = thread
+    thread.start()
+    return thread
+
+
+def _build_spatial_index(app: Flask) -> None:
+    global _spatial_index, _spatial_index_max_id, _spatial_index_checked
+    try:
+        with app.app_context():
+            index, max_id = _load_spatial_index()
+    except Exception as e:
+        # The next search builds it on demand instead.
+        logger.error(f"Background build of the spatial index failed: {e}")
+        return
+    with _spatial_index_lock:
+        # A reset or a newer build during this one makes this result obsolete.
+        if _spatial_index_build is threading.current_thread():
+            _spatial_index, _spatial_index_max_id = index, max_id
+            # Refresh on the next search to pick up cities inserted during the build.
+            _spatial_index_checked = 0.0
+
+
+def reset_spatial_index() -> None:
+    """Discards the spatial index so the next query rebuilds it from the table."""
+    global _spatial_index, _spatial_index_max_id, _spatial_index_build
+    with _spatial_index_lock:
+        _spatial_index = None
+        _spatial_index_max_id = 0
+        _spatial_index_build = None
+
+
+@event.listens_for(Cities, "after_insert")
+@event.listens_for(Cities, "after_update")
+def _index_city(mapper, connection, target) -> None:
+    """Keeps a built spatial index current with cities written through the ORM."""
+    global _spatial_index_max_id
+    with _spatial_index_lock:
+        if _spatial_index is not None:
+            _spatial_index.add(target.id, target.lat, target.lon)
+            _spatial_index_max_id = max(_spatial_index_max_id, target.id)
+
+
+@event.listens_for(Cities, "after_delete")
+def _unindex_city(mapper, connection, target) -> None:
+    """Removes a deleted city from a built spatial index."""
+    with _spatial_index_lock:
+        if _spatial_index is not None:
+            _spatial_index.remove(target.id)
+
+
+def normalize_city_name(name: str) -> str:
+    """Folds a city name to its lookup key.
+
+    Accents are stripped, case is folded and runs of whitespace collapse to a
+    single space, so "São  Paulo" and "sao paulo" share a key.
+
+    Args:
+        name (str): The city name.
+
+    Returns:
+        str: The normalized name.
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.casefold().split())
+
+
+def validate_coordinates(lat: float, lon: float) -> None:
+    """Checks that a latitude and longitude are finite and in range.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Raises:
+        ValueError: If either coordinate is NaN, infinite or out of range.
+    """
+    if not math.isfinite(lat) or not math.isfinite(lon):
+        raise ValueError(f"Coordinates must be finite numbers: {lat=} {lon=}")
+    if not -90.0 <= lat <= 90.0 or not -180.0 <= lon <= 180.0:
+        raise ValueError(f"Coordinates out of range: {lat=} {lon=}")
+
+
+def get_current_weather(lat: float, lon: float) -> str:
+    """Returns the current weather description for a pair of coordinates.
+
+    Results are served from the shared weather cache when possible, and
+    concurrent misses for the same coordinates share a single upstream call.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        str: A short textual description of the current weather.
+
+    Raises:
+        Exception: If the weather API request fails or an error occurs during retrieval.
+    """
+    try:
+        return weather_cache.get_or_load(weather_cache_key(lat, lon), weather_loader(lat, lon))
+    except Exception as e:
+        raise Exception(f"Error with {e}")
+
+
+def weather_loader(lat: float, lon: float) -> Callable[[], str]:
+    """Returns a loader that fetches the weather for a pair of coordinates.
+
+    Concurrent loads for the same coordinates share a single upstream call.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        Callable[[], str]: Fetches the current weather description.
+    """
+    key = weather_cache_key(lat, lon)
+    return lambda: weather_flight.do(key, lambda: fetch_weather(lat, lon))
+
+
+def weather_cache_key(lat: float, lon: float) -> tuple:
+    """Returns the weather cache key for a pair of coordinates.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        tuple: The coordinates rounded to roughly 10 m.
+    """
+    return (round(lat, 4), round(lon, 4))
+
+
+def fetch_weather(lat: float, lon: float) -> str:
+    """Fetches the current weather description for a pair of coordinates from OpenWeather.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        str: A short textual description of the current weather.
+
+    Raises:
+        Exception: If the weather API request fails.
+    """
+    response = get_weather_client().get("weather", lat=lat, lon=lon)
 
-        except Exception as e:
-            raise Exception(f"Error with {e}")
\ No newline at end of file
+    if response.status_code == 200:
+        logger.info("Weather retrieved")
+        data = response.json()
+        return data["weather"][0]["description"]
+    else:
+        logger.info("No weather for that city.")
+        raise Exception("Weather API call failed")
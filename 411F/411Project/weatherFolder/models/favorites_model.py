@@ -2,32 +2,107 @@ import logging
 import math
 import os
 import time
-import requests
-from typing import List
+from typing import Iterator, List, Set, Tuple
 
-from weatherFolder.models.cities_model import Cities
+from sqlalchemy.exc import IntegrityError
+
+from weatherFolder.db import db, read_session
+from weatherFolder.models.cities_model import Cities, CityRecord, UPSTREAM_WAIT_TIMEOUT, weather_cache_key
+from weatherFolder.utils.cache import TTLCache
+from weatherFolder.utils.cache_backends import create_backend
 from weatherFolder.utils.logger import configure_logger
+from weatherFolder.utils.singleflight import SingleFlight
 from weatherFolder.utils.api_utils import get_random
+from weatherFolder.utils.weather_client import get_weather_client
 
 
 logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+# Upper bound on concurrent upstream weather calls per request.
+FAVORITES_MAX_WORKERS = int(os.getenv("FAVORITES_MAX_WORKERS", "8"))
+
+# Maximum number of city names written when logging a favorites list.
+FAVORITES_LOG_LIMIT = 10
+
+FORECAST_STEP_SECONDS = 3 * 60 * 60
+FORECAST_CACHE_MAX_ENTRIES = int(os.getenv("FORECAST_CACHE_MAX_ENTRIES", "1024"))
+
+# Upstream forecasts only change when a new 3-hour step is published, so entries
+# are stored with an explicit expiry at the next step boundary.
+forecast_cache = TTLCache(ttl=FORECAST_STEP_SECONDS, max_entries=FORECAST_CACHE_MAX_ENTRIES, name="forecast",
+                          backend=create_backend("forecast", FORECAST_CACHE_MAX_ENTRIES))
+forecast_flight = SingleFlight(name="forecast", timeout=UPSTREAM_WAIT_TIMEOUT)
+
+
+class Favorites(db.Model):
+    """Represents one city in one user's favorites.
+
+    This SQLAlchemy model maps to the 'favorites' table. Rows are unique per
+    (user_id, city_id), and the composite index on those columns serves both
+    loading a user's list and checking membership.
+    """
+
+    __tablename__ = 'favorites'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False)
+    city_id = db.Column(db.Integer, db.ForeignKey('cities.id', ondelete='CASCADE'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_favorites_user_city', 'user_id', 'city_id', unique=True),
+    )
+
+
 class FavoritesModel:
-    """A class to manage the list of favorite cities selected by the user.
+    """A class to manage the list of favorite cities selected by a user.
 
+    Favorites are stored in the 'favorites' table, so they survive restarts and
+    are shared by every worker serving the user.
     """
 
  #CHANGE (Finish)
-    def __init__(self):
-        """Initializes the FavoritesModel with an empty list of favorite cities.
-        
+    def __init__(self, user_id: int):
+        """Initializes the FavoritesModel for a single user.
+
+        Args:
+            user_id (int): The ID of the user whose favorites are managed.
+
         Attributes:
-            favorites (List[int]): A list of city IDs marked as favorites by the user.
+            favorites (List[int]): The city IDs marked as favorites by the user, in the
+                order they were added. Loaded from the database with one query on first access.
         """
+        self.user_id = user_id
+        self._favorites: List[int] = None
+        self._favorite_set: Set[int] = set()
+
+    @property
+    def favorites(self) -> List[int]:
+        """Returns the user's favorite city IDs, loading them on first access."""
+        if self._favorites is None:
+            with read_session() as session:
+                rows = session.execute(
+                    db.select(Favorites.city_id).filter_by(user_id=self.user_id).order_by(Favorites.id)
+                )
+                self._favorites = list(rows.scalars())
+            self._favorite_set = set(self._favorites)
+        return self._favorites
+
+    def is_favorite(self, city_id: int) -> bool:
+        """Checks whether a city is in the user's favorites.
+
+        Args:
+            city_id (int): The ID of the city.
 
-        self.favorites: List[int] = []
+        Returns:
+            bool: True if the city is a favorite.
+        """
+        if self._favorites is not None:
+            return city_id in self._favorite_set
+        query = db.select(Favorites.id).filter_by(user_id=self.user_id, city_id=city_id).limit(1)
+        with read_session() as session:
+            return session.execute(query).first() is not None
 
 #CHANGE (Finish)
     # Formerly clear_ring
@@ -38,7 +113,10 @@ class FavoritesModel:
             logger.warning("Attempted to clear an empty favorites.")
             return
         logger.info("Clearing the cities from the favorites.")
-        self.favorites.clear()
+        db.session.execute(db.delete(Favorites).filter_by(user_id=self.user_id))
+        db.session.commit()
+        self._favorites = []
+        self._favorite_set = set()
 
  #CHANGE (Finish)
     #formerly enter_ring
@@ -49,7 +127,8 @@ class FavoritesModel:
             city_id (int): The ID of the city to enter the favorites.
 
         Raises:
-            ValueError: If the City ID is invalid or the city does not exist.
+            ValueError: If the City ID is invalid, the city does not exist or it is
+                already in the favorites.
 
         """
         try:
@@ -63,9 +142,38 @@ class FavoritesModel:
         
         logger.info(f"Adding city '{city.name}' (ID {city_id}) to the favorites")
 
-        self.favorites.append(city_id)
+        try:
+            db.session.add(Favorites(user_id=self.user_id, city_id=city_id))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            logger.error(f"City '{city.name}' is already in the favorites.")
+            raise ValueError(f"City '{city.name}' is already in the favorites.")
+
+        if self._favorites is not None:
+            self._favorites.append(city_id)
+            self._favorite_set.add(city_id)
+
+        logger.info(f"Current cities in the favorites: {self.describe_favorites()}")
+
+    def describe_favorites(self, limit: int = FAVORITES_LOG_LIMIT) -> str:
+        """Returns a short, bounded description of the favorites for log messages.
 
-        logger.info(f"Current cities in the favorites: {[Cities.get_city_by_id(b).name for b in self.favorites]}")
+        Only the first `limit` cities are named, looked up with a single query.
+
+        Args:
+            limit (int): Maximum number of city names to include.
+
+        Returns:
+            str: The city count followed by up to `limit` names.
+        """
+        shown = self.favorites[:limit]
+        cities = Cities.get_cities_by_ids(shown)
+        names = ", ".join(cities[city_id].name for city_id in shown if city_id in cities)
+        remaining = len(self.favorites) - len(shown)
+        if remaining > 0:
+            names += f", ... and {remaining} more"
+        return f"{len(self.favorites)} cities [{names}]"
 
     def get_weather_city(self, city_id) -> str:
         """Get the current weather description for the specified favorite city.
@@ -94,27 +202,98 @@ class FavoritesModel:
         return weather
 
     #formerly get_boxers
-    def get_all_cities_and_weather(self):
-        """Retrieves the current list of cities in the list.
+    def get_all_cities_and_weather(self, max_workers: int = None):
+        """Retrieves the current list of cities along with their current weather.
+
+        Weather is fetched with Cities.get_weather_batch: cities with an OpenWeather
+        ID share one group call per chunk, and the upstream calls are fanned out
+        over a bounded thread pool so the total latency is close to the slowest
+        single call rather than the sum of all of them. Results are returned in
+        favorites order.
+
+        Args:
+            max_workers (int, optional): Maximum number of weather calls in flight
+                at once. Defaults to FAVORITES_MAX_WORKERS.
 
         Returns:
-            List[Cities]: A list of Cities dataclass instances representing the cities in the favorites list.
+            List[tuple]: A list of (city, weather) tuples. If the weather lookup for a
+                city fails, its weather entry is the raised exception instead of a
+                description so one bad city does not fail the whole list.
 
+        Raises:
+            ValueError: If a city in the favorites does not exist.
         """
         if not self.favorites:
             logger.warning("Retrieving cities from an empty list.")
-        else:
-            logger.info(f"Retrieving {len(self.favorites)} cities from the list.")
+            return []
 
-        cities = []
+        logger.info(f"Retrieving {len(self.favorites)} cities from the list.")
 
-        for city_id in self.favorites:
-            city = Cities.get_city_by_id(city_id)
-            weather = city.get_weather()
-            cities.append((city,weather))
+        cities = self._load_favorite_cities()
+        if max_workers is None:
+            max_workers = FAVORITES_MAX_WORKERS
+        weather = Cities.get_weather_batch(cities, max_workers=max_workers)
 
-        logger.info(f"Retrieved {len(cities)} boxers from the ring.")
-        return cities
+        results = []
+        for city in cities:
+            if isinstance(weather[city.id], Exception):
+                logger.error(f"Failed to retrieve weather for {city.name}: {weather[city.id]}")
+            results.append((city, weather[city.id]))
+
+        logger.info(f"Retrieved {len(results)} cities with their weather.")
+        return results
+
+    def iter_cities_and_weather(self, max_workers: int = None) -> Iterator[Tuple[CityRecord, object]]:
+        """Streams the favorite cities with their current weather as each lookup completes.
+
+        The favorites are resolved from the database before this method returns,
+        so a missing city raises here rather than part-way through a stream. The
+        returned generator then yields cached cities first and every other city
+        as soon as its upstream call finishes, not in favorites order.
+
+        Args:
+            max_workers (int, optional): Maximum number of weather calls in flight
+                at once. Defaults to FAVORITES_MAX_WORKERS.
+
+        Returns:
+            Iterator[tuple]: (city, weather) tuples, where weather is the raised
+                exception if the lookup for that city failed.
+
+        Raises:
+            ValueError: If a city in the favorites does not exist.
+        """
+        if not self.favorites:
+            logger.warning("Retrieving cities from an empty list.")
+            return iter(())
+
+        logger.info(f"Streaming {len(self.favorites)} cities from the list.")
+
+        cities = self._load_favorite_cities()
+        if max_workers is None:
+            max_workers = FAVORITES_MAX_WORKERS
+
+        def stream():
+            by_id = {city.id: city for city in cities}
+            for city_id, weather in Cities.iter_weather_batch(cities, max_workers=max_workers):
+                if isinstance(weather, Exception):
+                    logger.error(f"Failed to retrieve weather for {by_id[city_id].name}: {weather}")
+                yield by_id[city_id], weather
+
+        return stream()
+
+    def _load_favorite_cities(self) -> List[CityRecord]:
+        """Looks up every favorite city, in favorites order, on the calling thread.
+
+        Raises:
+            ValueError: If a city in the favorites does not exist.
+        """
+        # Database lookups stay on the request thread, which owns the app context.
+        cities_by_id = Cities.get_cities_by_ids(self.favorites)
+        missing = [city_id for city_id in self.favorites if city_id not in cities_by_id]
+        if missing:
+            logger.error(f"Cities with IDs {missing} not found.")
+            raise ValueError(f"City with ID {missing[0]} not found.")
+        return [cities_by_id[city_id] for city_id in self.favorites]
     
 #CHANGE (Finish)
     def get_forecast_city(self, city_id: int) -> dict:
@@ -129,7 +308,7 @@ class FavoritesModel:
         Raises:
             ValueError: If city_id is not in favorites or the city does not exist.
         """
-        if city_id not in self.favorites:
+        if not self.is_favorite(city_id):
             raise ValueError(f"City ID {city_id} is not in favorites.")
         
         try:
@@ -138,36 +317,72 @@ class FavoritesModel:
             logger.error(str(e))
             raise
         
+        cache_key = weather_cache_key(city.lat, city.lon)
+        cached = forecast_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Serving cached forecast for {city.name}")
+            return {"city": city.name, "forecast": cached["daily"]}
+
         key = os.getenv("WEATHER_KEY")
         if not key:
             raise ValueError("Missing OpenWeatherMap API key.")
-        
-        url = f"https://api.openweathermap.org/data/2.5/forecast?lat={city.lat}&lon={city.lon}&appid={key}&units=metric"
-        
+
         try:
-            response = requests.get(url)
-            if response.status_code != 200:
-                logger.warning(f"Failed to fetch forecast for {city.name}: {response.status_code}")
-                raise ValueError("Forecast API request failed.")
-        
-            data = response.json()
-            forecast_list = data["list"]
-        
-            daily_forecast = []
-            for entry in forecast_list:
-                if "12:00:00" in entry["dt_txt"]:
-                    daily_forecast.append({
-                        "date": entry["dt_txt"].split(" ")[0],
-                        "high": entry["main"]["temp_max"],
-                        "low": entry["main"]["temp_min"],
-                        "precipitation_chance": entry.get("pop", 0.0),
-                        "condition": entry["weather"][0]["description"]
-                    })
-                
-            logger.info(f"Retrieved {len(daily_forecast)} forecast entries for {city.name}")
-        
-            return {"city": city.name, "forecast": daily_forecast}
-        
+            forecast = forecast_flight.do(cache_key, lambda: fetch_forecast(city.lat, city.lon, key))
         except Exception as e:
             logger.error(f"Error fetching forecast for {city.name}: {e}")
             raise ValueError(f"Error fetching forecast: {e}")
+
+        logger.info(f"Retrieved {len(forecast['daily'])} forecast entries for {city.name}")
+
+        return {"city": city.name, "forecast": forecast["daily"]}
+
+
+def fetch_forecast(lat: float, lon: float, key: str) -> dict:
+    """Fetches the 5-day forecast for a pair of coordinates and stores it in the forecast cache.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+        key (str): The OpenWeatherMap API key.
+
+    Returns:
+        dict: The raw forecast slots under "slots" and the daily summary under "daily",
+            with one entry per day in the city's local time.
+
+    Raises:
+        ValueError: If the forecast API request fails.
+    """
+    response = get_weather_client().get("forecast", lat=lat, lon=lon, appid=key, units="metric")
+    if response.status_code != 200:
+        logger.warning(f"Failed to fetch forecast for ({lat}, {lon}): {response.status_code}")
+        raise ValueError("Forecast API request failed.")
+
+    data = response.json()
+    forecast_list = data["list"]
+
+    # Imported here so numpy is only loaded once a forecast is actually fetched.
+    from weatherFolder.utils.forecast_aggregation import aggregate_forecast
+
+    utc_offset = data.get("city", {}).get("timezone", 0)
+    daily_forecast = aggregate_forecast(forecast_list, utc_offset)
+
+    forecast = {"slots": forecast_list, "daily": daily_forecast}
+    forecast_cache.set(weather_cache_key(lat, lon), forecast, expires_at=next_forecast_step())
+    return forecast
+
+
+def next_forecast_step(now: float = None) -> float:
+    """Returns the time at which OpenWeather publishes its next 3-hour forecast step.
+
+    Forecast steps are aligned to 00:00, 03:00, ..., 21:00 UTC.
+
+    Args:
+        now (float, optional): Current epoch time in seconds. Defaults to time.time().
+
+    Returns:
+        float: Epoch time of the next step boundary.
+    """
+    if now is None:
+        now = time.time()
+    return (math.floor(now / FORECAST_STEP_SECONDS) + 1) * FORECAST_STEP_SECONDS
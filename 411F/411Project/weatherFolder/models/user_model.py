@@ -1,11 +1,15 @@
-import hashlib
 import logging
 import os
+from dataclasses import dataclass
+from typing import Optional
 
 from flask_login import UserMixin
 from sqlalchemy.exc import IntegrityError
 
-from weatherFolder.db import db
+from weatherFolder.db import db, read_session
+from weatherFolder.models.favorites_model import Favorites
+from weatherFolder.utils.cache import TTLCache
+from weatherFolder.utils.kdf_pool import get_kdf_pool, needs_rehash
 from weatherFolder.utils.logger import configure_logger
 
 
@@ -13,27 +17,61 @@ logger = logging.getLogger(__name__)
 configure_logger(logger)
 
 
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "4096"))
+
+# Identifies the caller of every authenticated request without a database
+# round-trip. Password changes and deletions in this process invalidate entries;
+# the short TTL bounds how long other processes keep serving a deleted user.
+user_cache = TTLCache(ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES, name="user")
+
+
+@dataclass(frozen=True, eq=False)
+class UserRecord(UserMixin):
+    """An immutable, session-independent snapshot of a row in the 'users' table.
+
+    Records carry only what request handlers need to identify the caller, so
+    they can be shared across requests in the process-wide user cache and
+    passed to login_user in place of the ORM object.
+    """
+
+    id: int
+    username: str
+
+    def get_id(self) -> str:
+        """
+        Get the ID used by Flask-Login to identify the user in the session.
+
+        Returns:
+            str: The username of the user.
+        """
+        return self.username
+
+
 class Users(db.Model, UserMixin):
     __tablename__ = 'users'
 
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     salt = db.Column(db.String(32), nullable=False)  # 16-byte salt in hex
-    password = db.Column(db.String(64), nullable=False)  # SHA-256 hash in hex
+    password = db.Column(db.String(255), nullable=False)  # "algorithm$params$hash", or a legacy SHA-256 hex digest
 
     @staticmethod
     def _generate_hashed_password(password: str) -> tuple[str, str]:
         """
-        Generates a salted, hashed password.
+        Generates a salted, hashed password on the KDF pool.
 
         Args:
             password (str): The password to hash.
 
         Returns:
             tuple: A tuple containing the salt and hashed password.
+
+        Raises:
+            KDFPoolBusyError: If the KDF pool has no free slot.
         """
         salt = os.urandom(16).hex()
-        hashed_password = hashlib.sha256((password + salt).encode()).hexdigest()
+        hashed_password = get_kdf_pool().hash(password, salt)
         return salt, hashed_password
 
     @classmethod
@@ -78,17 +116,79 @@ class Users(db.Model, UserMixin):
         Raises:
             ValueError: If the user does not exist.
         """
+        return cls.authenticate(username, password) is not None
+
+    @classmethod
+    def authenticate(cls, username: str, password: str) -> Optional[UserRecord]:
+        """
+        Check a user's password with a single query and return the user on success.
+
+        Hashing runs on the bounded KDF pool. A stored hash made with an older
+        algorithm or parameters is replaced with a current one once the password
+        has been verified. A successful login also primes the user cache, so the
+        requests that follow it are identified without touching the database.
+
+        Args:
+            username (str): The username of the user.
+            password (str): The password to check.
+
+        Returns:
+            Optional[UserRecord]: The user if the password is correct, None otherwise.
+
+        Raises:
+            ValueError: If the user does not exist.
+            KDFPoolBusyError: If the KDF pool has no free slot.
+        """
         user = cls.query.filter_by(username=username).first()
         if not user:
             logger.info("User %s not found", username)
             raise ValueError(f"User {username} not found")
-        hashed_password = hashlib.sha256((password + user.salt).encode()).hexdigest()
-        return hashed_password == user.password
+        pool = get_kdf_pool()
+        if not pool.verify(password, user.salt, user.password):
+            return None
+        if needs_rehash(user.password):
+            user.password = pool.hash(password, user.salt)
+            db.session.commit()
+            logger.info("Upgraded password hash for user: %s", username)
+        record = user.to_record()
+        user_cache.set(username, record)
+        return record
+
+    @classmethod
+    def load_user(cls, username: str) -> Optional[UserRecord]:
+        """
+        Look up the user identified by a session, reading through the user cache.
+
+        Args:
+            username (str): The username stored in the session.
+
+        Returns:
+            Optional[UserRecord]: The user, or None if it does not exist.
+        """
+        record = user_cache.get(username)
+        if record is not None:
+            return record
+        with read_session() as session:
+            user = session.execute(db.select(cls).filter_by(username=username)).scalars().first()
+            if not user:
+                return None
+            record = user.to_record()
+        user_cache.set(username, record)
+        return record
+
+    def to_record(self) -> UserRecord:
+        """
+        Snapshot this row as an immutable UserRecord.
+
+        Returns:
+            UserRecord: The user's id and username.
+        """
+        return UserRecord(id=self.id, username=self.username)
 
     @classmethod
     def delete_user(cls, username: str) -> None:
         """
-        Delete a user from the database.
+        Delete a user and their favorites from the database.
 
         Args:
             username (str): The username of the user to delete.
@@ -100,8 +200,10 @@ class Users(db.Model, UserMixin):
         if not user:
             logger.info("User %s not found", username)
             raise ValueError(f"User {username} not found")
+        db.session.execute(db.delete(Favorites).filter_by(user_id=user.id))
         db.session.delete(user)
         db.session.commit()
+        user_cache.invalidate(username)
         logger.info("User %s deleted successfully", username)
 
     def get_id(self) -> str:
@@ -154,4 +256,5 @@ class Users(db.Model, UserMixin):
         user.salt = salt
         user.password = hashed_password
         db.session.commit()
+        user_cache.invalidate(username)
         logger.info("Password updated successfully for user: %s", username)
\ No newline at end of file
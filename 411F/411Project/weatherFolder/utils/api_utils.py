@@ -1,6 +1,5 @@
 import logging
 import os
-import requests
 
 from weatherFolder.utils.logger import configure_logger
 
@@ -25,6 +24,9 @@ def get_random() -> float:
         RuntimeError: If the request to random.org fails due to a timeout or other request-related error.
 
     """
+    # Imported here so importing the models does not pay for requests.
+    import requests
+
     try:
         logger.info(f"Fetching random number from {RANDOM_ORG_URL}")
 
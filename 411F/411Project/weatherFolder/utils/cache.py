@@ -0,0 +1,206 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Hashable, Tuple
+
+from weatherFolder.utils.cache_backends import CacheBackend, CacheEntry, MemoryBackend
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class TTLCache:
+    """A bounded, thread-safe cache with TTL expiry and size-based eviction.
+
+    Entries are fresh until their TTL runs out. For stale_ttl seconds after that
+    they are still served by get_or_load while a single background refresh
+    replaces them (stale-while-revalidate). Entries live in a CacheBackend:
+    the default MemoryBackend keeps them in this process and evicts the least
+    recently used one once max_entries is reached, while a shared backend lets
+    one upstream fetch serve every worker on the host.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, stale_ttl: float = 0, name: str = "cache",
+                 backend: CacheBackend = None):
+        """Initializes an empty cache.
+
+        Args:
+            ttl (float): Seconds an entry stays fresh.
+            max_entries (int): Maximum number of entries before eviction.
+            stale_ttl (float): Seconds past expiry during which a stale entry may be
+                served while it is refreshed in the background.
+            name (str): Name used in log messages.
+            backend (CacheBackend, optional): Entry storage. Defaults to a
+                MemoryBackend holding max_entries entries.
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.backend = backend if backend is not None else MemoryBackend(max_entries)
+        self._default_max_entries = self.backend.max_entries
+
+        self._lock = threading.Lock()
+        self._refreshing = set()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def max_entries(self) -> int:
+        """The backend's size bound. Setting it resizes the cache; deleting it restores the initial bound."""
+        return self.backend.max_entries
+
+    @max_entries.setter
+    def max_entries(self, max_entries: int) -> None:
+        self.backend.max_entries = max_entries
+
+    @max_entries.deleter
+    def max_entries(self) -> None:
+        self.backend.max_entries = self._default_max_entries
+
+    def get(self, key: Hashable) -> Any:
+        """Returns the fresh value stored for key, or None.
+
+        Args:
+            key (Hashable): The cache key.
+
+        Returns:
+            Any: The cached value, or None if missing or expired.
+        """
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is not None and time.time() < entry.expires_at:
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any, expires_at: float = None, version: float = None) -> bool:
+        """Stores a value unless a newer one is already stored.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            expires_at (float, optional): Absolute expiry time (epoch seconds).
+                Defaults to now + ttl.
+            version (float, optional): When the value was fetched (epoch seconds).
+                Defaults to now.
+
+        Returns:
+            bool: True if the value was stored.
+        """
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + self.ttl
+        if version is None:
+            version = now
+        return self.backend.set(key, CacheEntry(value, expires_at, expires_at + self.stale_ttl, version))
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value for key, calling loader on a miss.
+
+        A stale entry inside the stale-while-revalidate window is returned
+        immediately, and one background thread reloads it.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Any]): Produces the value. Must not depend on
+                request or application context, since it may run in a background thread.
+
+        Returns:
+            Any: The cached or freshly loaded value.
+
+        Raises:
+            Exception: Whatever loader raises on a synchronous miss.
+        """
+        found, value = self._lookup(key, loader)
+        if found:
+            return value
+
+        started = time.time()
+        value = loader()
+        self.set(key, value, version=started)
+        return value
+
+    def get_or_refresh(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the cached value for key without loading it on a miss.
+
+        Fresh and stale entries are served exactly as get_or_load serves them,
+        but a miss returns None so the caller can fetch the value its own way,
+        for example batched together with other keys.
+
+        Args:
+            key (Hashable): The cache key.
+            loader (Callable[[], Any]): Reloads a stale entry in the background.
+
+        Returns:
+            Any: The cached value, or None on a miss.
+        """
+        return self._lookup(key, loader)[1]
+
+    def _lookup(self, key: Hashable, loader: Callable[[], Any]) -> Tuple[bool, Any]:
+        """Counts a lookup and starts a background refresh for a stale entry."""
+        now = time.time()
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is not None and now < entry.expires_at:
+                self.hits += 1
+                return True, entry.value
+            if entry is not None and now < entry.stale_until:
+                self.stale_hits += 1
+                if key not in self._refreshing:
+                    self._refreshing.add(key)
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                return True, entry.value
+            self.misses += 1
+            return False, None
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        """Reloads a stale entry in the background."""
+        try:
+            started = time.time()
+            self.set(key, loader(), version=started)
+        except Exception as e:
+            logger.warning("Background refresh of %s entry %s failed: %s", self.name, key, e)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Removes a single entry if present.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        """Removes every entry.
+
+        The counters are kept, since they are exported as cumulative metrics
+        that must never go backwards.
+        """
+        self.backend.clear()
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    def stats(self) -> dict:
+        """Returns the cache counters.
+
+        Returns:
+            dict: Entry count plus hit, stale hit, miss and eviction counters.
+        """
+        entries = len(self.backend)
+        with self._lock:
+            return {
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.backend.evictions,
+            }
@@ -0,0 +1,309 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+SHARED_CACHE_FILENAME = "weather-cache.sqlite3"
+
+
+def default_shared_cache_path() -> Optional[str]:
+    """Places the shared cache next to the SQLite database in DATABASE_URL.
+
+    That directory already belongs to the app, unlike the system temp
+    directory. Returns None when the database is not a SQLite file.
+    """
+    uri = os.getenv("DATABASE_URL", "")
+    if not uri.startswith("sqlite:///"):
+        return None
+    database = uri[len("sqlite:///"):].split("?", 1)[0]
+    if not database or database == ":memory:" or database.startswith("file:"):
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(database)), SHARED_CACHE_FILENAME)
+
+
+# "memory" keeps entries in each process; "sqlite" shares them between every
+# worker on the host through SHARED_CACHE_PATH.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH") or default_shared_cache_path()
+
+# Shared-cache writes between size checks.
+SQLITE_EVICT_INTERVAL = 64
+
+
+class CacheEntry:
+    """A cached value with its expiry times and version.
+
+    The version is the time the value's load started, so a slow load never
+    overwrites a value fetched after it.
+    """
+
+    __slots__ = ("value", "expires_at", "stale_until", "version")
+
+    def __init__(self, value: Any, expires_at: float, stale_until: float, version: float):
+        self.value = value
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.version = version
+
+
+class CacheBackend(ABC):
+    """Storage for TTLCache entries.
+
+    Backends store and evict entries; expiry decisions, counters and
+    background refreshes stay in TTLCache. Shared backends are visible to
+    every worker on the host.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.evictions = 0
+
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        """Returns the entry stored for key, expired or not, or None."""
+
+    @abstractmethod
+    def set(self, key: Hashable, entry: CacheEntry) -> bool:
+        """Stores entry unless a newer version is already stored, as one atomic step.
+
+        Returns:
+            bool: True if the entry was stored.
+        """
+
+    @abstractmethod
+    def delete(self, key: Hashable) -> None:
+        """Removes the entry for key if present."""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Removes every entry."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Returns the number of stored entries."""
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process storage with least-recently-used eviction."""
+
+    def __init__(self, max_entries: int):
+        """Initializes an empty store.
+
+        Args:
+            max_entries (int): Maximum number of entries before LRU eviction.
+        """
+        super().__init__(max_entries)
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                self._data.move_to_end(key)
+            return entry
+
+    def set(self, key: Hashable, entry: CacheEntry) -> bool:
+        with self._lock:
+            current = self._data.get(key)
+            if current is not None and current.version > entry.version:
+                return False
+            self._data[key] = entry
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteBackend(CacheBackend):
+    """Storage shared by every process on the host through a SQLite file in WAL mode.
+
+    Each cache uses its own namespace in one table. Values are stored as JSON,
+    so they must be JSON-serializable and come back with lists for tuples;
+    nothing read from the file is ever unpickled. The file is created readable
+    only by its owner, and a file owned by another user is refused. Writes are
+    a single upsert that only replaces an older version, so concurrent workers
+    cannot overwrite fresher data. Once a namespace grows past max_entries,
+    expired entries and then those closest to expiry are evicted. Connections
+    are opened per thread and reopened after fork().
+    """
+
+    shared = True
+
+    def __init__(self, path: str, namespace: str, max_entries: int):
+        """Initializes the store, creating the table if needed.
+
+        Args:
+            path (str): Path of the SQLite file shared between processes.
+            namespace (str): Name separating this cache's keys from other caches.
+            max_entries (int): Maximum number of entries kept in the namespace.
+
+        Raises:
+            PermissionError: If the file is owned by another user.
+        """
+        super().__init__(max_entries)
+        self.path = path
+        self.namespace = namespace
+        _create_private_file(path)
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self._writes = 0
+        self._lock = threading.Lock()
+
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, stale_until REAL NOT NULL, version REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key)) WITHOUT ROWID"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_stale ON cache_entries (namespace, stale_until)")
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._pid != os.getpid():
+            # Connections must not be shared with the parent after fork().
+            self._local = threading.local()
+            self._pid = os.getpid()
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: Hashable) -> Optional[CacheEntry]:
+        row = self._connection().execute(
+            "SELECT value, expires_at, stale_until, version FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, repr(key)),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            value = json.loads(row[0])
+        except ValueError:
+            # Written in another format, e.g. by an older version; treat as a miss.
+            return None
+        return CacheEntry(value, row[1], row[2], row[3])
+
+    def set(self, key: Hashable, entry: CacheEntry) -> bool:
+        conn = self._connection()
+        cursor = conn.execute(
+            "INSERT INTO cache_entries (namespace, key, value, expires_at, stale_until, version)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value,"
+            " expires_at = excluded.expires_at, stale_until = excluded.stale_until, version = excluded.version"
+            " WHERE excluded.version >= cache_entries.version",
+            (self.namespace, repr(key), json.dumps(entry.value),
+             entry.expires_at, entry.stale_until, entry.version),
+        )
+        stored = cursor.rowcount > 0
+
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % SQLITE_EVICT_INTERVAL == 1
+        if evict:
+            self._evict(conn)
+        return stored
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drops expired entries, then those closest to expiry, until the namespace fits."""
+        removed = conn.execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND stale_until < ?", (self.namespace, time.time())
+        ).rowcount
+        (count,) = conn.execute("SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)).fetchone()
+        if count > self.max_entries:
+            removed += conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache_entries WHERE namespace = ? ORDER BY stale_until LIMIT ?)",
+                (self.namespace, self.namespace, count - self.max_entries),
+            ).rowcount
+        if removed:
+            with self._lock:
+                self.evictions += removed
+            logger.debug("Evicted %d entries from shared cache %s", removed, self.namespace)
+
+    def delete(self, key: Hashable) -> None:
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, repr(key))
+        )
+
+    def clear(self) -> None:
+        self._connection().execute("DELETE FROM cache_entries WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self) -> int:
+        (count,) = self._connection().execute(
+            "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+        ).fetchone()
+        return count
+
+
+def _create_private_file(path: str) -> None:
+    """Creates path with 0600 permissions, or checks that the existing file is ours and makes it 0600.
+
+    SQLite creates its -wal and -shm files with the database file's permissions.
+
+    Raises:
+        PermissionError: If the file is owned by another user.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+    try:
+        if hasattr(os, "geteuid") and os.fstat(fd).st_uid != os.geteuid():
+            raise PermissionError(f"Shared cache file {path} is owned by another user")
+        if hasattr(os, "fchmod"):
+            os.fchmod(fd, 0o600)
+    finally:
+        os.close(fd)
+
+
+def create_backend(name: str, max_entries: int, kind: str = None) -> CacheBackend:
+    """Builds the configured cache backend.
+
+    Args:
+        name (str): The cache's name, used as its namespace in shared storage.
+        max_entries (int): Maximum number of entries.
+        kind (str, optional): "memory" or "sqlite". Defaults to CACHE_BACKEND.
+
+    Returns:
+        CacheBackend: The backend.
+
+    Raises:
+        ValueError: If the backend kind is not supported, or "sqlite" is chosen
+            while SHARED_CACHE_PATH is unset and DATABASE_URL is not a SQLite file.
+    """
+    kind = kind or CACHE_BACKEND
+    if kind == "memory":
+        return MemoryBackend(max_entries)
+    if kind == "sqlite":
+        if not SHARED_CACHE_PATH:
+            raise ValueError("The sqlite cache backend needs SHARED_CACHE_PATH or a SQLite DATABASE_URL")
+        return SQLiteBackend(SHARED_CACHE_PATH, name, max_entries)
+    raise ValueError(f"Unsupported cache backend: {kind}")
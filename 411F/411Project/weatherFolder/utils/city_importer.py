@@ -0,0 +1,162 @@
+import csv
+import logging
+import os
+import time
+from typing import Dict, Iterator
+
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert
+
+from weatherFolder.db import db
+from weatherFolder.models.cities_model import (Cities, city_cache, normalize_city_name, reset_spatial_index,
+                                               validate_coordinates)
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+
+# Column positions in a GeoNames dump (cities15000.txt and friends). OpenWeather
+# city IDs are GeoNames IDs, so the first column doubles as the owm_id.
+GEONAMES_ID = 0
+GEONAMES_NAME = 1
+GEONAMES_LAT = 4
+GEONAMES_LON = 5
+
+
+def iter_city_rows(path: str) -> Iterator[dict]:
+    """Streams raw city rows from a gazetteer dump without loading it into memory.
+
+    Files ending in .csv must have a header with at least name, lat and lon
+    columns, plus an optional owm_id column. Anything else is read as a
+    tab-separated GeoNames dump.
+
+    Args:
+        path (str): Path to the dump file.
+
+    Yields:
+        dict: The raw name, lat, lon and owm_id values of each row, as strings.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield {"name": row.get("name"), "lat": row.get("lat"), "lon": row.get("lon"), "owm_id": row.get("owm_id")}
+        else:
+            for row in csv.reader(f, delimiter="\t", quoting=csv.QUOTE_NONE):
+                if len(row) <= GEONAMES_LON:
+                    yield {"name": None, "lat": None, "lon": None, "owm_id": None}
+                    continue
+                yield {"name": row[GEONAMES_NAME], "lat": row[GEONAMES_LAT], "lon": row[GEONAMES_LON],
+                       "owm_id": row[GEONAMES_ID]}
+
+
+def validate_city_row(row: dict) -> dict:
+    """Validates and converts a raw city row.
+
+    Args:
+        row (dict): A row produced by iter_city_rows.
+
+    Returns:
+        dict: The row with a stripped name, its lookup key, float coordinates
+            and an integer owm_id, or None when the row has none.
+
+    Raises:
+        ValueError: If the name is empty, the coordinates are missing or out of
+            range, or the owm_id is not an integer.
+    """
+    name = (row.get("name") or "").strip()
+    if not name:
+        raise ValueError("City name is empty")
+    try:
+        lat = float(row["lat"])
+        lon = float(row["lon"])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid coordinates for '{name}'")
+    validate_coordinates(lat, lon)
+    owm_id = (row.get("owm_id") or "").strip()
+    try:
+        owm_id = int(owm_id) if owm_id else None
+    except ValueError:
+        raise ValueError(f"Invalid owm_id for '{name}'")
+    return {"name": name, "name_key": normalize_city_name(name), "lat": lat, "lon": lon, "owm_id": owm_id}
+
+
+def import_cities(path: str, batch_size: int = IMPORT_BATCH_SIZE) -> Dict[str, float]:
+    """Bulk imports cities from a gazetteer dump.
+
+    Rows are streamed from disk, validated, and written in batched executemany
+    transactions of batch_size rows, so memory use stays flat for any file size.
+    A row whose name already exists updates that city's coordinates and owm_id.
+
+    Args:
+        path (str): Path to a GeoNames TSV dump or a CSV file with name, lat, lon
+            and optional owm_id columns.
+        batch_size (int): Number of rows written per transaction.
+
+    Returns:
+        Dict[str, float]: Rows read, imported and skipped, elapsed seconds and rows per second.
+
+    Raises:
+        SQLAlchemyError: If a batch cannot be written. Earlier batches stay committed.
+    """
+    table = Cities.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={
+            "lat": statement.excluded.lat,
+            "lon": statement.excluded.lon,
+            # A file without IDs keeps the ones an earlier import stored.
+            "owm_id": func.coalesce(statement.excluded.owm_id, table.c.owm_id),
+        },
+    )
+
+    logger.info("Importing cities from %s in batches of %d", path, batch_size)
+    start = time.perf_counter()
+    read = imported = skipped = 0
+    batch = []
+
+    def flush():
+        try:
+            db.session.execute(statement, batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        batch.clear()
+
+    for row in iter_city_rows(path):
+        read += 1
+        try:
+            batch.append(validate_city_row(row))
+        except ValueError as e:
+            skipped += 1
+            logger.debug("Skipping row %d: %s", read, e)
+            continue
+        if len(batch) >= batch_size:
+            imported += len(batch)
+            flush()
+            logger.info("Imported %d cities so far", imported)
+
+    if batch:
+        imported += len(batch)
+        flush()
+
+    # Core inserts bypass the ORM events that keep the city cache and spatial index current.
+    city_cache.clear()
+    reset_spatial_index()
+
+    elapsed = time.perf_counter() - start
+    stats = {
+        "read": read,
+        "imported": imported,
+        "skipped": skipped,
+        "seconds": elapsed,
+        "rows_per_second": imported / elapsed if elapsed > 0 else 0.0,
+    }
+    logger.info("Imported %d cities (%d skipped) in %.2fs, %.0f rows/s",
+                imported, skipped, elapsed, stats["rows_per_second"])
+    return stats
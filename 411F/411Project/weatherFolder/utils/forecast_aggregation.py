@@ -0,0 +1,110 @@
+from typing import List, Sequence
+
+import numpy as np
+
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def slot_time(slot: dict) -> int:
+    """Returns the UTC epoch time of a forecast slot.
+
+    Args:
+        slot (dict): One entry of an OpenWeather forecast "list".
+
+    Returns:
+        int: The slot's epoch time in seconds, from "dt" or else parsed from "dt_txt".
+    """
+    if "dt" in slot:
+        return int(slot["dt"])
+    return int(np.datetime64(slot["dt_txt"].replace(" ", "T"), "s").astype(np.int64))
+
+
+def aggregate_forecasts(forecasts: Sequence[Sequence[dict]],
+                        utc_offsets: Sequence[int] = None) -> List[List[dict]]:
+    """Summarizes many cities' 3-hour forecast slots into one entry per local day.
+
+    The slots of every city are flattened into columnar arrays and grouped by
+    (city, day) in a single sort, so the cost is a few array passes whatever
+    the number of cities.
+
+    Args:
+        forecasts (Sequence[Sequence[dict]]): One OpenWeather forecast "list" per city.
+        utc_offsets (Sequence[int], optional): Each city's offset from UTC in seconds,
+            used to decide which day a slot falls on. Defaults to UTC for all cities.
+
+    Returns:
+        List[List[dict]]: For each city, its days in date order, each with the date,
+            high, low and mean temperature, highest precipitation chance, most
+            frequent condition and the number of slots the day covers.
+    """
+    if utc_offsets is None:
+        utc_offsets = [0] * len(forecasts)
+    if len(utc_offsets) != len(forecasts):
+        raise ValueError("Expected one UTC offset per forecast.")
+
+    slots = [slot for forecast in forecasts for slot in forecast]
+    results = [[] for _ in forecasts]
+    if not slots:
+        return results
+
+    counts = np.fromiter((len(forecast) for forecast in forecasts), dtype=np.int64, count=len(forecasts))
+    city = np.repeat(np.arange(len(forecasts)), counts)
+    times = np.fromiter((slot_time(slot) for slot in slots), dtype=np.int64, count=len(slots))
+    day = (times + np.repeat(np.asarray(utc_offsets, dtype=np.int64), counts)) // SECONDS_PER_DAY
+
+    main = [slot["main"] for slot in slots]
+    high = np.fromiter((m["temp_max"] for m in main), dtype=np.float64, count=len(slots))
+    low = np.fromiter((m["temp_min"] for m in main), dtype=np.float64, count=len(slots))
+    temp = np.fromiter((m.get("temp", (m["temp_max"] + m["temp_min"]) / 2) for m in main),
+                       dtype=np.float64, count=len(slots))
+    pop = np.fromiter((slot.get("pop", 0.0) for slot in slots), dtype=np.float64, count=len(slots))
+    names, condition = np.unique([slot["weather"][0]["description"] for slot in slots], return_inverse=True)
+
+    # Sort by (city, day, time) and find where each (city, day) group starts.
+    order = np.lexsort((times, day, city))
+    city, day = city[order], day[order]
+    group_key = city * (day.max() - day.min() + 1) + (day - day.min())
+    is_start = np.r_[True, group_key[1:] != group_key[:-1]]
+    starts = np.flatnonzero(is_start)
+    group = np.cumsum(is_start) - 1
+    sizes = np.diff(np.r_[starts, len(order)])
+
+    day_high = np.maximum.reduceat(high[order], starts)
+    day_low = np.minimum.reduceat(low[order], starts)
+    day_mean = np.add.reduceat(temp[order], starts) / sizes
+    day_pop = np.maximum.reduceat(pop[order], starts)
+
+    # Most frequent condition per group; ties go to the condition seen first that day.
+    pairs, first_seen, pair_counts = np.unique(group * len(names) + condition[order],
+                                               return_index=True, return_counts=True)
+    pair_group = pairs // len(names)
+    best = np.lexsort((first_seen, -pair_counts, pair_group))
+    best = best[np.r_[True, pair_group[best][1:] != pair_group[best][:-1]]]
+    day_condition = names[pairs[best] % len(names)]
+
+    dates = (day[starts] * SECONDS_PER_DAY).astype("datetime64[s]").astype("datetime64[D]").astype(str)
+    for i, start in enumerate(starts):
+        results[city[start]].append({
+            "date": str(dates[i]),
+            "high": float(day_high[i]),
+            "low": float(day_low[i]),
+            "mean": round(float(day_mean[i]), 2),
+            "precipitation_chance": float(day_pop[i]),
+            "condition": str(day_condition[i]),
+            "slots": int(sizes[i]),
+        })
+    return results
+
+
+def aggregate_forecast(slots: Sequence[dict], utc_offset: int = 0) -> List[dict]:
+    """Summarizes one city's 3-hour forecast slots into one entry per local day.
+
+    Args:
+        slots (Sequence[dict]): The OpenWeather forecast "list".
+        utc_offset (int): The city's offset from UTC in seconds.
+
+    Returns:
+        List[dict]: The days in date order, as described in aggregate_forecasts.
+    """
+    return aggregate_forecasts([slots], [utc_offset])[0]
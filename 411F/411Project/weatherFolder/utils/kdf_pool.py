@@ -0,0 +1,252 @@
+import hashlib
+import hmac
+import logging
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+KDF_ALGORITHM = os.getenv("KDF_ALGORITHM", "scrypt")
+KDF_SCRYPT_N = int(os.getenv("KDF_SCRYPT_N", "16384"))
+KDF_SCRYPT_R = int(os.getenv("KDF_SCRYPT_R", "8"))
+KDF_SCRYPT_P = int(os.getenv("KDF_SCRYPT_P", "1"))
+KDF_PBKDF2_ITERATIONS = int(os.getenv("KDF_PBKDF2_ITERATIONS", "600000"))
+
+# "thread" works well because hashlib releases the GIL while deriving keys;
+# "process" isolates the CPU work from request threads entirely.
+KDF_POOL_KIND = os.getenv("KDF_POOL_KIND", "thread")
+KDF_POOL_SIZE = int(os.getenv("KDF_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+KDF_MAX_PENDING = int(os.getenv("KDF_MAX_PENDING", "32"))
+KDF_QUEUE_TIMEOUT = float(os.getenv("KDF_QUEUE_TIMEOUT", "2"))
+
+SCRYPT = "scrypt"
+PBKDF2 = "pbkdf2_sha256"
+
+
+class KDFPoolBusyError(RuntimeError):
+    """Raised when the KDF pool queue stays full for longer than the queue timeout."""
+
+
+def current_params(algorithm: str = KDF_ALGORITHM) -> str:
+    """Returns the configured parameter string for an algorithm.
+
+    Args:
+        algorithm (str): SCRYPT or PBKDF2.
+
+    Returns:
+        str: Comma-separated key=value parameters, e.g. "n=16384,r=8,p=1".
+
+    Raises:
+        ValueError: If the algorithm is not supported.
+    """
+    if algorithm == SCRYPT:
+        return f"n={KDF_SCRYPT_N},r={KDF_SCRYPT_R},p={KDF_SCRYPT_P}"
+    if algorithm == PBKDF2:
+        return f"i={KDF_PBKDF2_ITERATIONS}"
+    raise ValueError(f"Unsupported password hashing algorithm: {algorithm}")
+
+
+def hash_password(password: str, salt: str, algorithm: str = KDF_ALGORITHM, params: str = None) -> str:
+    """Derives a password hash and encodes it with its algorithm and parameters.
+
+    Args:
+        password (str): The password to hash.
+        salt (str): The user's salt.
+        algorithm (str): SCRYPT or PBKDF2. Defaults to KDF_ALGORITHM.
+        params (str, optional): Parameter string. Defaults to the configured parameters.
+
+    Returns:
+        str: The hash as "algorithm$params$hex digest".
+
+    Raises:
+        ValueError: If the algorithm or parameters are not supported.
+    """
+    if algorithm not in (SCRYPT, PBKDF2):
+        raise ValueError(f"Unsupported password hashing algorithm: {algorithm}")
+    if params is None:
+        params = current_params(algorithm)
+    values = dict(item.split("=", 1) for item in params.split(","))
+    secret = password.encode()
+    if algorithm == SCRYPT:
+        n, r, p = int(values["n"]), int(values["r"]), int(values["p"])
+        digest = hashlib.scrypt(secret, salt=salt.encode(), n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+    else:
+        digest = hashlib.pbkdf2_hmac("sha256", secret, salt.encode(), int(values["i"]))
+    return f"{algorithm}${params}${digest.hex()}"
+
+
+def verify_password(password: str, salt: str, stored: str) -> bool:
+    """Checks a password against a stored hash in constant time.
+
+    Hashes without an algorithm prefix are legacy single-round SHA-256 digests.
+
+    Args:
+        password (str): The password to check.
+        salt (str): The user's salt.
+        stored (str): The stored hash.
+
+    Returns:
+        bool: True if the password matches.
+    """
+    if "$" not in stored:
+        candidate = hashlib.sha256((password + salt).encode()).hexdigest()
+    else:
+        algorithm, params, _ = stored.split("$", 2)
+        candidate = hash_password(password, salt, algorithm, params)
+    return hmac.compare_digest(candidate, stored)
+
+
+def needs_rehash(stored: str) -> bool:
+    """Checks whether a stored hash was made with an outdated algorithm or parameters.
+
+    Args:
+        stored (str): The stored hash.
+
+    Returns:
+        bool: True if the hash should be replaced on the user's next login.
+    """
+    if "$" not in stored:
+        return True
+    algorithm, params, _ = stored.split("$", 2)
+    return algorithm != KDF_ALGORITHM or params != current_params()
+
+
+class KDFPool:
+    """A bounded worker pool for password hashing and verification.
+
+    At most size + max_pending calls are admitted at once. Callers beyond that
+    wait up to queue_timeout seconds for a slot and then get KDFPoolBusyError,
+    so a login storm is shed quickly instead of queueing without bound behind
+    CPU-heavy key derivations.
+    """
+
+    def __init__(self, kind: str = None, size: int = None, max_pending: int = None,
+                 queue_timeout: float = None):
+        """Initializes the pool.
+
+        Args:
+            kind (str, optional): "thread" or "process". Defaults to KDF_POOL_KIND.
+            size (int, optional): Number of workers. Defaults to KDF_POOL_SIZE.
+            max_pending (int, optional): Calls allowed to wait for a worker. Defaults to KDF_MAX_PENDING.
+            queue_timeout (float, optional): Seconds to wait for a slot. Defaults to KDF_QUEUE_TIMEOUT.
+
+        Raises:
+            ValueError: If the pool kind is not supported.
+        """
+        self.kind = kind or KDF_POOL_KIND
+        self.size = size or KDF_POOL_SIZE
+        self.max_pending = KDF_MAX_PENDING if max_pending is None else max_pending
+        self.queue_timeout = KDF_QUEUE_TIMEOUT if queue_timeout is None else queue_timeout
+
+        if self.kind == "thread":
+            self._executor: Executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="kdf")
+        elif self.kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=self.size)
+        else:
+            raise ValueError(f"Unsupported KDF pool kind: {self.kind}")
+
+        self._slots = threading.BoundedSemaphore(self.size + self.max_pending)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.in_flight = 0
+
+    def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs fn on a pool worker and waits for its result.
+
+        Args:
+            fn (Callable): A module-level function, so it can be sent to a process pool.
+            *args: Arguments for fn.
+
+        Returns:
+            Any: The value returned by fn.
+
+        Raises:
+            KDFPoolBusyError: If no slot frees up within queue_timeout seconds.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            logger.warning("Password hashing pool is full; rejecting request")
+            raise KDFPoolBusyError("Password hashing is busy, try again shortly")
+        with self._lock:
+            self.submitted += 1
+            self.in_flight += 1
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def hash(self, password: str, salt: str) -> str:
+        """Hashes a password with the configured algorithm on a pool worker.
+
+        Args:
+            password (str): The password to hash.
+            salt (str): The user's salt.
+
+        Returns:
+            str: The encoded hash.
+        """
+        return self.run(hash_password, password, salt)
+
+    def verify(self, password: str, salt: str, stored: str) -> bool:
+        """Checks a password against a stored hash on a pool worker.
+
+        Args:
+            password (str): The password to check.
+            salt (str): The user's salt.
+            stored (str): The stored hash.
+
+        Returns:
+            bool: True if the password matches.
+        """
+        return self.run(verify_password, password, salt, stored)
+
+    def stats(self) -> dict:
+        """Returns the pool counters.
+
+        Returns:
+            dict: Calls submitted, rejected for backpressure and currently in flight.
+        """
+        with self._lock:
+            return {"submitted": self.submitted, "rejected": self.rejected, "in_flight": self.in_flight}
+
+    def close(self) -> None:
+        """Shuts down the pool's workers."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_kdf_pool() -> KDFPool:
+    """Returns the process-wide KDF pool, creating it on first use.
+
+    Returns:
+        KDFPool: The shared pool.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = KDFPool()
+    return _pool
+
+
+def reset_kdf_pool() -> None:
+    """Shuts down and discards the shared KDF pool so the next call builds a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = None
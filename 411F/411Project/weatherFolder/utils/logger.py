@@ -1,27 +1,194 @@
+import atexit
+import copy
+import json
 import logging
+import os
+import queue
+import random
 import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
 
-from flask import current_app, has_request_context
+from flask import g, has_request_context, request
+from flask.logging import default_handler
 
 
-def configure_logger(logger):
-    logger.setLevel(logging.DEBUG)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Fraction of INFO-and-below records kept per request, by Flask endpoint name,
+# e.g. "get_weather_city=0.1,get_all_cities_and_weather=0.05". Warnings and
+# errors are always kept.
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def parse_sample_rates(spec: str) -> dict:
+    """Parses a comma-separated list of endpoint=rate pairs.
+
+    Args:
+        spec (str): The rates, e.g. "get_weather_city=0.1,login=1".
+
+    Returns:
+        dict: Maps endpoint names to the fraction of requests whose info logs are kept.
+
+    Raises:
+        ValueError: If an entry is not of the form endpoint=rate.
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        endpoint, sep, rate = item.partition("=")
+        if not sep:
+            raise ValueError(f"Invalid log sample rate '{item}', expected endpoint=rate")
+        rates[endpoint.strip()] = float(rate)
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        endpoint = getattr(record, "endpoint", None)
+        if endpoint is not None:
+            entry["endpoint"] = endpoint
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RouteSampler(logging.Filter):
+    """Keeps or drops all of a request's info logs together, at a per-endpoint rate.
+
+    The decision is made on the first record of a request and stored on flask.g,
+    so a sampled request logs completely and an unsampled one not at all.
+    Records outside a request and records above INFO always pass.
+    """
+
+    def __init__(self, rates: dict = None, default_rate: float = 1.0):
+        """Initializes the filter.
+
+        Args:
+            rates (dict, optional): Maps endpoint names to sample rates between 0 and 1.
+            default_rate (float): Rate for endpoints without their own entry.
+        """
+        super().__init__()
+        self.rates = rates or {}
+        self.default_rate = default_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not has_request_context():
+            return True
+        record.endpoint = request.endpoint
+        if record.levelno > logging.INFO:
+            return True
+        keep = g.get("_log_sampled")
+        if keep is None:
+            rate = self.rates.get(request.endpoint, self.default_rate)
+            keep = rate >= 1 or random.random() < rate
+            g._log_sampled = keep
+        return keep
 
-    # Create a console handler that logs to stderr
-    handler = logging.StreamHandler(sys.stderr)
-    handler.setLevel(logging.DEBUG)
 
-    # Create a formatter with a timestamp
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+class _ThreadQueueHandler(QueueHandler):
+    """A QueueHandler for an in-process listener thread.
 
-    # Add the formatter to the handler
-    handler.setFormatter(formatter)
+    The stock handler formats every record on the calling thread. Here only
+    %-style arguments are merged, so the caller does not hold references that
+    another thread would later render; timestamps, layout and JSON encoding
+    happen on the listener thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Other handlers, such as pytest's caplog, may still see the original record.
+        record = copy.copy(record)
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block a request on logging; drop the record instead.
+            pass
+
+
+_listener = None
+_install_lock = threading.Lock()
+
+
+def install_logging() -> None:
+    """Routes all logging through one background writer, once per process.
+
+    The root logger gets a single non-blocking queue handler at LOG_LEVEL;
+    a QueueListener thread formats records as text or JSON (LOG_FORMAT) and
+    writes them to stderr. Calling it again has no effect.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    with _install_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        queue_handler = _ThreadQueueHandler(log_queue)
+        queue_handler.addFilter(RouteSampler(parse_sample_rates(LOG_SAMPLE_RATES), LOG_SAMPLE_RATE))
+
+        root = logging.getLogger()
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(queue_handler)
+
+        _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def restart_logging_listener() -> None:
+    """Starts a fresh writer thread for the installed pipeline.
+
+    Threads do not survive fork(), so a worker forked from a parent that
+    already installed logging must call this before it logs anything.
+    """
+    global _listener
+    with _install_lock:
+        if _listener is None:
+            return
+        atexit.unregister(_listener.stop)
+        _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+def configure_logger(logger):
+    """Makes a logger write through the shared logging pipeline.
 
-    # Add the handler to the logger
-    logger.addHandler(handler)
+    Records propagate to the root logger's queue handler, so the logger itself
+    gets no handlers of its own. Flask's default stderr handler is removed from
+    the app logger so its records are not written twice.
 
-    # We also need to add the handler to the Flask logger
-    if has_request_context():
-        app_logger = current_app.logger
-        for handler in app_logger.handlers:
-            logger.addHandler(handler)
\ No newline at end of file
+    Args:
+        logger (logging.Logger): The logger to configure.
+    """
+    install_logging()
+    logger.removeHandler(default_handler)
+    logger.propagate = True
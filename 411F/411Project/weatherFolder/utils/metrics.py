@@ -0,0 +1,381 @@
+import bisect
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from flask import Flask, Response, g, has_request_context, request
+from sqlalchemy import event
+
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Directory shared by every worker on the host. Each process writes a snapshot
+# of its own metrics there and a scrape sums them all. Unset, only the serving
+# process's metrics are reported.
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+COUNTER = "counter"
+HISTOGRAM = "histogram"
+GAUGE = "gauge"
+
+# name -> (type, help text, histogram buckets)
+METRICS = {
+    "http_requests_total": (COUNTER, "HTTP requests by route, method and status code.", None),
+    "http_request_duration_seconds": (HISTOGRAM, "HTTP request latency by route.", LATENCY_BUCKETS),
+    "openweather_requests_total": (COUNTER, "OpenWeather calls by endpoint and status code.", None),
+    "openweather_request_duration_seconds": (HISTOGRAM, "OpenWeather call latency by endpoint.", LATENCY_BUCKETS),
+    "db_queries_total": (COUNTER, "SQL statements executed.", None),
+    "db_queries_per_request": (HISTOGRAM, "SQL statements executed per HTTP request, by route.", COUNT_BUCKETS),
+    "db_time_per_request_seconds": (HISTOGRAM, "Time spent in SQL per HTTP request, by route.", LATENCY_BUCKETS),
+    "cache_requests_total": (COUNTER, "Cache lookups by cache and result.", None),
+    "cache_evictions_total": (COUNTER, "Entries evicted by cache.", None),
+    "cache_hit_ratio": (GAUGE, "Fraction of cache lookups served from the cache, stale hits included.", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms for one process.
+
+    Updates are a dict lookup and an addition under a lock. Collectors added
+    with add_collector are polled only when a snapshot is taken, for values
+    that are already counted elsewhere, such as cache statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        # (name, labels) -> [per-bucket counts..., +Inf count, sum]
+        self._histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, dict, float]]]] = []
+
+    def inc(self, name: str, labels: dict = None, value: float = 1) -> None:
+        """Adds value to a counter."""
+        key = (name, tuple(sorted((labels or {}).items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: dict = None) -> None:
+        """Records one observation in a histogram."""
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted((labels or {}).items())))
+        index = bisect.bisect_left(buckets, value)
+        with self._lock:
+            counts = self._histograms.get(key)
+            if counts is None:
+                counts = self._histograms[key] = [0] * (len(buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, dict, float]]]) -> None:
+        """Registers a function returning (counter name, labels, value) samples at snapshot time."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """Returns this process's metrics in a JSON-serializable form."""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: list(counts) for key, counts in self._histograms.items()}
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                key = (name, tuple(sorted(labels.items())))
+                counters[key] = counters.get(key, 0) + value
+        return {
+            "counters": [[name, list(labels), value] for (name, labels), value in counters.items()],
+            "histograms": [[name, list(labels), counts] for (name, labels), counts in histograms.items()],
+        }
+
+    def clear(self) -> None:
+        """Drops every recorded value. Collectors stay registered."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+registry = MetricsRegistry()
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+# (pid, file name) of this process's snapshot.
+_snapshot_name = None
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_path() -> str:
+    """Returns this process's snapshot file.
+
+    The name includes the time the process first flushed as well as its pid, so
+    a recycled worker that gets an exited worker's pid never overwrites that
+    worker's snapshot.
+    """
+    global _snapshot_name
+    pid = os.getpid()
+    with _snapshot_lock:
+        if _snapshot_name is None or _snapshot_name[0] != pid:
+            _snapshot_name = (pid, f"metrics-{pid}-{time.time_ns()}.json")
+        return os.path.join(METRICS_DIR, _snapshot_name[1])
+
+
+def _ensure_private_dir(path: str) -> None:
+    """Creates path with 0700 permissions, or checks that the existing directory is ours.
+
+    Raises:
+        PermissionError: If the directory is owned by another user, who could
+            then read or plant snapshots.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    if hasattr(os, "geteuid") and os.stat(path).st_uid != os.geteuid():
+        raise PermissionError(f"Metrics directory {path} is owned by another user")
+
+
+def flush() -> None:
+    """Writes this process's snapshot to METRICS_DIR, replacing the previous one atomically."""
+    if not METRICS_DIR:
+        return
+    _ensure_private_dir(METRICS_DIR)
+    path = snapshot_path()
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _flush_loop() -> None:
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush()
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
+
+
+def start_flusher() -> None:
+    """Starts the background thread that periodically flushes snapshots, once per process."""
+    global _flusher
+    if not METRICS_DIR or _flusher is not None:
+        return
+    with _flusher_lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name="metrics-flusher", daemon=True)
+            _flusher.start()
+
+
+def reset_metrics() -> None:
+    """Starts this process's metrics from zero.
+
+    A forked worker inherits its parent's values and loses the flusher thread,
+    so it must call this before serving requests.
+    """
+    global _flusher
+    registry.clear()
+    with _flusher_lock:
+        _flusher = None
+    start_flusher()
+
+
+def clear_metrics_dir() -> None:
+    """Removes every snapshot in METRICS_DIR, e.g. when the server starts."""
+    if not METRICS_DIR:
+        return
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def collect() -> List[dict]:
+    """Returns the snapshots of every process, this one's being current."""
+    if not METRICS_DIR:
+        return [registry.snapshot()]
+    flush()
+    snapshots = []
+    for path in glob.glob(os.path.join(METRICS_DIR, "metrics-*.json")):
+        try:
+            with open(path) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError) as e:
+            logger.warning("Skipping unreadable metrics snapshot %s: %s", path, e)
+    return snapshots
+
+
+def merge(snapshots: Iterable[dict]) -> Tuple[dict, dict]:
+    """Sums counters and histogram buckets across snapshots.
+
+    Snapshots of exited workers are kept, so counters never go backwards when a
+    worker is recycled.
+
+    Returns:
+        Tuple[dict, dict]: Counters and histograms keyed by (name, labels).
+    """
+    counters: Dict[Tuple[str, Labels], float] = {}
+    histograms: Dict[Tuple[str, Labels], List[float]] = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts in snapshot["histograms"]:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            total = histograms.get(key)
+            histograms[key] = counts if total is None else [a + b for a, b in zip(total, counts)]
+    return counters, histograms
+
+
+def cache_hit_ratios(counters: dict) -> Dict[Labels, float]:
+    """Computes each cache's hit ratio from the merged cache_requests_total counters."""
+    hits: Dict[str, float] = {}
+    totals: Dict[str, float] = {}
+    for (name, labels), value in counters.items():
+        if name != "cache_requests_total":
+            continue
+        label_map = dict(labels)
+        cache = label_map["cache"]
+        totals[cache] = totals.get(cache, 0) + value
+        if label_map["result"] != "miss":
+            hits[cache] = hits.get(cache, 0) + value
+    return {(("cache", cache),): hits.get(cache, 0) / total for cache, total in totals.items() if total}
+
+
+def format_labels(labels: Labels, extra: Tuple[str, str] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus() -> str:
+    """Renders the metrics of every worker in the Prometheus text exposition format."""
+    counters, histograms = merge(collect())
+    gauges = {("cache_hit_ratio", labels): value for labels, value in cache_hit_ratios(counters).items()}
+
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        if kind == HISTOGRAM:
+            series = sorted((key, value) for key, value in histograms.items() if key[0] == name)
+        else:
+            source = gauges if kind == GAUGE else counters
+            series = sorted((key, value) for key, value in source.items() if key[0] == name)
+        if not series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (_, labels), value in series:
+            if kind != HISTOGRAM:
+                lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{format_labels(labels, ('le', format_value(bound)))} {format_value(cumulative)}")
+            cumulative += value[len(buckets)]
+            lines.append(f"{name}_bucket{format_labels(labels, ('le', '+Inf'))} {format_value(cumulative)}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(value[-1])}")
+            lines.append(f"{name}_count{format_labels(labels)} {format_value(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+def observe_upstream(endpoint: str, status: str, seconds: float) -> None:
+    """Records one OpenWeather call.
+
+    Args:
+        endpoint (str): The endpoint name, e.g. "weather" or "forecast".
+        status (str): The HTTP status code, or "error" if no response arrived.
+        seconds (float): How long the call took, retries included.
+    """
+    registry.inc("openweather_requests_total", {"endpoint": endpoint, "status": status})
+    registry.observe("openweather_request_duration_seconds", seconds, {"endpoint": endpoint})
+
+
+def register_caches(caches: Iterable) -> None:
+    """Reports the hit, stale hit, miss and eviction counters of TTLCaches.
+
+    Args:
+        caches (Iterable[TTLCache]): The caches to report.
+    """
+    caches = list(caches)
+
+    def collect_caches():
+        for cache in caches:
+            stats = cache.stats()
+            for result, stat in (("hit", "hits"), ("stale_hit", "stale_hits"), ("miss", "misses")):
+                yield "cache_requests_total", {"cache": cache.name, "result": result}, stats[stat]
+            yield "cache_evictions_total", {"cache": cache.name}, stats["evictions"]
+
+    registry.add_collector(collect_caches)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append((context, time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _, started = conn.info["metrics_query_start"].pop()
+    _record_query(time.perf_counter() - started)
+
+
+def _handle_error(exception_context):
+    """Pops the start time of a failed statement, which after_cursor_execute never sees."""
+    conn = exception_context.connection
+    starts = conn.info.get("metrics_query_start") if conn is not None else None
+    if starts and starts[-1][0] is exception_context.execution_context:
+        _, started = starts.pop()
+        _record_query(time.perf_counter() - started)
+
+
+def _record_query(elapsed: float) -> None:
+    registry.inc("db_queries_total")
+    if has_request_context():
+        g._metrics_db_queries = g.get("_metrics_db_queries", 0) + 1
+        g._metrics_db_time = g.get("_metrics_db_time", 0.0) + elapsed
+
+
+def instrument_app(app: Flask, engines: Iterable) -> None:
+    """Records request, status, latency and per-request SQL metrics for an app.
+
+    Args:
+        app (Flask): The application to instrument.
+        engines (Iterable[Engine]): The database engines whose statements are counted.
+    """
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def start_request_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response: Response) -> Response:
+        started = g.get("_metrics_started")
+        if started is None:
+            return response
+        # The URL rule, not the path, so IDs in the URL do not create new series.
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        registry.inc("http_requests_total",
+                     {"route": route, "method": request.method, "status": str(response.status_code)})
+        registry.observe("http_request_duration_seconds", time.perf_counter() - started, {"route": route})
+        registry.observe("db_queries_per_request", g.get("_metrics_db_queries", 0), {"route": route})
+        registry.observe("db_time_per_request_seconds", g.get("_metrics_db_time", 0.0), {"route": route})
+        return response
+
+    start_flusher()
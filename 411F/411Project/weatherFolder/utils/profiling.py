@@ -0,0 +1,241 @@
+import cProfile
+import hmac
+import itertools
+import logging
+import os
+import pstats
+import random
+import re
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+# Requests carrying this token in PROFILE_HEADER are profiled, and the token is
+# required to list and download profiles. Unset, only sampling can profile.
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fraction of all requests profiled regardless of headers.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "weather-profiles"))
+# Oldest profiles are deleted beyond this many.
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "50"))
+
+PROFILE_HEADER = "X-Profile-Token"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+PSTATS_SUFFIX = ".pstats"
+COLLAPSED_SUFFIX = ".collapsed"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.(pstats|collapsed)$")
+
+# Deepest call stack written to the collapsed-stack file.
+MAX_STACK_DEPTH = 64
+
+_sequence = itertools.count()
+
+
+def profiling_enabled() -> bool:
+    """Returns True if any request can be profiled."""
+    return bool(PROFILE_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+
+def is_authorized(token: Optional[str]) -> bool:
+    """Checks a profiling token in constant time.
+
+    Args:
+        token (Optional[str]): The token sent by the client.
+
+    Returns:
+        bool: True if profiling tokens are configured and this one matches.
+    """
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def function_label(func: tuple) -> str:
+    """Formats a pstats function key as module:line(name)."""
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{os.path.basename(filename)}:{line}({name})"
+
+
+def collapsed_stacks(stats: pstats.Stats) -> List[str]:
+    """Converts profile stats to collapsed stacks, one "frame;frame;frame microseconds" line each.
+
+    cProfile only records caller/callee pairs, so a callee's time is split
+    between its callers in proportion to the time each call edge took. Recursive
+    calls end the stack they appear in.
+
+    Args:
+        stats (pstats.Stats): The stats to convert.
+
+    Returns:
+        List[str]: Lines for flame graph tools such as flamegraph.pl or speedscope.
+    """
+    children: Dict[tuple, List[tuple]] = {}
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_time) in callers.items():
+            children.setdefault(caller, []).append((func, edge_time))
+    roots = [func for func, entry in stats.stats.items() if not entry[4]]
+
+    totals: Dict[str, float] = {}
+
+    def walk(func: tuple, time_in: float, stack: List[tuple]) -> None:
+        stack = stack + [func]
+        calls = [(child, t) for child, t in children.get(func, ()) if child not in stack and t > 0]
+        own_total = stats.stats[func][3]
+        scale = time_in / own_total if own_total else 0.0
+        child_time = 0.0
+        if len(stack) < MAX_STACK_DEPTH:
+            for child, edge_time in calls:
+                walk(child, edge_time * scale, stack)
+                child_time += edge_time * scale
+        self_time = time_in - child_time
+        if self_time > 0:
+            key = ";".join(function_label(f) for f in stack)
+            totals[key] = totals.get(key, 0.0) + self_time
+
+    for root in roots:
+        walk(root, stats.stats[root][3], [])
+    return [f"{stack} {round(seconds * 1e6)}" for stack, seconds in sorted(totals.items()) if seconds >= 1e-6]
+
+
+def prune_profiles(directory: str, max_files: int) -> None:
+    """Deletes the oldest profiles beyond max_files."""
+    try:
+        names = [name for name in os.listdir(directory) if name.endswith(PSTATS_SUFFIX)]
+    except FileNotFoundError:
+        return
+
+    def modified(name: str) -> float:
+        try:
+            return os.path.getmtime(os.path.join(directory, name))
+        except FileNotFoundError:
+            return 0.0
+
+    names.sort(key=modified)
+    for name in names[:max(0, len(names) - max_files)]:
+        base = name[:-len(PSTATS_SUFFIX)]
+        for suffix in (PSTATS_SUFFIX, COLLAPSED_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, base + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory: str = None) -> List[dict]:
+    """Returns the stored profiles, newest first.
+
+    Returns:
+        List[dict]: The id, creation time and file names of each profile.
+    """
+    directory = directory or PROFILE_DIR
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        if not name.endswith(PSTATS_SUFFIX):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            created = os.path.getmtime(path)
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            continue
+        base = name[:-len(PSTATS_SUFFIX)]
+        profiles.append({
+            "id": base,
+            "created": created,
+            "pstats": name,
+            "pstats_bytes": size,
+            "collapsed": base + COLLAPSED_SUFFIX,
+        })
+    return sorted(profiles, key=lambda profile: profile["created"], reverse=True)
+
+
+class ProfilingMiddleware:
+    """WSGI middleware that runs selected requests under cProfile.
+
+    A request is profiled when it carries a valid PROFILE_HEADER or is picked
+    by PROFILE_SAMPLE_RATE. The profiler covers the whole WSGI call, including
+    streaming the response body, on the request thread; work done on other
+    threads shows up as the time the request thread spent waiting for it. The
+    stats are written to PROFILE_DIR as a pstats file and a collapsed-stack
+    file, and the response carries the profile's id in PROFILE_ID_HEADER.
+    Install it only when profiling_enabled(), so disabled profiling adds
+    nothing to a request.
+    """
+
+    def __init__(self, wsgi_app: Callable, directory: str = None, sample_rate: float = None,
+                 max_files: int = None):
+        """Wraps a WSGI application.
+
+        Args:
+            wsgi_app (Callable): The application to wrap.
+            directory (str, optional): Where profiles are written. Defaults to PROFILE_DIR.
+            sample_rate (float, optional): Fraction of requests profiled. Defaults to PROFILE_SAMPLE_RATE.
+            max_files (int, optional): Profiles kept on disk. Defaults to PROFILE_MAX_FILES.
+        """
+        self.wsgi_app = wsgi_app
+        self.directory = directory or PROFILE_DIR
+        self.sample_rate = PROFILE_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.max_files = max_files or PROFILE_MAX_FILES
+
+    def should_profile(self, environ: dict) -> bool:
+        token = environ.get("HTTP_" + PROFILE_HEADER.upper().replace("-", "_"))
+        if token is not None and is_authorized(token):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, environ: dict, start_response: Callable) -> Iterable[bytes]:
+        if not self.should_profile(environ):
+            return self.wsgi_app(environ, start_response)
+
+        slug = re.sub(r"[^\w]+", "_", environ.get("PATH_INFO", "")).strip("_")[:60] or "root"
+        profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_sequence)}-{slug}"
+
+        def profiled_start_response(status, headers, exc_info=None):
+            return start_response(status, list(headers) + [(PROFILE_ID_HEADER, profile_id)], exc_info)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            body = self.wsgi_app(environ, profiled_start_response)
+        except BaseException:
+            profiler.disable()
+            self._save(profiler, profile_id, time.perf_counter() - started)
+            raise
+        return self._iterate(body, profiler, profile_id, started)
+
+    def _iterate(self, body: Iterable[bytes], profiler: cProfile.Profile, profile_id: str,
+                 started: float) -> Iterable[bytes]:
+        try:
+            yield from body
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+            profiler.disable()
+            self._save(profiler, profile_id, time.perf_counter() - started)
+
+    def _save(self, profiler: cProfile.Profile, profile_id: str, elapsed: float) -> None:
+        """Writes a profile's files and prunes old ones. Failures are logged, never raised."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            base = os.path.join(self.directory, profile_id)
+            stats = pstats.Stats(profiler)
+            stats.dump_stats(base + PSTATS_SUFFIX)
+            with open(base + COLLAPSED_SUFFIX, "w") as f:
+                f.write("\n".join(collapsed_stacks(stats)) + "\n")
+            prune_profiles(self.directory, self.max_files)
+            logger.info("Saved profile %s (%.1f ms)", profile_id, elapsed * 1000)
+        except Exception as e:
+            logger.warning("Could not save profile %s: %s", profile_id, e)
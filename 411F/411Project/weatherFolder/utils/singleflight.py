@@ -0,0 +1,111 @@
+import logging
+import threading
+from typing import Any, Callable, Hashable
+
+from weatherFolder.utils.logger import configure_logger
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Collapses concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; every caller that arrives
+    while it is in flight waits for it and receives the same result or error.
+    """
+
+    def __init__(self, name: str = "singleflight", timeout: float = None):
+        """Initializes the group.
+
+        Args:
+            name (str): Name used in log messages.
+            timeout (float, optional): Default number of seconds a waiting caller
+                blocks before giving up. None waits indefinitely.
+        """
+        self.name = name
+        self.timeout = timeout
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self.executions = 0
+        self.collapsed = 0
+        self.timeouts = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: float = None) -> Any:
+        """Runs fn once per key among concurrent callers and shares its outcome.
+
+        Args:
+            key (Hashable): Identifies calls that may be collapsed together.
+            fn (Callable[[], Any]): The function to run.
+            timeout (float, optional): Seconds a waiting caller blocks for the
+                in-flight call. Defaults to the group's timeout.
+
+        Returns:
+            Any: The value returned by fn.
+
+        Raises:
+            TimeoutError: If a waiting caller gives up before the in-flight call finishes.
+            Exception: Whatever fn raised, re-raised in every caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+            else:
+                self.collapsed += 1
+                leader = False
+
+        if not leader:
+            if not call.done.wait(self.timeout if timeout is None else timeout):
+                with self._lock:
+                    self.timeouts += 1
+                logger.warning("Timed out waiting for in-flight %s call %s", self.name, key)
+                raise TimeoutError(f"Timed out waiting for in-flight {self.name} call")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> dict:
+        """Returns the group counters.
+
+        Returns:
+            dict: Executions, collapsed calls, wait timeouts and calls currently in flight.
+        """
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "collapsed": self.collapsed,
+                "timeouts": self.timeouts,
+                "in_flight": len(self._calls),
+            }
+
+    def reset_stats(self) -> None:
+        """Resets the counters."""
+        with self._lock:
+            self.executions = self.collapsed = self.timeouts = 0
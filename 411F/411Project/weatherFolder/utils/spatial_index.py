@@ -0,0 +1,266 @@
+import heapq
+import math
+import threading
+from operator import itemgetter
+from typing import Iterable, List, Tuple
+
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Points per leaf. Leaves that grow past twice this size through inserts are split.
+LEAF_SIZE = 32
+
+# Points sampled to pick each split.
+SAMPLE_SIZE = 255
+
+
+def to_unit_vector(lat: float, lon: float) -> Tuple[float, float, float]:
+    """Converts latitude/longitude in degrees to a point on the unit sphere.
+
+    Args:
+        lat (float): The latitude.
+        lon (float): The longitude.
+
+    Returns:
+        tuple: The (x, y, z) coordinates of the point.
+    """
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord_sq: float) -> float:
+    """Converts a squared chord length on the unit sphere to a great-circle distance.
+
+    Args:
+        chord_sq (float): The squared straight-line distance between two unit vectors.
+
+    Returns:
+        float: The great-circle distance in kilometres.
+    """
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(chord_sq) / 2))
+
+
+def km_to_chord_sq(distance_km: float) -> float:
+    """Converts a great-circle distance to the equivalent squared chord length.
+
+    Args:
+        distance_km (float): The distance in kilometres.
+
+    Returns:
+        float: The squared chord length on the unit sphere.
+    """
+    angle = min(math.pi, distance_km / EARTH_RADIUS_KM)
+    return (2 * math.sin(angle / 2)) ** 2
+
+
+def distance_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Returns the great-circle distance between two locations.
+
+    Args:
+        lat1 (float): The latitude of the first location.
+        lon1 (float): The longitude of the first location.
+        lat2 (float): The latitude of the second location.
+        lon2 (float): The longitude of the second location.
+
+    Returns:
+        float: The distance in kilometres.
+    """
+    a = to_unit_vector(lat1, lon1)
+    b = to_unit_vector(lat2, lon2)
+    return chord_to_km(sum((x - y) ** 2 for x, y in zip(a, b)))
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """Returns latitude and longitude ranges containing every point within a radius.
+
+    The box is only a prefilter for a scan without the index; points in it must
+    still be checked with distance_km. Boxes reaching a pole cover every
+    longitude, and boxes crossing the antimeridian are split in two ranges.
+
+    Args:
+        lat (float): The latitude of the centre.
+        lon (float): The longitude of the centre.
+        radius_km (float): The radius in kilometres.
+
+    Returns:
+        tuple: (min_lat, max_lat, [(min_lon, max_lon), ...]).
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    min_lat = lat - math.degrees(angle)
+    max_lat = lat + math.degrees(angle)
+    if min_lat <= -90 or max_lat >= 90 or angle >= math.pi / 2:
+        return max(min_lat, -90.0), min(max_lat, 90.0), [(-180.0, 180.0)]
+
+    delta_lon = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(lat)))))
+    min_lon, max_lon = lon - delta_lon, lon + delta_lon
+    if min_lon < -180:
+        return min_lat, max_lat, [(min_lon + 360, 180.0), (-180.0, max_lon)]
+    if max_lon > 180:
+        return min_lat, max_lat, [(min_lon, 180.0), (-180.0, max_lon - 360)]
+    return min_lat, max_lat, [(min_lon, max_lon)]
+
+
+class _Node:
+    __slots__ = ("axis", "split", "left", "right", "points")
+
+    def __init__(self, points: list = None):
+        self.axis = 0
+        self.split = 0.0
+        self.left = None
+        self.right = None
+        self.points = points
+
+
+class SpatialIndex:
+    """A KD-tree over points on the sphere for nearest-neighbour and radius queries.
+
+    Coordinates are stored as 3D unit vectors, where straight-line (chord)
+    distance grows monotonically with great-circle distance. That keeps the
+    tree exact across the antimeridian and near the poles. Leaves are buckets
+    of points, so inserts and removals update the tree in place without a rebuild.
+    """
+
+    def __init__(self, points: Iterable[Tuple[int, float, float]] = ()):
+        """Builds a balanced index.
+
+        Args:
+            points (Iterable[tuple]): (id, lat, lon) triples to index.
+        """
+        self._lock = threading.RLock()
+        self._leaf_of = {}
+        entries = [(*to_unit_vector(lat, lon), point_id) for point_id, lat, lon in points]
+        self._root = self._build(entries)
+
+    def __len__(self) -> int:
+        return len(self._leaf_of)
+
+    def __contains__(self, point_id: int) -> bool:
+        return point_id in self._leaf_of
+
+    def _build(self, entries: list) -> _Node:
+        if len(entries) <= LEAF_SIZE:
+            node = _Node(entries)
+            for entry in entries:
+                self._leaf_of[entry[3]] = node
+            return node
+        node = _Node()
+        self._split(node, entries)
+        return node
+
+    def _split(self, node: _Node, entries: list) -> None:
+        # Choose the axis and median from a sample so each level is a linear partition
+        # rather than a full sort; fall back to sorting if the sample splits badly.
+        columns = list(zip(*entries[::max(1, len(entries) // SAMPLE_SIZE)]))[:3]
+        spreads = [max(column) - min(column) for column in columns]
+        axis = spreads.index(max(spreads))
+        split = sorted(columns[axis])[len(columns[axis]) // 2]
+        left = [e for e in entries if e[axis] < split]
+        right = [e for e in entries if e[axis] >= split]
+        if not left or not right:
+            entries.sort(key=itemgetter(axis))
+            middle = len(entries) // 2
+            split = entries[middle][axis]
+            left, right = entries[:middle], entries[middle:]
+        node.axis = axis
+        node.split = split
+        node.points = None
+        node.left = self._build(left)
+        node.right = self._build(right)
+
+    def add(self, point_id: int, lat: float, lon: float) -> None:
+        """Adds a point, replacing any existing point with the same id.
+
+        Args:
+            point_id (int): The point's identifier.
+            lat (float): The latitude.
+            lon (float): The longitude.
+        """
+        entry = (*to_unit_vector(lat, lon), point_id)
+        with self._lock:
+            self.remove(point_id)
+            node = self._root
+            while node.points is None:
+                node = node.left if entry[node.axis] < node.split else node.right
+            node.points.append(entry)
+            self._leaf_of[point_id] = node
+            if len(node.points) > 2 * LEAF_SIZE:
+                self._split(node, node.points)
+
+    def remove(self, point_id: int) -> None:
+        """Removes a point if it is indexed.
+
+        Args:
+            point_id (int): The point's identifier.
+        """
+        with self._lock:
+            leaf = self._leaf_of.pop(point_id, None)
+            if leaf is not None:
+                leaf.points[:] = [e for e in leaf.points if e[3] != point_id]
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> List[Tuple[int, float]]:
+        """Finds the k points closest to a location.
+
+        Args:
+            lat (float): The latitude of the query location.
+            lon (float): The longitude of the query location.
+            k (int): Number of neighbours to return.
+
+        Returns:
+            List[tuple]: (id, distance_km) pairs, closest first.
+        """
+        query = to_unit_vector(lat, lon)
+        heap = []  # max-heap of (-chord_sq, id) holding the best k so far
+
+        def visit(node):
+            if node.points is not None:
+                for x, y, z, point_id in node.points:
+                    d = (x - query[0]) ** 2 + (y - query[1]) ** 2 + (z - query[2]) ** 2
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, point_id))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, point_id))
+                return
+            diff = query[node.axis] - node.split
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            visit(near)
+            if len(heap) < k or diff * diff < -heap[0][0]:
+                visit(far)
+
+        with self._lock:
+            visit(self._root)
+        return [(point_id, chord_to_km(-d)) for d, point_id in sorted(heap, reverse=True)]
+
+    def within(self, lat: float, lon: float, radius_km: float) -> List[Tuple[int, float]]:
+        """Finds every point within a great-circle radius of a location.
+
+        Args:
+            lat (float): The latitude of the query location.
+            lon (float): The longitude of the query location.
+            radius_km (float): The search radius in kilometres.
+
+        Returns:
+            List[tuple]: (id, distance_km) pairs, closest first.
+        """
+        query = to_unit_vector(lat, lon)
+        limit = km_to_chord_sq(radius_km)
+        found = []
+
+        def visit(node):
+            if node.points is not None:
+                for x, y, z, point_id in node.points:
+                    d = (x - query[0]) ** 2 + (y - query[1]) ** 2 + (z - query[2]) ** 2
+                    if d <= limit:
+                        found.append((d, point_id))
+                return
+            diff = query[node.axis] - node.split
+            if diff < 0 or diff * diff <= limit:
+                visit(node.left)
+            if diff >= 0 or diff * diff <= limit:
+                visit(node.right)
+
+        with self._lock:
+            visit(self._root)
+        found.sort()
+        return [(point_id, chord_to_km(d)) for d, point_id in found]
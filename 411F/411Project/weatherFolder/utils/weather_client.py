@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from weatherFolder.utils.logger import configure_logger
+from weatherFolder.utils.metrics import observe_upstream
+
+if TYPE_CHECKING:
+    import requests
+
+
+logger = logging.getLogger(__name__)
+configure_logger(logger)
+
+
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "https://api.openweathermap.org/data/2.5")
+WEATHER_POOL_SIZE = int(os.getenv("WEATHER_POOL_SIZE", os.getenv("FAVORITES_MAX_WORKERS", "8")))
+WEATHER_CONNECT_TIMEOUT = float(os.getenv("WEATHER_CONNECT_TIMEOUT", "3.05"))
+WEATHER_READ_TIMEOUT = float(os.getenv("WEATHER_READ_TIMEOUT", "5"))
+WEATHER_MAX_RETRIES = int(os.getenv("WEATHER_MAX_RETRIES", "2"))
+WEATHER_BACKOFF_FACTOR = float(os.getenv("WEATHER_BACKOFF_FACTOR", "0.2"))
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class WeatherClient:
+    """A reusable client for the OpenWeather API.
+
+    Wraps a single requests.Session so every call reuses pooled keep-alive
+    connections instead of paying a new TCP+TLS handshake. Transient upstream
+    failures (5xx and 429) are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, base_url: str = None, pool_size: int = None,
+                 connect_timeout: float = None, read_timeout: float = None,
+                 max_retries: int = None, backoff_factor: float = None):
+        """Initializes the client and its connection pool.
+
+        Args:
+            base_url (str, optional): Root of the OpenWeather API. Defaults to OPENWEATHER_BASE_URL.
+            pool_size (int, optional): Number of keep-alive connections to hold open.
+                Should match the number of workers calling upstream concurrently.
+            connect_timeout (float, optional): Seconds to wait for a connection.
+            read_timeout (float, optional): Seconds to wait for response data.
+            max_retries (int, optional): Retries on connection errors, 5xx and 429.
+            backoff_factor (float, optional): Base of the exponential backoff between retries.
+        """
+        self.base_url = (base_url or OPENWEATHER_BASE_URL).rstrip("/")
+        self.pool_size = pool_size or WEATHER_POOL_SIZE
+        self.timeout = (connect_timeout or WEATHER_CONNECT_TIMEOUT, read_timeout or WEATHER_READ_TIMEOUT)
+
+        # Imported on first use so worker boot does not pay for requests and urllib3.
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retries = Retry(
+            total=WEATHER_MAX_RETRIES if max_retries is None else max_retries,
+            backoff_factor=WEATHER_BACKOFF_FACTOR if backoff_factor is None else backoff_factor,
+            backoff_jitter=0.1,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=retries, pool_block=False)
+
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def build_url(self, endpoint: str) -> str:
+        """Builds the full URL for an OpenWeather endpoint.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. "weather" or "forecast".
+
+        Returns:
+            str: The absolute URL of the endpoint.
+        """
+        return f"{self.base_url}/{endpoint.lstrip('/')}"
+
+    def get(self, endpoint: str, **params) -> "requests.Response":
+        """Issues a GET request against an OpenWeather endpoint.
+
+        The API key is read from WEATHER_KEY and appended as the appid parameter.
+
+        Args:
+            endpoint (str): The endpoint name, e.g. "weather" or "forecast".
+            **params: Query parameters for the request (lat, lon, units, ...).
+
+        Returns:
+            requests.Response: The upstream response, after any retries.
+
+        Raises:
+            requests.exceptions.RequestException: If the request could not be completed.
+        """
+        params.setdefault("appid", os.getenv("WEATHER_KEY"))
+        url = self.build_url(endpoint)
+        logger.debug("GET %s", url)
+        name = endpoint.strip("/")
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+        except Exception:
+            observe_upstream(name, "error", time.perf_counter() - started)
+            raise
+        observe_upstream(name, str(response.status_code), time.perf_counter() - started)
+        return response
+
+    def close(self) -> None:
+        """Closes all pooled connections."""
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_weather_client() -> WeatherClient:
+    """Returns the process-wide WeatherClient, creating it on first use.
+
+    Returns:
+        WeatherClient: The shared client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = WeatherClient()
+    return _client
+
+
+def reset_weather_client() -> None:
+    """Closes and discards the shared WeatherClient so the next call builds a fresh one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
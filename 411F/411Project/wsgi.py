@@ -0,0 +1,42 @@
+"""WSGI entry point for production servers.
+
+Run with gunicorn, which reads gunicorn.conf.py from the working directory:
+
+    gunicorn wsgi:app
+"""
+from app import create_app
+from weatherFolder.db import db
+from weatherFolder.models.cities_model import city_cache, start_spatial_index_build, weather_cache
+from weatherFolder.models.favorites_model import forecast_cache
+from weatherFolder.models.user_model import user_cache
+from weatherFolder.utils.kdf_pool import reset_kdf_pool
+from weatherFolder.utils.logger import restart_logging_listener
+from weatherFolder.utils.metrics import reset_metrics
+from weatherFolder.utils.weather_client import reset_weather_client
+
+
+app = create_app()
+
+
+def init_worker() -> None:
+    """Resets per-process state in a freshly forked worker.
+
+    With a preloaded app the parent has already opened database connections
+    and may have created pools and background threads. Sockets must not be
+    shared between processes and threads do not survive fork(), so each
+    worker drops what it inherited and builds its own on first use.
+    """
+    restart_logging_listener()
+    reset_metrics()
+    with app.app_context():
+        # close=False leaves the parent's connections alone instead of closing them from the child.
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    reset_weather_client()
+    reset_kdf_pool()
+    for cache in (city_cache, weather_cache, forecast_cache, user_cache):
+        # Shared caches are the other workers' entries too, so they are kept.
+        if not cache.backend.shared:
+            cache.clear()
+    # Built now so the first nearest/within search does not wait on it.
+    start_spatial_index_build(app)